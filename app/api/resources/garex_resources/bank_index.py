@@ -0,0 +1,72 @@
+# ИНДЕКС БАНКОВ ПРОВАЙДЕРА GAREX
+import re
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from app.api.resources.garex_resources.bank_resources import bank_res
+
+
+# Страны банков
+COUNTRY_RUS = "РФ"
+COUNTRY_AZN = "Азербайджан"
+COUNTRY_ABH = "Абхазия"
+COUNTRY_TJS = "Таджикистан"
+
+# Страна по умолчанию для неизвестного кода банка
+DEFAULT_COUNTRY = COUNTRY_TJS
+
+
+class BankInfo:
+    __slots__ = ("code", "name", "country", "countries")
+
+    def __init__(self, code: str, name: str, country: str, countries: FrozenSet[str]):
+        self.code = code  # Код банка у провайдера
+        self.name = name  # Отображаемое название
+        self.country = country  # Страна банка
+        self.countries = countries  # Все списки, в которых банк доступен
+
+
+class BankIndex:
+    def __init__(self, banks: List[Tuple[str, Dict[str, str]]]):
+        # banks - списки по убыванию приоритета страны (первый список задает страну банка)
+        self.by_code: Dict[str, BankInfo] = {}
+        self.by_name: Dict[str, BankInfo] = {}
+
+        countries: Dict[str, set] = {}
+        for country, names in banks:
+            for code in names.values():
+                countries.setdefault(code, set()).add(country)
+
+        for country, names in banks:
+            for name, code in names.items():
+                if code not in self.by_code:
+                    self.by_code[code] = BankInfo(code, name, country, frozenset(countries[code]))
+
+        for country, names in banks:
+            for name, code in names.items():
+                bank = self.by_code[code]
+                for alias in (name, re.sub(r"\(.*?\)", "", name), code):
+                    self.by_name.setdefault(self.normalize(alias), bank)
+
+    # Название без учета регистра, пробелов и знаков препинания
+    @staticmethod
+    def normalize(name: str) -> str:
+        return re.sub(r"[\W_]+", "", name.casefold().replace("ё", "е"))
+
+    def find(self, name: str) -> Optional[BankInfo]:
+        return self.by_name.get(self.normalize(name))
+
+    def get(self, code: str) -> Optional[BankInfo]:
+        return self.by_code.get(code)
+
+    def country(self, code: str) -> str:
+        bank = self.by_code.get(code)
+        return bank.country if bank else DEFAULT_COUNTRY
+
+
+# Создание объекта класса BankIndex (банки, указанные в нескольких странах, относятся к более специфичной)
+bank_index = BankIndex([
+    (COUNTRY_TJS, bank_res.BANKS_TJS),
+    (COUNTRY_ABH, bank_res.BANKS_ABH),
+    (COUNTRY_AZN, bank_res.BANKS_AZN),
+    (COUNTRY_RUS, bank_res.BANKS_RUS)
+])
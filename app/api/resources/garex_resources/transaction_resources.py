@@ -23,6 +23,23 @@ class TransactionResources:
         STATUS_FAILED
     ]
 
+    # Допустимые переходы статусов (повтор текущего статуса разрешен)
+    STATUS_TRANSITIONS: Dict[str, List[str]] = {
+        STATUS_CREATED: [STATUS_PENDING, STATUS_PAID, STATUS_FINISHED, STATUS_CANCELED, STATUS_DISPUTE, STATUS_FAILED],
+        STATUS_PENDING: [STATUS_PAID, STATUS_FINISHED, STATUS_CANCELED, STATUS_DISPUTE, STATUS_FAILED],
+        STATUS_PAID: [STATUS_FINISHED, STATUS_DISPUTE],
+        STATUS_CANCELED: [STATUS_DISPUTE],
+        STATUS_DISPUTE: [STATUS_PAID, STATUS_FINISHED, STATUS_CANCELED],
+        STATUS_FINISHED: [],
+        STATUS_FAILED: []
+    }
+
+    # Конечные статусы (после них вебхуки по заказу не ожидаются)
+    TERMINAL_STATUSES: List[str] = [
+        STATUS_FINISHED,
+        STATUS_FAILED
+    ]
+
     # Типы поддерживаемых платежных методов
     PAYMENT_METHODS_CARD: List[str] = [
         "c2c"
@@ -4,16 +4,15 @@ import logging
 
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.core.config import settings
+from app.api.security.merchant_registry import MerchantContext, merchant_registry, set_current_merchant
 
 
 logger = logging.getLogger(__name__)
 
 
-# Проверка токена
-def verify_token(token: str) -> bool:
-    logger.info(f"Verifying token. Expected: {settings.merchant_token}, Received: {token}")
-    return token == settings.merchant_token
+# Проверка токена (сам токен не логируется)
+def verify_token(token: str) -> Optional[MerchantContext]:
+    return merchant_registry.authenticate(token)
 
 
 # Создание ответа об ошибке
@@ -40,7 +39,6 @@ class JWTBearer(HTTPBearer):
     async def __call__(self, request: Request):
         try:
             credentials: HTTPAuthorizationCredentials = await super().__call__(request)
-            logger.info(f"Received credentials: {credentials}")
 
             # Проверка на отсутствие учетных данных
             if not credentials:
@@ -65,7 +63,8 @@ class JWTBearer(HTTPBearer):
                 )
 
             # Проверка валидности токена
-            if not verify_token(credentials.credentials):
+            merchant = verify_token(credentials.credentials)
+            if merchant is None:
                 logger.warning("Token verification failed")
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -75,8 +74,22 @@ class JWTBearer(HTTPBearer):
                     )
                 )
 
-            logger.info("Token verification successful")
-            return credentials.credentials
+            # Проверка доступа мерчанта к провайдеру
+            provider_name = request.headers.get("Provider-data")
+            if provider_name is not None and not merchant.allows_provider(provider_name):
+                logger.warning(f"Provider {provider_name} is not allowed for merchant: {merchant.merchant_id}")
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail=_create_error_response(
+                        code="403",
+                        message="Провайдер недоступен для мерчанта"
+                    )
+                )
+
+            # Контекст мерчанта доступен обработчику и сервисам запроса
+            request.state.merchant = merchant
+            set_current_merchant(merchant)
+            return merchant.merchant_id
 
         # Проброс уже созданных HTTPException
         except HTTPException as e:
@@ -0,0 +1,151 @@
+# РЕЕСТР МЕРЧАНТОВ (ТОКЕНЫ ХРАНЯТСЯ В ВИДЕ ХЭШЕЙ)
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, FrozenSet, Optional
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class MerchantContext:
+    __slots__ = ("merchant_id", "token_hash", "providers", "callback_url", "rate_limit", "burst", "max_concurrency", "weight")
+
+    def __init__(self,
+                 merchant_id: str,
+                 token_hash: bytes,
+                 providers: Optional[FrozenSet[str]] = None,
+                 callback_url: Optional[str] = None,
+                 rate_limit: Optional[float] = None,
+                 burst: Optional[float] = None,
+                 max_concurrency: Optional[int] = None,
+                 weight: Optional[float] = None):
+        self.merchant_id = merchant_id
+        self.token_hash = token_hash  # SHA-256 токена
+        self.providers = providers  # Разрешенные провайдеры (None - все)
+        self.callback_url = callback_url  # URL колбэков о статусах (None - общий webhook_base_url)
+        # Лимиты мерчанта (None - общие значения merchant_* из настроек)
+        self.rate_limit = rate_limit  # Запросов в секунду
+        self.burst = burst
+        self.max_concurrency = max_concurrency  # Одновременных запросов
+        self.weight = weight  # Доля в очереди запросов к провайдеру (None - вес по умолчанию)
+
+    def allows_provider(self, provider_name: str) -> bool:
+        return self.providers is None or provider_name in self.providers
+
+
+# Мерчант текущего запроса
+_merchant: ContextVar[Optional[MerchantContext]] = ContextVar("merchant", default=None)
+
+
+def current_merchant() -> Optional[MerchantContext]:
+    return _merchant.get()
+
+
+def set_current_merchant(merchant: MerchantContext):
+    _merchant.set(merchant)
+
+
+def hash_token(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+def _build_merchant(merchant_id: str, config: Dict[str, Any]) -> MerchantContext:
+    # В конфигурации допускается хэш токена (token_sha256) или сам токен (token)
+    if config.get("token_sha256"):
+        token_hash = bytes.fromhex(config["token_sha256"])
+    else:
+        token_hash = hash_token(config["token"])
+
+    providers = config.get("providers")
+    return MerchantContext(
+        merchant_id=merchant_id,
+        token_hash=token_hash,
+        providers=frozenset(providers) if providers is not None else None,
+        callback_url=config.get("callback_url"),
+        rate_limit=config.get("rate_limit"),
+        burst=config.get("burst"),
+        max_concurrency=config.get("max_concurrency"),
+        weight=config.get("weight")
+    )
+
+
+class MerchantRegistry:
+    def __init__(self):
+        self.by_hash: Dict[bytes, MerchantContext] = {}
+        self.by_id: Dict[str, MerchantContext] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at: Optional[float] = None
+        self.reloads = 0
+
+    # Мерчанты из настроек, поверх них - из файла реестра
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        merchants: Dict[str, Dict[str, Any]] = {}
+        if settings.merchant_token:
+            merchants["default"] = {"token": settings.merchant_token}
+        merchants.update(settings.merchants)
+
+        if os.path.exists(settings.merchants_path):
+            with open(settings.merchants_path, "r", encoding="utf-8") as file:
+                merchants.update(json.load(file))
+        return merchants
+
+    def reload(self):
+        by_hash: Dict[bytes, MerchantContext] = {}
+        by_id: Dict[str, MerchantContext] = {}
+        for merchant_id, config in self._load().items():
+            merchant = _build_merchant(merchant_id, config)
+            by_hash[merchant.token_hash] = merchant
+            by_id[merchant_id] = merchant
+
+        # Замена словарей целиком: запросы в обработке видят либо старый, либо новый реестр
+        self.by_hash, self.by_id = by_hash, by_id
+        self.reloads += 1
+        logger.info(f"Merchant registry loaded: {len(by_id)} merchants")
+
+    # Перечитывание файла при изменении (не чаще merchants_reload_interval, в каждом воркере)
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < settings.merchants_reload_interval:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.stat(settings.merchants_path).st_mtime
+        except OSError:
+            mtime = None
+
+        if self.reloads and mtime == self._mtime:
+            return
+
+        try:
+            self.reload()
+            self._mtime = mtime
+        except Exception as e:
+            # Ошибка в файле - продолжаем работать со старым реестром
+            logger.error(f"Merchant registry reload failed: {str(e)}")
+            self._mtime = mtime
+
+    # Поиск мерчанта по токену: O(1) по хэшу и сравнение за постоянное время
+    def authenticate(self, token: str) -> Optional[MerchantContext]:
+        self._maybe_reload()
+
+        token_hash = hash_token(token)
+        merchant = self.by_hash.get(token_hash)
+        if merchant is None or not hmac.compare_digest(merchant.token_hash, token_hash):
+            return None
+        return merchant
+
+    def get(self, merchant_id: str) -> Optional[MerchantContext]:
+        self._maybe_reload()
+        return self.by_id.get(merchant_id)
+
+
+# Создание объекта класса MerchantRegistry
+merchant_registry = MerchantRegistry()
@@ -0,0 +1,199 @@
+# ОГРАНИЧЕНИЕ ЧАСТОТЫ И ОДНОВРЕМЕННЫХ ЗАПРОСОВ МЕРЧАНТА
+import asyncio
+import itertools
+import logging
+import math
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.core.config import settings
+from app.utils.sqlite_db import SqliteDatabase
+from app.utils.token_bucket import TokenBucket
+from app.api.security.auth import security
+from app.api.security.merchant_registry import MerchantContext
+
+
+logger = logging.getLogger(__name__)
+
+
+# Счетчики в памяти процесса (лимиты действуют отдельно в каждом воркере)
+class MemoryLimiterBackend:
+    def __init__(self):
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.in_flight: Dict[str, int] = {}
+        self._slot_ids = itertools.count()
+
+    # Взятие токена: 0 - успешно, иначе через сколько секунд повторить
+    async def acquire_rate(self, key: str, rate: float, burst: float) -> float:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(rate, burst)
+        elif bucket.rate != rate or bucket.capacity != burst:
+            bucket.set_rate(rate)
+            bucket.capacity = burst
+        return bucket.try_acquire()
+
+    # Занятие слота одновременного запроса: id слота или None, если лимит исчерпан
+    async def acquire_slot(self, key: str, limit: int) -> Optional[int]:
+        count = self.in_flight.get(key, 0)
+        if count >= limit:
+            return None
+        self.in_flight[key] = count + 1
+        return next(self._slot_ids)
+
+    async def release_slot(self, key: str, slot: int):
+        count = self.in_flight.get(key, 0) - 1
+        if count > 0:
+            self.in_flight[key] = count
+        else:
+            self.in_flight.pop(key, None)
+
+
+# Счетчики в файле SQLite, общем для всех воркеров uvicorn
+class SqliteLimiterBackend:
+    def __init__(self, path: str, slot_lease: float):
+        # Слот упавшего воркера освобождается по истечении аренды
+        self.slot_lease = slot_lease
+
+        self.db = SqliteDatabase(path, "rate-limits")
+        self.connection = self.db.connection
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            "key TEXT PRIMARY KEY, "
+            "tokens REAL NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS in_flight ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "key TEXT NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS in_flight_key ON in_flight (key, expires_at)"
+        )
+
+    async def acquire_rate(self, key: str, rate: float, burst: float) -> float:
+        def acquire() -> float:
+            now = time.time()
+            row = self.connection.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+
+            wait = 0.0
+            if tokens >= 1.0:
+                tokens -= 1.0
+            else:
+                wait = (1.0 - tokens) / rate
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO rate_buckets VALUES (?, ?, ?)", (key, tokens, now)
+            )
+            return wait
+
+        return await self.db.transaction(acquire)
+
+    async def acquire_slot(self, key: str, limit: int) -> Optional[int]:
+        def acquire() -> Optional[int]:
+            now = time.time()
+            count = self.connection.execute(
+                "SELECT COUNT(*) FROM in_flight WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()[0]
+            if count >= limit:
+                self.connection.execute("DELETE FROM in_flight WHERE key = ? AND expires_at <= ?", (key, now))
+                return None
+
+            return self.connection.execute(
+                "INSERT INTO in_flight (key, expires_at) VALUES (?, ?)", (key, now + self.slot_lease)
+            ).lastrowid
+
+        return await self.db.transaction(acquire)
+
+    async def release_slot(self, key: str, slot: int):
+        await self.db.run(self.connection.execute, "DELETE FROM in_flight WHERE id = ?", (slot,))
+
+
+def _create_backend():
+    if settings.rate_limit_backend == "sqlite":
+        return SqliteLimiterBackend(settings.rate_limit_db_path, settings.request_timeout_max * 2)
+    return MemoryLimiterBackend()
+
+
+def _too_many_requests(message: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail={
+            "code": "429",
+            "message": message
+        },
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class MerchantLimits:
+    def __init__(self, family: str, backend=None):
+        self.family = family  # Семейство эндпоинтов (payin | payout)
+        self.backend = backend or _create_backend()
+
+        self.throttled = 0
+        self.rejected_concurrency = 0
+
+    def _limits(self, merchant: MerchantContext) -> Tuple[float, float, int]:
+        rate = merchant.rate_limit or settings.merchant_rate_limit
+        burst = merchant.burst or settings.merchant_burst or rate
+        concurrency = merchant.max_concurrency or settings.merchant_max_concurrency
+        return rate, burst, concurrency
+
+    # Списание токена за каждую единицу работы внутри уже принятого запроса (заявка пакета).
+    # Заявка ждет токен, а не отклоняется: пакет растягивается по времени в пределах лимита мерчанта
+    async def charge(self, merchant: MerchantContext):
+        while True:
+            wait = await self.try_charge(merchant)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    # Списание токена без ожидания: 0 - списан, иначе через сколько секунд повторить
+    async def try_charge(self, merchant: MerchantContext) -> float:
+        rate, burst, _ = self._limits(merchant)
+        return await self.backend.acquire_rate(f"{merchant.merchant_id}:{self.family}", rate, burst)
+
+    # Одновременных запросов, разрешенных мерчанту
+    def concurrency(self, merchant: MerchantContext) -> int:
+        return self._limits(merchant)[2]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "throttled": self.throttled,
+            "rejected_concurrency": self.rejected_concurrency
+        }
+
+    # Зависимость FastAPI: проверка лимитов мерчанта, слот освобождается после обработки запроса
+    async def __call__(self, request: Request, merchant_id: str = Depends(security)):
+        rate, burst, concurrency = self._limits(request.state.merchant)
+        key = f"{merchant_id}:{self.family}"
+
+        wait = await self.backend.acquire_rate(key, rate, burst)
+        if wait > 0:
+            self.throttled += 1
+            logger.warning(f"Rate limit exceeded for merchant: {merchant_id} family: {self.family}")
+            raise _too_many_requests("Превышен лимит запросов мерчанта", wait)
+
+        slot = await self.backend.acquire_slot(key, concurrency)
+        if slot is None:
+            self.rejected_concurrency += 1
+            logger.warning(f"Concurrency limit exceeded for merchant: {merchant_id} family: {self.family}")
+            raise _too_many_requests("Превышен лимит одновременных запросов мерчанта", 1)
+
+        try:
+            yield merchant_id
+        finally:
+            await self.backend.release_slot(key, slot)
+
+
+# Создание объектов класса MerchantLimits
+payin_limits = MerchantLimits("payin")
+payout_limits = MerchantLimits("payout")
@@ -0,0 +1,97 @@
+# КОНТРОЛЬ ДОПУСКА ЗАПРОСОВ ПРИ ПЕРЕГРУЗКЕ
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.api.resources.providers_resources import providers_res
+
+
+logger = logging.getLogger(__name__)
+
+
+# Классы трафика
+CLASS_WEBHOOK = "webhook"
+CLASS_PAYIN = "payin"
+CLASS_PAYOUT = "payout"
+
+
+# Класс трафика по пути запроса (None - запрос не ограничивается)
+def classify(method: str, path: str) -> Optional[str]:
+    if path.startswith("/api/v1/webhooks"):
+        return CLASS_WEBHOOK
+    # Прогресс и позиции пакета выплат (GET) читаются локально - не ограничиваются
+    if path.startswith("/api/v1/transactions/payout") and method == "POST":
+        return CLASS_PAYOUT
+    # Чтение статусов обслуживается локально и не занимает пул провайдера
+    if path == "/api/v1/transactions/status":
+        return None
+    if path.startswith("/api/v1/transactions") and method == "POST":
+        return CLASS_PAYIN
+    return None
+
+
+class AdmissionController:
+    def __init__(self):
+        self.loop_lag = 0.0  # Сглаженная задержка цикла событий, секунды
+        self._task: Optional[asyncio.Task] = None
+
+        self.admitted: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+
+    async def start(self):
+        self._task = asyncio.create_task(self._monitor_loop_lag())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # Задержка цикла событий: насколько позже запланированного просыпается sleep
+    async def _monitor_loop_lag(self):
+        interval = settings.admission_lag_interval
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.monotonic() - started - interval)
+            self.loop_lag += 0.3 * (lag - self.loop_lag)
+
+    # Нагрузка: 1.0 - предел очереди к провайдеру или допустимой задержки цикла событий
+    def pressure(self) -> float:
+        occupancy = 0.0
+        queued = 0
+        for provider in providers_res.PROVIDERS.values():
+            scheduler = provider.scheduler
+            occupancy = max(occupancy, scheduler.active / scheduler.capacity)
+            queued += scheduler.queued() + sum(bucket.waiting for bucket in provider.rate_limits.values())
+
+        pressure = self.loop_lag / settings.admission_max_loop_lag
+        # Очередь учитывается только при почти полностью занятом пуле соединений
+        if occupancy >= settings.admission_occupancy:
+            pressure = max(pressure, queued / settings.admission_queue_limit)
+        return pressure
+
+    # Решение о допуске: None - принять, иначе Retry-After в секундах
+    def admit(self, traffic_class: str) -> Optional[int]:
+        pressure = self.pressure()
+        if pressure < settings.admission_thresholds[traffic_class]:
+            self.admitted[traffic_class] = self.admitted.get(traffic_class, 0) + 1
+            return None
+
+        self.rejected[traffic_class] = self.rejected.get(traffic_class, 0) + 1
+        return max(1, math.ceil(pressure * settings.admission_retry_after))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pressure": round(self.pressure(), 4),
+            "loop_lag": round(self.loop_lag, 4),
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected)
+        }
+
+
+# Создание объекта класса AdmissionController
+admission = AdmissionController()
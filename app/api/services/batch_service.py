@@ -0,0 +1,133 @@
+# СЕРВИС ПАКЕТНОГО СОЗДАНИЯ ТРАНЗАКЦИЙ
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Tuple, Type
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import settings
+from app.api.security.merchant_registry import MerchantContext
+from app.api.security.rate_limits import payin_limits
+from app.api.services.idempotency_service import idempotency
+from app.models.paygatecore.batch_model import BatchItem
+from app.models.paygatecore.pay_in_bank_model import PayInBankRequest
+from app.models.paygatecore.pay_in_model import PayInRequest
+from app.utils.deadline import set_request_deadline
+
+
+logger = logging.getLogger(__name__)
+
+
+# Метод в нашем API -> (метод провайдера, модель запроса)
+BATCH_METHODS: Dict[str, Tuple[str, Type[BaseModel]]] = {
+    "card": ("pay_in_card", PayInRequest),
+    "internal-card": ("pay_in_internal_card", PayInBankRequest),
+    "transgran-card": ("pay_in_transgran_card", PayInRequest),
+    "sbp": ("pay_in_sbp", PayInRequest),
+    "internal-sbp": ("pay_in_internal_sbp", PayInBankRequest),
+    "transgran-sbp": ("pay_in_transgran_sbp", PayInRequest),
+    "sim": ("pay_in_sim", PayInRequest)
+}
+
+
+# Ошибка валидации заявки в формате обработчика ошибок валидации приложения
+def _validation_error_detail(error: ValidationError) -> Dict[str, Any]:
+    errors: Dict[str, List[str]] = {}
+    for item in error.errors():
+        field = ".".join(str(loc) for loc in item["loc"])
+        if item["type"] == "missing":
+            errors.setdefault(field, []).append("Пропущено обязательное поле")
+        else:
+            errors.setdefault(field, []).append(item.get("msg", "Некорректное значение"))
+
+    if sum(len(messages) for messages in errors.values()) == 1:
+        return {"code": "422", "message": next(iter(errors.values()))[0]}
+    return {"code": "422", "message": "Ошибка валидации данных", "errors": errors}
+
+
+def _error_line(index: int, item: BatchItem, status_code: int, detail: Any) -> bytes:
+    if not (isinstance(detail, dict) and "code" in detail):
+        detail = {"code": str(status_code), "message": str(detail)}
+
+    return json.dumps({
+        "index": index,
+        "method": item.method,
+        "merchant_transaction_id": item.request.get("merchant_transaction_id"),
+        "status": status_code,
+        "error": detail
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _result_line(index: int, item: BatchItem, result) -> bytes:
+    content = result.body if isinstance(result, Response) else result.model_dump_json().encode("utf-8")
+    head = json.dumps({
+        "index": index,
+        "method": item.method,
+        "merchant_transaction_id": item.request.get("merchant_transaction_id"),
+        "status": 200
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    # Готовый JSON результата вставляется без повторного разбора
+    return head[:-1] + b',"result":' + content + b"}\n"
+
+
+async def _process_item(provider,
+                        merchant: MerchantContext,
+                        index: int,
+                        item: BatchItem,
+                        semaphore: asyncio.Semaphore) -> bytes:
+    try:
+        method = BATCH_METHODS.get(item.method)
+        if method is None:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "code": "400",
+                    "message": f"Метод не поддерживается в пакете: {item.method}"
+                }
+            )
+
+        provider_method, request_model = method
+        request = request_model(**item.request)
+
+        async with semaphore:
+            # Каждая заявка списывает токен из лимита мерчанта, как отдельный запрос
+            await payin_limits.charge(merchant)
+
+            # Бюджет времени отсчитывается отдельно для каждой заявки с момента ее отправки
+            set_request_deadline(item.method)
+            result = await idempotency.execute(
+                merchant.merchant_id, request.merchant_transaction_id, item.method,
+                lambda: getattr(provider, provider_method)(request)
+            )
+        return _result_line(index, item, result)
+
+    except HTTPException as e:
+        return _error_line(index, item, e.status_code, e.detail)
+
+    except ValidationError as e:
+        return _error_line(index, item, 422, _validation_error_detail(e))
+
+    except Exception as e:
+        logger.error(f"Batch item {index} failed: {str(e)}")
+        return _error_line(index, item, 500, "Внутренняя ошибка сервера")
+
+
+# Параллельная обработка заявок пакета, результаты в формате NDJSON по мере готовности
+async def process_batch(provider, merchant: MerchantContext, items: List[BatchItem]) -> AsyncIterator[bytes]:
+    # Параллельность пакета не выше лимита одновременных запросов мерчанта
+    semaphore = asyncio.Semaphore(min(settings.batch_concurrency, payin_limits.concurrency(merchant)))
+    tasks = [
+        asyncio.create_task(_process_item(provider, merchant, index, item, semaphore))
+        for index, item in enumerate(items)
+    ]
+
+    try:
+        for completed in asyncio.as_completed(tasks):
+            yield await completed
+    finally:
+        # Клиент отключился - оставшиеся заявки не отправляются
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,174 @@
+# СЕРВИС ИДЕМПОТЕНТНОСТИ СОЗДАНИЯ ТРАНЗАКЦИЙ
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.utils.single_flight import SingleFlight
+from app.utils.sqlite_db import SqliteDatabase
+from app.utils.ttl_cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+
+# Сохраненный ответ: (эндпоинт, JSON ответа)
+StoredResponse = Tuple[str, bytes]
+
+
+# Хранение ответов в памяти процесса
+class MemoryIdempotencyBackend:
+    def __init__(self, max_entries: int, ttl: float):
+        self.cache = TTLCache(max_entries, ttl)
+
+    async def get(self, merchant: str, merchant_transaction_id: str) -> Optional[StoredResponse]:
+        return self.cache.get((merchant, merchant_transaction_id))
+
+    async def set(self, merchant: str, merchant_transaction_id: str, stored: StoredResponse):
+        self.cache.set((merchant, merchant_transaction_id), stored)
+
+
+# Хранение ответов в файле SQLite, общем для всех воркеров (с кэшем в памяти перед ним)
+class SqliteIdempotencyBackend:
+    # Через сколько записей запускать очистку устаревших ответов
+    CLEANUP_EVERY = 1000
+    # last_used_at обновляется при чтении, только если старше этой доли TTL (чтение обычно без записи)
+    TOUCH_FRACTION = 0.1
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.memory = MemoryIdempotencyBackend(max_entries, ttl)
+        self._writes = 0
+        self.db = SqliteDatabase(path, "idempotency")
+        self.connection = self.db.connection
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            "merchant TEXT NOT NULL, "
+            "merchant_transaction_id TEXT NOT NULL, "
+            "endpoint TEXT NOT NULL, "
+            "response BLOB NOT NULL, "
+            "expires_at REAL NOT NULL, "
+            "last_used_at REAL NOT NULL, "
+            "PRIMARY KEY (merchant, merchant_transaction_id))"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idempotency_last_used ON idempotency (last_used_at)"
+        )
+
+    async def get(self, merchant: str, merchant_transaction_id: str) -> Optional[StoredResponse]:
+        stored = await self.memory.get(merchant, merchant_transaction_id)
+        if stored is not None:
+            return stored
+
+        stored = await self.db.run(self._get, merchant, merchant_transaction_id)
+        if stored is not None:
+            await self.memory.set(merchant, merchant_transaction_id, stored)
+        return stored
+
+    def _get(self, merchant: str, merchant_transaction_id: str) -> Optional[StoredResponse]:
+        now = time.time()
+        row = self.connection.execute(
+            "SELECT endpoint, response, last_used_at FROM idempotency "
+            "WHERE merchant = ? AND merchant_transaction_id = ? AND expires_at > ?",
+            (merchant, merchant_transaction_id, now)
+        ).fetchone()
+        if row is None:
+            return None
+
+        if now - row[2] > self.ttl * self.TOUCH_FRACTION:
+            self.connection.execute(
+                "UPDATE idempotency SET last_used_at = ? WHERE merchant = ? AND merchant_transaction_id = ?",
+                (now, merchant, merchant_transaction_id)
+            )
+        return row[0], bytes(row[1])
+
+    async def set(self, merchant: str, merchant_transaction_id: str, stored: StoredResponse):
+        await self.memory.set(merchant, merchant_transaction_id, stored)
+        await self.db.run(self._set, merchant, merchant_transaction_id, stored)
+
+    def _set(self, merchant: str, merchant_transaction_id: str, stored: StoredResponse):
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO idempotency VALUES (?, ?, ?, ?, ?, ?)",
+            (merchant, merchant_transaction_id, stored[0], stored[1], now + self.ttl, now)
+        )
+
+        self._writes += 1
+        if self._writes % self.CLEANUP_EVERY == 0:
+            self._cleanup(now)
+
+    # Удаление просроченных и вытеснение давно не использованных ответов
+    def _cleanup(self, now: float):
+        self.connection.execute("DELETE FROM idempotency WHERE expires_at <= ?", (now,))
+        self.connection.execute(
+            "DELETE FROM idempotency WHERE rowid IN ("
+            "SELECT rowid FROM idempotency ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+
+def _create_backend():
+    if settings.idempotency_backend == "sqlite":
+        return SqliteIdempotencyBackend(
+            settings.idempotency_db_path,
+            settings.idempotency_max_entries,
+            settings.idempotency_ttl
+        )
+    return MemoryIdempotencyBackend(settings.idempotency_max_entries, settings.idempotency_ttl)
+
+
+class IdempotencyService:
+    def __init__(self, backend=None):
+        self.backend = backend or _create_backend()
+        self.single_flight = SingleFlight()
+        self.hits = 0
+
+    # Выполнение запроса к провайдеру не более одного раза на (мерчант, merchant_transaction_id)
+    async def execute(self,
+                      merchant: str,
+                      merchant_transaction_id: str,
+                      endpoint: str,
+                      call: Callable[[], Awaitable[BaseModel]]):
+        stored = await self.backend.get(merchant, merchant_transaction_id)
+        if stored is not None:
+            stored_endpoint, content = stored
+            if stored_endpoint != endpoint:
+                raise HTTPException(
+                    status_code=422,
+                    detail={
+                        "code": "422",
+                        "message": f"Транзакция {merchant_transaction_id} уже создана методом: {stored_endpoint}"
+                    }
+                )
+
+            self.hits += 1
+            logger.info(f"Idempotent replay: {merchant_transaction_id} via method: {endpoint}")
+            return Response(content=content, media_type="application/json")
+
+        # Одновременные дубликаты ждут уже идущий запрос к провайдеру и получают его результат
+        return await self.single_flight.do(
+            (merchant, merchant_transaction_id, endpoint),
+            lambda: self._call_and_store(merchant, merchant_transaction_id, endpoint, call)
+        )
+
+    async def _call_and_store(self,
+                              merchant: str,
+                              merchant_transaction_id: str,
+                              endpoint: str,
+                              call: Callable[[], Awaitable[BaseModel]]):
+        result = await call()
+        content = result.model_dump_json().encode("utf-8")
+        await self.backend.set(merchant, merchant_transaction_id, (endpoint, content))
+
+        # Быстрый путь: уже сериализованный ответ отдается без повторной обработки FastAPI
+        if settings.response_fast_path:
+            return Response(content=content, media_type="application/json")
+        return result
+
+
+# Создание объекта класса IdempotencyService
+idempotency = IdempotencyService()
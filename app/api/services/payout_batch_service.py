@@ -0,0 +1,443 @@
+# СЕРВИС МАССОВЫХ ВЫПЛАТ
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
+
+import httpx
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import settings
+from app.api.resources.providers_resources import providers_res
+from app.api.services.idempotency_service import idempotency
+from app.api.security.merchant_registry import merchant_registry, set_current_merchant
+from app.api.security.rate_limits import payout_limits
+from app.models.paygatecore.batch_model import BatchItem
+from app.models.paygatecore.pay_out_model import PayOutRequest, PayOutRequest2
+from app.utils.deadline import set_request_deadline
+from app.utils.sqlite_db import SqliteDatabase
+from app.utils.token_bucket import TokenBucket
+
+
+logger = logging.getLogger(__name__)
+
+
+# Метод в нашем API -> (метод провайдера, модель запроса)
+PAYOUT_METHODS: Dict[str, Tuple[str, Type[BaseModel]]] = {
+    "payout-card": ("pay_out_card", PayOutRequest),
+    "payout-sbp": ("pay_out_sbp", PayOutRequest2)
+}
+
+# Статусы выплат пакета
+STATUS_QUEUED = "queued"  # ожидает отправки
+STATUS_PROCESSING = "processing"  # отправляется провайдеру
+STATUS_DONE = "done"  # создана у провайдера
+STATUS_FAILED = "failed"  # отклонена провайдером
+STATUS_INVALID = "invalid"  # ошибка в строке файла
+
+ALL_STATUSES: List[str] = [STATUS_QUEUED, STATUS_PROCESSING, STATUS_DONE, STATUS_FAILED, STATUS_INVALID]
+
+# Сколько строк файла записывается одной транзакцией
+INSERT_CHUNK = 1000
+
+
+# Хранилище пакетов выплат (SQLite в режиме WAL, общее для всех воркеров; обращения - в отдельном потоке)
+class PayoutBatchStore:
+    def __init__(self, path: str):
+        self.db = SqliteDatabase(path, "payout-batches")
+        self.connection = self.db.connection
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS payout_batches ("
+            "id TEXT PRIMARY KEY, "
+            "merchant TEXT NOT NULL, "
+            "provider TEXT NOT NULL, "
+            "total INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS payout_items ("
+            "batch_id TEXT NOT NULL, "
+            "idx INTEGER NOT NULL, "
+            "method TEXT, "
+            "merchant_transaction_id TEXT, "
+            "request TEXT, "
+            "status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt_at REAL NOT NULL DEFAULT 0, "
+            "result TEXT, "
+            "error TEXT, "
+            "updated_at REAL NOT NULL, "
+            "PRIMARY KEY (batch_id, idx));"
+            "CREATE INDEX IF NOT EXISTS payout_items_due ON payout_items (status, next_attempt_at);"
+            "CREATE TABLE IF NOT EXISTS payout_scheduler ("
+            "id INTEGER PRIMARY KEY CHECK (id = 1), "
+            "owner TEXT NOT NULL, "
+            "expires_at REAL NOT NULL);"
+        )
+
+    async def create_batch(self, batch_id: str, merchant: str, provider: str):
+        await self.db.run(
+            self.connection.execute,
+            "INSERT INTO payout_batches (id, merchant, provider, created_at) VALUES (?, ?, ?, ?)",
+            (batch_id, merchant, provider, time.time())
+        )
+
+    async def add_items(self, batch_id: str, rows: List[Tuple[int, Optional[str], Optional[str], Optional[str], str, Optional[str]]]):
+        await self.db.transaction(self._add_items, batch_id, rows)
+
+    def _add_items(self, batch_id: str, rows: List[Tuple[int, Optional[str], Optional[str], Optional[str], str, Optional[str]]]):
+        now = time.time()
+        self.connection.executemany(
+            "INSERT INTO payout_items "
+            "(batch_id, idx, method, merchant_transaction_id, request, status, error, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(batch_id, *row, now) for row in rows]
+        )
+        self.connection.execute(
+            "UPDATE payout_batches SET total = total + ? WHERE id = ?",
+            (len(rows), batch_id)
+        )
+
+    # Планировщик работает только в одном воркере uvicorn, чтобы общий темп не превышал лимит провайдера
+    async def acquire_leader(self, owner: str, ttl: float) -> bool:
+        return await self.db.run(self._acquire_leader, owner, ttl)
+
+    def _acquire_leader(self, owner: str, ttl: float) -> bool:
+        now = time.time()
+        self.connection.execute(
+            "INSERT INTO payout_scheduler (id, owner, expires_at) VALUES (1, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE payout_scheduler.owner = excluded.owner OR payout_scheduler.expires_at < ?",
+            (owner, now + ttl, now)
+        )
+        row = self.connection.execute("SELECT owner FROM payout_scheduler WHERE id = 1").fetchone()
+        return row is not None and row[0] == owner
+
+    # Захват выплат, готовых к отправке (включая зависшие после падения воркера)
+    async def claim(self, limit: int, lease: float) -> List[Tuple]:
+        return await self.db.transaction(self._claim, limit, lease)
+
+    def _claim(self, limit: int, lease: float) -> List[Tuple]:
+        now = time.time()
+        return self.connection.execute(
+            "UPDATE payout_items SET status = ?, next_attempt_at = ?, updated_at = ? "
+            "WHERE rowid IN (SELECT rowid FROM payout_items "
+            "WHERE status IN (?, ?) AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?) "
+            "RETURNING batch_id, idx, method, merchant_transaction_id, request, attempts",
+            (STATUS_PROCESSING, now + lease, now, STATUS_QUEUED, STATUS_PROCESSING, now, limit)
+        ).fetchall()
+
+    async def get_batch(self, batch_id: str) -> Optional[Tuple[str, str, int, float]]:
+        return await self.db.run(self._get_batch, batch_id)
+
+    def _get_batch(self, batch_id: str) -> Optional[Tuple[str, str, int, float]]:
+        return self.connection.execute(
+            "SELECT merchant, provider, total, created_at FROM payout_batches WHERE id = ?",
+            (batch_id,)
+        ).fetchone()
+
+    async def complete(self, batch_id: str, idx: int, status: str, result: Optional[str], error: Optional[str]):
+        await self.db.run(
+            self.connection.execute,
+            "UPDATE payout_items SET status = ?, result = ?, error = ?, updated_at = ? "
+            "WHERE batch_id = ? AND idx = ?",
+            (status, result, error, time.time(), batch_id, idx)
+        )
+
+    async def reschedule(self, batch_id: str, idx: int, attempts: int, next_attempt_at: float, error: str):
+        await self.db.run(
+            self.connection.execute,
+            "UPDATE payout_items SET status = ?, attempts = ?, next_attempt_at = ?, error = ?, updated_at = ? "
+            "WHERE batch_id = ? AND idx = ?",
+            (STATUS_QUEUED, attempts, next_attempt_at, error, time.time(), batch_id, idx)
+        )
+
+    # Отсрочка выплаты без расхода попытки (лимит мерчанта исчерпан)
+    async def defer(self, batch_id: str, idx: int, next_attempt_at: float):
+        await self.db.run(
+            self.connection.execute,
+            "UPDATE payout_items SET status = ?, next_attempt_at = ?, updated_at = ? "
+            "WHERE batch_id = ? AND idx = ?",
+            (STATUS_QUEUED, next_attempt_at, time.time(), batch_id, idx)
+        )
+
+    async def progress(self, batch_id: str) -> Dict[str, int]:
+        return await self.db.run(self._progress, batch_id)
+
+    def _progress(self, batch_id: str) -> Dict[str, int]:
+        counts = {status: 0 for status in ALL_STATUSES}
+        for status, count in self.connection.execute(
+                "SELECT status, COUNT(*) FROM payout_items WHERE batch_id = ? GROUP BY status",
+                (batch_id,)
+        ):
+            counts[status] = count
+        return counts
+
+    async def items(self, batch_id: str, status: Optional[str], after: int, limit: int) -> List[Dict[str, Any]]:
+        return await self.db.run(self._items, batch_id, status, after, limit)
+
+    def _items(self, batch_id: str, status: Optional[str], after: int, limit: int) -> List[Dict[str, Any]]:
+        query = ("SELECT idx, method, merchant_transaction_id, status, attempts, result, error "
+                 "FROM payout_items WHERE batch_id = ? AND idx > ?")
+        params: List[Any] = [batch_id, after]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY idx LIMIT ?"
+        params.append(limit)
+
+        return [
+            {
+                "index": idx,
+                "method": method,
+                "merchant_transaction_id": merchant_transaction_id,
+                "status": item_status,
+                "attempts": attempts,
+                "result": json.loads(result) if result else None,
+                "error": json.loads(error) if error else None
+            }
+            for idx, method, merchant_transaction_id, item_status, attempts, result, error
+            in self.connection.execute(query, params)
+        ]
+
+    async def close(self):
+        await self.db.close()
+
+
+def _parse_line(line: bytes) -> Tuple[Optional[str], Optional[str], Optional[str], str, Optional[str]]:
+    try:
+        item = BatchItem.model_validate_json(line)
+        method = PAYOUT_METHODS.get(item.method)
+        if method is None:
+            error = {"code": "400", "message": f"Метод не поддерживается в пакете выплат: {item.method}"}
+            return item.method, None, None, STATUS_INVALID, json.dumps(error, ensure_ascii=False)
+
+        request = method[1](**item.request)
+        return item.method, request.merchant_transaction_id, request.model_dump_json(), STATUS_QUEUED, None
+
+    except ValidationError as e:
+        errors = e.errors()
+        message = errors[0].get("msg", "Ошибка валидации данных") if errors else "Ошибка валидации данных"
+        error = {"code": "422", "message": message}
+        return None, None, None, STATUS_INVALID, json.dumps(error, ensure_ascii=False)
+
+
+class PayoutBatchService:
+    def __init__(self):
+        self.store: Optional[PayoutBatchStore] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.bucket: Optional[TokenBucket] = None
+        self.rate = settings.payout_rate_initial
+        self._throttled_at = 0.0
+        self._owner = uuid.uuid4().hex
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        self.store = PayoutBatchStore(settings.payout_db_path)
+        self.queue = asyncio.Queue(maxsize=settings.payout_workers * 2)
+        self.bucket = TokenBucket(self.rate, max(1.0, self.rate))
+
+        for _ in range(settings.payout_workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+        self._tasks.append(asyncio.create_task(self._feeder()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+        if self.store:
+            await self.store.close()
+
+    # Прием файла выплат (NDJSON: одна заявка {"method": ..., "request": {...}} на строку)
+    async def upload(self, merchant: str, provider_name: str, stream: AsyncIterator[bytes]) -> Dict[str, Any]:
+        batch_id = uuid.uuid4().hex
+        await self.store.create_batch(batch_id, merchant, provider_name)
+
+        accepted = 0
+        rejected = 0
+        index = 0
+        rows = []
+        buffer = b""
+
+        async def lines():
+            nonlocal buffer
+            async for chunk in stream:
+                buffer += chunk
+                *complete, buffer = buffer.split(b"\n")
+                for line in complete:
+                    yield line
+            yield buffer
+
+        async for line in lines():
+            if not line.strip():
+                continue
+
+            method, merchant_transaction_id, request, status, error = _parse_line(line)
+            rows.append((index, method, merchant_transaction_id, request, status, error))
+            index += 1
+            if status == STATUS_QUEUED:
+                accepted += 1
+            else:
+                rejected += 1
+
+            if len(rows) >= INSERT_CHUNK:
+                await self.store.add_items(batch_id, rows)
+                rows = []
+
+        if rows:
+            await self.store.add_items(batch_id, rows)
+
+        logger.info(f"Payout batch {batch_id} accepted: {accepted}, rejected: {rejected}")
+        return {
+            "batch_id": batch_id,
+            "accepted": accepted,
+            "rejected": rejected
+        }
+
+    async def progress(self, merchant: str, batch_id: str) -> Dict[str, Any]:
+        await self._check_owner(merchant, batch_id)
+        counts = await self.store.progress(batch_id)
+        return {
+            "batch_id": batch_id,
+            "total": sum(counts.values()),
+            **counts,
+            "finished": counts[STATUS_QUEUED] == 0 and counts[STATUS_PROCESSING] == 0,
+            "rate": round(self.rate, 2)
+        }
+
+    async def items(self, merchant: str, batch_id: str, status: Optional[str], after: int, limit: int) -> List[Dict[str, Any]]:
+        await self._check_owner(merchant, batch_id)
+        return await self.store.items(batch_id, status, after, limit)
+
+    async def _check_owner(self, merchant: str, batch_id: str):
+        batch = await self.store.get_batch(batch_id)
+        if batch is None or batch[0] != merchant:
+            raise HTTPException(
+                status_code=404,
+                detail={
+                    "code": "404",
+                    "message": f"Пакет выплат не найден: {batch_id}"
+                }
+            )
+
+    async def _feeder(self):
+        while True:
+            await asyncio.sleep(settings.payout_poll_interval)
+            try:
+                if not await self.store.acquire_leader(self._owner, settings.payout_poll_interval * 10):
+                    continue
+
+                free_slots = self.queue.maxsize - self.queue.qsize()
+                if free_slots <= 0:
+                    continue
+
+                for row in await self.store.claim(free_slots, settings.payout_lease):
+                    self.queue.put_nowait(row)
+
+            except Exception as e:
+                logger.error(f"Payout feeder error: {str(e)}")
+
+    async def _worker(self):
+        while True:
+            row = await self.queue.get()
+            try:
+                await self._process(*row)
+            except Exception as e:
+                logger.error(f"Payout worker error: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def _process(self, batch_id: str, idx: int, method: str, merchant_transaction_id: str, request_json: str, attempts: int):
+        try:
+            batch = await self.store.get_batch(batch_id)
+            if batch is None:
+                raise LookupError(f"пакет {batch_id} не найден")
+            merchant_id, provider_name, _, _ = batch
+            merchant = merchant_registry.get(merchant_id)
+            if merchant is None:
+                raise LookupError(f"мерчант {merchant_id} не найден")
+            provider_method, request_model = PAYOUT_METHODS[method]
+            request = request_model.model_validate_json(request_json)
+            provider = providers_res.PROVIDERS[provider_name]
+
+        except (LookupError, ValidationError) as e:
+            # Заявку нельзя отправить и при повторе - выплата завершается ошибкой, а не зависает в processing
+            error = {"code": "422", "message": f"Некорректная заявка выплаты: {str(e)}"}
+            await self.store.complete(batch_id, idx, STATUS_FAILED, None, json.dumps(error, ensure_ascii=False))
+            return
+
+        try:
+            # Каждая выплата пакета списывает токен из лимита выплат мерчанта, как отдельный запрос.
+            # Без токена выплата откладывается, а не ждет его в воркере: пакеты других мерчантов не простаивают
+            wait = await payout_limits.try_charge(merchant)
+            if wait > 0:
+                await self.store.defer(batch_id, idx, time.time() + wait)
+                return
+
+            # Темп отправки подстраивается под ответы провайдера
+            await self.bucket.acquire()
+
+            set_request_deadline(method)
+            # Выплаты пакета идут в справедливой очереди провайдера от имени мерчанта
+            set_current_merchant(merchant)
+            result = await idempotency.execute(
+                merchant_id, merchant_transaction_id, method,
+                lambda: getattr(provider, provider_method)(request)
+            )
+
+        except HTTPException as e:
+            detail = e.detail if isinstance(e.detail, dict) else {"code": str(e.status_code), "message": str(e.detail)}
+            if e.status_code == 429 or e.status_code >= 500:
+                await self._retry(batch_id, idx, attempts, detail)
+            else:
+                await self.store.complete(batch_id, idx, STATUS_FAILED, None, json.dumps(detail, ensure_ascii=False))
+            return
+
+        except httpx.HTTPError as e:
+            await self._retry(batch_id, idx, attempts, {"code": "503", "message": f"Ошибка обращения к провайдеру: {str(e)}"})
+            return
+
+        except Exception as e:
+            # Непредвиденная ошибка считается неудачной попыткой (без снижения темпа: провайдер ни при чем)
+            logger.error(f"Payout item error: {batch_id}:{idx} error: {str(e)}")
+            await self._retry(batch_id, idx, attempts, {"code": "500", "message": f"Ошибка обработки выплаты: {str(e)}"}, throttle=False)
+            return
+
+        content = result.body.decode("utf-8") if isinstance(result, Response) else result.model_dump_json()
+        await self.store.complete(batch_id, idx, STATUS_DONE, content, None)
+        self._on_success()
+
+    async def _retry(self, batch_id: str, idx: int, attempts: int, detail: Dict[str, Any], throttle: bool = True):
+        if throttle:
+            self._on_throttle()
+        attempts += 1
+        error = json.dumps(detail, ensure_ascii=False)
+        if attempts >= settings.payout_max_attempts:
+            await self.store.complete(batch_id, idx, STATUS_FAILED, None, error)
+            return
+
+        delay = min(settings.payout_retry_base_delay * 2 ** (attempts - 1), settings.payout_retry_max_delay)
+        await self.store.reschedule(batch_id, idx, attempts, time.time() + delay * random.uniform(0.8, 1.2), error)
+
+    # Аддитивное увеличение темпа после успешных выплат (примерно +payout_rate_step в секунду)
+    def _on_success(self):
+        self.rate = min(settings.payout_rate_max, self.rate + settings.payout_rate_step / max(self.rate, 1.0))
+        self.bucket.set_rate(self.rate)
+
+    # Мультипликативное снижение темпа при перегрузке провайдера (не чаще раза в секунду)
+    def _on_throttle(self):
+        now = time.monotonic()
+        if now - self._throttled_at < 1.0:
+            return
+        self._throttled_at = now
+        self.rate = max(settings.payout_rate_min, self.rate / 2)
+        self.bucket.set_rate(self.rate)
+        logger.warning(f"Payout rate reduced to {self.rate:.2f} req/s")
+
+
+# Создание объекта класса PayoutBatchService
+payout_batches = PayoutBatchService()
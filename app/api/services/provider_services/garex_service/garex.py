@@ -1,17 +1,35 @@
 # СЕРВИС ПРОВАЙДЕРА GAREX
+import asyncio
+import math
+import time
+from typing import Any, Dict, Optional, Tuple
+
 import httpx
 from fastapi import HTTPException
-
-from app.api.services.provider_services.garex_service import tools
+from pydantic import ValidationError
+
+from app.api.services.provider_services.garex_service.method_registry import (
+    method_registry,
+    PaymentMethodSpec,
+    PAYIN_URL,
+    PAYOUT_URL,
+    STATUS_URL
+)
+from app.api.services.provider_services.garex_service.method_scoreboard import method_scoreboard
+from app.utils import deadline
+from app.utils.fair_scheduler import FairScheduler
+from app.utils.token_bucket import BoundedTokenBucket
+from app.api.security.merchant_registry import current_merchant
+from app.api.services.transaction_store import transaction_store
+from app.utils.circuit_breaker import circuit_breakers
 from app.core.config import settings
+from app.models.garex.status_model import StatusResponse
 from app.models.paygatecore.pay_in_bank_model import (
     PayInBankResponse,
     PayInBankRequest,
     PayInBankResponse2
 )
 from app.models.paygatecore.pay_in_model import PayInRequest, PayInResponse, PayInResponse2
-from app.api.resources.garex_resources.bank_resources import bank_res
-from app.api.resources.garex_resources.transaction_resources import transactions_res
 from app.models.paygatecore.pay_out_model import PayOutRequest, PayOutResponse, PayOutRequest2
 from app.models.paygatecore.pay_in_sim_model import PayInSimResponse
 
@@ -23,7 +41,11 @@ HEADERS = {
 
 
 def _handle_provider_status(status_code):
-    if status_code == 422:
+    # Успешный ответ провайдера
+    if 200 <= status_code < 300:
+        return
+
+    elif status_code == 422:
         raise HTTPException(
             status_code=status_code,
             detail={
@@ -69,208 +91,250 @@ def _handle_provider_status(status_code):
         )
 
 
-class GarexService:
-    def __init__(self):
-        self.client = httpx.AsyncClient(
-            timeout=httpx.Timeout(30.0, connect=5.0),
-            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
-        )
+# Отказ открытого автоматического выключателя: запрос до провайдера не доходил
+class BreakerOpen(HTTPException):
+    pass
 
 
-    async def pay_in_card(self, request: PayInRequest) -> PayInResponse:
-        try:
-            method = transactions_res.PAYMENT_METHODS_CARD[0]
-            provider_payload = tools.transform_to_provider_format(request, method)
-            response = await self.client.post(
-                f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payin",
-                headers=HEADERS,
-                json=provider_payload
-            )
-            _handle_provider_status(response.status_code)
-            response.raise_for_status()
-            provider_response = response.json()
+def _breaker_open_error(breaker, method: str) -> HTTPException:
+    return BreakerOpen(
+        status_code=503,
+        detail={
+            "code": "503",
+            "message": f"Провайдер временно недоступен (метод: {method})"
+        },
+        headers={"Retry-After": str(breaker.retry_after())}
+    )
 
-            return tools.transform_from_provider_format(provider_response)
 
-        except HTTPException as e:
-            raise HTTPException(
-                status_code=e.status_code,
-                detail=e.detail
-            )
+# Отказ по исходящему лимиту: следующий метод упрется в тот же лимит, фолбэк не выполняется
+class OutboundRateLimited(HTTPException):
+    pass
 
 
-    async def pay_in_internal_card(self, request: PayInBankRequest) -> PayInBankResponse:
-        try:
-            try:
-                bank_code = bank_res.BANKS_RUS[request.bank_name]
-            except KeyError:
-                try:
-                    bank_code = bank_res.BANKS_AZN[request.bank_name]
-                except KeyError:
-                    raise HTTPException(
-                        status_code=404,
-                        detail={
-                            "code": "404",
-                            "message": f"Банк: {request.bank_name} не найден в системе провайдера"
-                        }
-                    )
+def _rate_limited_error(family: str, retry_after: float) -> HTTPException:
+    return OutboundRateLimited(
+        status_code=503,
+        detail={
+            "code": "503",
+            "message": f"Превышен лимит запросов к провайдеру ({family}), повторите позже"
+        },
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
 
-            try:
-                method = transactions_res.PAYMENT_METHODS_CARD_ITERNAL[bank_code]
-            except KeyError:
-                raise HTTPException(
-                    status_code=400,
-                    detail={
-                        "code": "400",
-                        "message": f"Провайдер не поддерживает такой внутрибанк: {request.bank_name}"}
-                )
 
-            provider_payload = tools.transform_to_provider_format_with_bank(request, method, bank_code)
-            response = await self.client.post(
-                f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payin",
-                headers=HEADERS,
-                json=provider_payload
-            )
-            _handle_provider_status(response.status_code)
-            response.raise_for_status()
-            provider_response = response.json()
+def _rate_bucket(family: str) -> BoundedTokenBucket:
+    limits = settings.provider_rate_limits["garex"][family]
+    return BoundedTokenBucket(limits["rate"], limits["burst"], settings.provider_rate_max_waiting)
 
-            return tools.transform_from_provider_format_with_bank(provider_response)
 
-        except HTTPException as e:
-            raise HTTPException(
-                status_code=e.status_code,
-                detail=e.detail
-            )
+# Таймауты запроса к провайдеру без учета дедлайна мерчанта
+TIMEOUT = 30.0
+CONNECT_TIMEOUT = 5.0
 
 
-    async def pay_in_transgran_card(self, request: PayInRequest) -> PayInResponse2:
-        try:
-            method = transactions_res.PAYMENT_METHODS_CARD_TRANSGRAN[0]
-            provider_payload = tools.transform_to_provider_format(request, method)
-            response = await self.client.post(
-                f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payin",
-                headers=HEADERS,
-                json=provider_payload
-            )
-            _handle_provider_status(response.status_code)
-            response.raise_for_status()
-            provider_response = response.json()
+class GarexService:
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=settings.provider_concurrency, max_keepalive_connections=20)
+        )
+        self.breaker = circuit_breakers.get("garex")
+        # Пул соединений делится между мерчантами пропорционально их весам
+        self.scheduler = FairScheduler(settings.provider_concurrency)
+        # Исходящие лимиты провайдера по семействам эндпоинтов
+        self.rate_limits = {
+            "payin": _rate_bucket("payin"),
+            "payout": _rate_bucket("payout"),
+            "status": _rate_bucket("status")
+        }
+        self.url_families = {
+            PAYIN_URL: "payin",
+            PAYOUT_URL: "payout"
+        }
+
+
+    async def _post(self, url: str, method: str, payload: Dict[str, Any]) -> httpx.Response:
+        return await self._request(self.url_families[url], url, method, payload)
+
+
+    # Запрос к провайдеру в очереди мерчанта (payload None - GET)
+    async def _request(self, family: str, url: str, method: str, payload: Optional[Dict[str, Any]]) -> httpx.Response:
+        merchant = current_merchant()
+        key = merchant.merchant_id if merchant else ""
+        weight = merchant.weight if merchant and merchant.weight else settings.fair_queue_default_weight
+
+        budget = deadline.remaining()
+        if budget is not None and budget <= 0:
+            raise deadline.deadline_exceeded_error()
+
+        # Темп запросов держится в пределах квоты провайдера, избыток сверх очереди отклоняется.
+        # Токен берется до слота пула: ожидание темпа одного семейства не занимает соединения остальных,
+        # и запрос не ждет токен дольше оставшегося бюджета мерчанта
+        bucket = self.rate_limits[family]
+        if not await bucket.acquire_or_shed(max_wait=budget):
+            raise _rate_limited_error(family, bucket.retry_after())
 
-            return tools.transform_from_provider_format_2(provider_response)
+        try:
+            await self.scheduler.acquire(key, weight, deadline.remaining())
+        except asyncio.TimeoutError:
+            raise deadline.deadline_exceeded_error()
 
-        except HTTPException as e:
-            if e.status_code == 404 or e.status_code == 400:
-                method = transactions_res.PAYMENT_METHODS_CARD_TRANSGRAN[1]
-                provider_payload = tools.transform_to_provider_format(request, method)
+        try:
+            return await self._send(url, method, payload)
+        finally:
+            self.scheduler.release()
+
+    # Запрос к провайдеру через автоматические выключатели провайдера и метода оплаты
+    async def _send(self, url: str, method: str, payload: Optional[Dict[str, Any]]) -> httpx.Response:
+        # Провайдеру отдается только оставшаяся часть бюджета мерчанта
+        budget = deadline.remaining()
+        if budget is not None and budget <= 0:
+            raise deadline.deadline_exceeded_error()
+        limited = budget is not None and budget < TIMEOUT
+        timeout = httpx.Timeout(budget, connect=min(CONNECT_TIMEOUT, budget)) if limited else httpx.USE_CLIENT_DEFAULT
+
+        method_breaker = circuit_breakers.get(f"garex:{method}")
+        if not self.breaker.allow():
+            raise _breaker_open_error(self.breaker, method)
+        if not method_breaker.allow():
+            self.breaker.release()
+            raise _breaker_open_error(method_breaker, method)
+
+        started = time.monotonic()
+        try:
+            if payload is None:
+                response = await self.client.get(url, headers=HEADERS, timeout=timeout)
+            else:
                 response = await self.client.post(
-                    f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payin",
+                    url,
                     headers=HEADERS,
-                    json=provider_payload
+                    json=payload,
+                    timeout=timeout
                 )
-                _handle_provider_status(response.status_code)
-                response.raise_for_status()
-                provider_response = response.json()
-
-                return tools.transform_from_provider_format_2(provider_response)
+        except httpx.TimeoutException:
+            # Таймаут из-за короткого бюджета мерчанта не считается сбоем провайдера
+            if limited:
+                self.breaker.release()
+                method_breaker.release()
+                raise deadline.deadline_exceeded_error()
+            latency = time.monotonic() - started
+            self.breaker.record(False, latency)
+            method_breaker.record(False, latency)
+            raise
+        except httpx.HTTPError:
+            latency = time.monotonic() - started
+            self.breaker.record(False, latency)
+            method_breaker.record(False, latency)
+            raise
+        except BaseException:
+            self.breaker.release()
+            method_breaker.release()
+            raise
+
+        # Ответы 4xx - бизнес-ошибки, провайдер при этом работоспособен
+        latency = time.monotonic() - started
+        success = response.status_code < 500
+        self.breaker.record(success, latency)
+        method_breaker.record(success, latency)
+        return response
+
+
+    # Выполнение метода оплаты с записью созданной транзакции в локальное хранилище
+    async def _execute(self, spec: PaymentMethodSpec, request):
+        result = await self._create(spec, request)
+
+        merchant = current_merchant()
+        transaction_store.record_created(
+            merchant.merchant_id if merchant else "",
+            "garex",
+            spec.type,
+            spec.payment_method,
+            result
+        )
+        return result
 
-            raise HTTPException(
-                status_code=e.status_code,
-                detail=e.detail
-            )
 
+    # Выполнение метода оплаты по описанию из реестра
+    async def _create(self, spec: PaymentMethodSpec, request):
+        bank_code = spec.resolve_bank(request) if spec.resolve_bank else None
+        methods = spec.resolve_methods(bank_code, request) if spec.resolve_methods else spec.methods
 
-    async def pay_in_sbp(self, request: PayInRequest) -> PayInBankResponse:
-        try:
-            method = transactions_res.PAYMENT_METHODS_SBP[0]
-            provider_payload = tools.transform_to_provider_format(request, method)
-            response = await self.client.post(
-                f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payin",
-                headers=HEADERS,
-                json=provider_payload
-            )
+        if not spec.fallback:
+            method = methods[0]
+            provider_payload = spec.build_payload(request, method, bank_code)
+            response = await self._post(spec.url, method, provider_payload)
             _handle_provider_status(response.status_code)
             response.raise_for_status()
-            provider_response = response.json()
 
-            return tools.transform_from_provider_format_with_bank(provider_response)
+            return spec.map_response(response.json())
 
-        except HTTPException as e:
-            raise HTTPException(
-                status_code=e.status_code,
-                detail=e.detail
-            )
+        # Перебор методов в порядке, подобранном по статистике успешности
+        amount = int(request.amount)
+        ordered, skipped = method_scoreboard.plan(methods, amount)
 
+        # Все методы недавно ответили "нет реквизита" - быстрый отказ без запроса к провайдеру
+        if not ordered:
+            _handle_provider_status(skipped[0][1])
 
-    async def pay_in_internal_sbp(self, request: PayInBankRequest) -> PayInBankResponse2:
-        try:
+        last_error = None
+        for method in ordered:
+            provider_payload = spec.build_payload(request, method, bank_code)
+            started = time.monotonic()
             try:
-                bank_code = bank_res.BANKS_RUS[request.bank_name]
-            except KeyError:
-                raise HTTPException(
-                    status_code=404,
-                    detail={
-                        "code": "404",
-                        "message": f"Банк: {request.bank_name} не найден в системе провайдера"                        }
-                )
+                response = await self._post(spec.url, method, provider_payload)
+                _handle_provider_status(response.status_code)
 
-            method = transactions_res.PAYMENT_METHODS_SBP[0]
-            provider_payload = tools.transform_to_provider_format_with_bank(request, method, bank_code)
-            response = await self.client.post(
-                f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payin",
-                headers=HEADERS,
-                json=provider_payload
-            )
-            _handle_provider_status(response.status_code)
+            except OutboundRateLimited:
+                raise
+
+            except HTTPException as e:
+                # В статистику метода попадают только ответы провайдера, а не отказы самого шлюза
+                if not isinstance(e, (BreakerOpen, deadline.DeadlineExceeded)):
+                    method_scoreboard.record_failure(method, amount, time.monotonic() - started, e.status_code)
+                # Нет реквизита или метод недоступен - переход к следующему методу
+                if e.status_code == 404 or e.status_code == 400 or e.status_code == 503:
+                    last_error = e
+                    continue
+                raise
+
+            except httpx.HTTPError:
+                method_scoreboard.record_failure(method, amount, time.monotonic() - started)
+                raise
+
+            method_scoreboard.record_success(method, time.monotonic() - started)
             response.raise_for_status()
-            provider_response = response.json()
 
-            return tools.transform_from_provider_format_with_bank_2(provider_response)
+            return spec.map_response(response.json())
 
-        except HTTPException as e:
-            raise HTTPException(
-                status_code=e.status_code,
-                detail=e.detail
-            )
+        raise last_error
 
 
-    async def pay_in_transgran_sbp(self, request: PayInRequest) -> PayInBankResponse2:
-        try:
-            method = transactions_res.PAYMENT_METHODS_SBP_TRANSGRAN[0]
-            provider_payload = tools.transform_to_provider_format(request, method)
-            response = await self.client.post(
-                f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payin",
-                headers=HEADERS,
-                json=provider_payload
-            )
-            _handle_provider_status(response.status_code)
-            response.raise_for_status()
-            provider_response = response.json()
+    async def pay_in_card(self, request: PayInRequest) -> PayInResponse:
+        return await self._execute(method_registry.CARD, request)
 
-            return tools.transform_from_provider_format_with_bank_2(provider_response)
 
-        except HTTPException as e:
-            if e.status_code == 404 or e.status_code == 400:
-                method = transactions_res.PAYMENT_METHODS_SBP_TRANSGRAN[1]
-                provider_payload = tools.transform_to_provider_format(request, method)
-                response = await self.client.post(
-                    f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payin",
-                    headers=HEADERS,
-                    json=provider_payload
-                )
-                _handle_provider_status(response.status_code)
-                response.raise_for_status()
-                provider_response = response.json()
+    async def pay_in_internal_card(self, request: PayInBankRequest) -> PayInBankResponse:
+        return await self._execute(method_registry.INTERNAL_CARD, request)
 
-                return tools.transform_from_provider_format_with_bank_2(provider_response)
 
-            raise HTTPException(
-                status_code=e.status_code,
-                detail=e.detail
-            )
+    async def pay_in_transgran_card(self, request: PayInRequest) -> PayInResponse2:
+        return await self._execute(method_registry.TRANSGRAN_CARD, request)
+
+
+    async def pay_in_sbp(self, request: PayInRequest) -> PayInBankResponse:
+        return await self._execute(method_registry.SBP, request)
+
+
+    async def pay_in_internal_sbp(self, request: PayInBankRequest) -> PayInBankResponse2:
+        return await self._execute(method_registry.INTERNAL_SBP, request)
 
 
-    async def pay_in_qr(self):
+    async def pay_in_transgran_sbp(self, request: PayInRequest) -> PayInBankResponse2:
+        return await self._execute(method_registry.TRANSGRAN_SBP, request)
+
+
+    async def pay_in_qr(self, request: PayInRequest):
         raise HTTPException(
             status_code=400,
             detail={
@@ -281,80 +345,34 @@ class GarexService:
 
 
     async def pay_in_sim(self, request: PayInRequest) -> PayInSimResponse:
-        try:
-            method = transactions_res.PAYMENT_METHODS_SIM[0]
-            provider_payload = tools.transform_to_provider_format(request, method)
-            response = await self.client.post(
-                f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payin",
-                headers=HEADERS,
-                json=provider_payload
-            )
-            _handle_provider_status(response.status_code)
-            response.raise_for_status()
-            provider_response = response.json()
-
-            return tools.transform_from_provider_format_3(provider_response)
-
-        except HTTPException as e:
-            raise HTTPException(
-                status_code=e.status_code,
-                detail=e.detail
-            )
+        return await self._execute(method_registry.SIM, request)
 
 
     async def pay_out_card(self, request: PayOutRequest) -> PayOutResponse:
-        try:
-            method = transactions_res.PAYMENT_METHODS_CARD[0]
-            provider_payload = tools.transform_to_provider_format_for_out(request, method)
-            response = await self.client.post(
-                f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payout",
-                headers=HEADERS,
-                json=provider_payload
-            )
-            _handle_provider_status(response.status_code)
-            response.raise_for_status()
-            provider_response = response.json()
-
-            return tools.transform_from_provider_format_for_out(provider_response)
-
-        except HTTPException as e:
-            raise HTTPException(
-                status_code=e.status_code,
-                detail=e.detail
-            )
+        return await self._execute(method_registry.PAYOUT_CARD, request)
 
 
     async def pay_out_sbp(self, request: PayOutRequest2) -> PayOutResponse:
-        try:
-            try:
-                # Наши коды?
-                bank_code = "sber" # Заглушка
-            except KeyError:
-                raise HTTPException(
-                    status_code=404,
-                    detail={
-                        "code": "404",
-                        "message": f"Банк: {request.bank_name} не найден в системе провайдера"                        }
-                )
+        return await self._execute(method_registry.PAYOUT_SBP, request)
 
-            method = transactions_res.PAYMENT_METHODS_SBP[0]
-            provider_payload = tools.transform_to_provider_format_for_out_2(request, method, bank_code)
-            response = await self.client.post(
-                f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payout",
-                headers=HEADERS,
-                json=provider_payload
-            )
-            _handle_provider_status(response.status_code)
-            response.raise_for_status()
-            provider_response = response.json()
 
-            return tools.transform_from_provider_format_for_out(provider_response)
+    # Статус транзакции у провайдера: (статус, сумма)
+    async def get_status(self, provider_id: int) -> Tuple[str, int]:
+        response = await self._request("status", STATUS_URL.format(id=provider_id), "status", None)
+        _handle_provider_status(response.status_code)
 
-        except HTTPException as e:
+        # Формат ответа проверяется моделью: неожиданное тело - ошибка провайдера, а не 500 у нас
+        try:
+            result = StatusResponse.model_validate_json(response.content).result
+        except ValidationError:
             raise HTTPException(
-                status_code=e.status_code,
-                detail=e.detail
+                status_code=502,
+                detail={
+                    "code": "502",
+                    "message": "Некорректный ответ провайдера на запрос статуса"
+                }
             )
+        return result.state, result.amount
 
 
 garex = GarexService()
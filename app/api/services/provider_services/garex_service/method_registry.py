@@ -0,0 +1,205 @@
+# РЕЕСТР МЕТОДОВ ОПЛАТЫ ПРОВАЙДЕРА GAREX
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from app.api.services.provider_services.garex_service import tools
+from app.core.config import settings
+from app.api.resources.garex_resources.bank_index import bank_index, COUNTRY_RUS, COUNTRY_AZN
+from app.api.resources.garex_resources.transaction_resources import transactions_res
+from app.models.paygatecore.pay_in_bank_model import PayInBankResponse, PayInBankResponse2
+from app.models.paygatecore.pay_in_model import PayInResponse, PayInResponse2
+from app.models.paygatecore.pay_in_sim_model import PayInSimResponse
+from app.models.paygatecore.pay_out_model import PayOutResponse
+
+
+# URL эндпоинтов провайдера
+PAYIN_URL = f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payin"
+PAYOUT_URL = f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/payout"
+STATUS_URL = f"{settings.providers["garex"]["base_url"]}/api/merchant/payments/{{id}}"
+
+# Один преобразователь ответа на каждую модель
+RESPONSE_MAPPERS: Dict[Type[BaseModel], Callable[[Dict[str, Any]], BaseModel]] = {
+    model: tools.compile_response_mapper(model, trusted=settings.response_fast_path)
+    for model in (
+        PayInResponse,
+        PayInResponse2,
+        PayInBankResponse,
+        PayInBankResponse2,
+        PayInSimResponse,
+        PayOutResponse
+    )
+}
+
+
+class PaymentMethodSpec:
+    def __init__(self,
+                 name: str,
+                 url: str,
+                 methods: List[str],
+                 build_payload: Callable[[Any, str, Optional[str]], Dict[str, Any]],
+                 response_model: Type[BaseModel],
+                 resolve_bank: Optional[Callable[[Any], str]] = None,
+                 resolve_methods: Optional[Callable[[str, Any], List[str]]] = None):
+        self.name = name  # Метод в нашем API
+        self.url = url
+        self.type = "out" if url == PAYOUT_URL else "in"  # Тип транзакции
+        self.payment_method = name.rsplit("-", 1)[-1]  # Способ оплаты (card, sbp, sim)
+        self.methods = methods  # Методы провайдера (несколько - цепочка фолбэка)
+        self.build_payload = build_payload
+        self.response_model = response_model
+        self.map_response = RESPONSE_MAPPERS[response_model]
+        self.resolve_bank = resolve_bank  # Код банка провайдера по запросу
+        self.resolve_methods = resolve_methods  # Методы провайдера по коду банка
+
+    @property
+    def fallback(self) -> bool:
+        return len(self.methods) > 1
+
+
+def _bank_not_found(bank_name: str) -> HTTPException:
+    return HTTPException(
+        status_code=404,
+        detail={
+            "code": "404",
+            "message": f"Банк: {bank_name} не найден в системе провайдера"
+        }
+    )
+
+
+def _resolve_internal_card_bank(request) -> str:
+    bank = bank_index.find(request.bank_name)
+    if bank is None or not bank.countries & {COUNTRY_RUS, COUNTRY_AZN}:
+        raise _bank_not_found(request.bank_name)
+    return bank.code
+
+
+def _resolve_internal_card_methods(bank_code: str, request) -> List[str]:
+    try:
+        return [transactions_res.PAYMENT_METHODS_CARD_ITERNAL[bank_code]]
+    except KeyError:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "code": "400",
+                "message": f"Провайдер не поддерживает такой внутрибанк: {request.bank_name}"
+            }
+        )
+
+
+def _resolve_internal_sbp_bank(request) -> str:
+    bank = bank_index.find(request.bank_name)
+    if bank is None or COUNTRY_RUS not in bank.countries:
+        raise _bank_not_found(request.bank_name)
+    return bank.code
+
+
+def _resolve_payout_sbp_bank(request) -> str:
+    # Наши коды?
+    return "sber"  # Заглушка
+
+
+def _payin_payload(request, method: str, bank_code: Optional[str]) -> Dict[str, Any]:
+    return tools.transform_to_provider_format(request, method)
+
+
+def _payin_bank_payload(request, method: str, bank_code: Optional[str]) -> Dict[str, Any]:
+    return tools.transform_to_provider_format_with_bank(request, method, bank_code)
+
+
+def _payout_payload(request, method: str, bank_code: Optional[str]) -> Dict[str, Any]:
+    return tools.transform_to_provider_format_for_out(request, method)
+
+
+def _payout_sbp_payload(request, method: str, bank_code: Optional[str]) -> Dict[str, Any]:
+    return tools.transform_to_provider_format_for_out_2(request, method, bank_code)
+
+
+class MethodRegistry:
+    CARD = PaymentMethodSpec(
+        name="card",
+        url=PAYIN_URL,
+        methods=transactions_res.PAYMENT_METHODS_CARD[:1],
+        build_payload=_payin_payload,
+        response_model=PayInResponse
+    )
+    INTERNAL_CARD = PaymentMethodSpec(
+        name="internal-card",
+        url=PAYIN_URL,
+        methods=[],
+        build_payload=_payin_bank_payload,
+        response_model=PayInBankResponse,
+        resolve_bank=_resolve_internal_card_bank,
+        resolve_methods=_resolve_internal_card_methods
+    )
+    TRANSGRAN_CARD = PaymentMethodSpec(
+        name="transgran-card",
+        url=PAYIN_URL,
+        methods=transactions_res.PAYMENT_METHODS_CARD_TRANSGRAN,
+        build_payload=_payin_payload,
+        response_model=PayInResponse2
+    )
+    SBP = PaymentMethodSpec(
+        name="sbp",
+        url=PAYIN_URL,
+        methods=transactions_res.PAYMENT_METHODS_SBP[:1],
+        build_payload=_payin_payload,
+        response_model=PayInBankResponse
+    )
+    INTERNAL_SBP = PaymentMethodSpec(
+        name="internal-sbp",
+        url=PAYIN_URL,
+        methods=transactions_res.PAYMENT_METHODS_SBP[:1],
+        build_payload=_payin_bank_payload,
+        response_model=PayInBankResponse2,
+        resolve_bank=_resolve_internal_sbp_bank
+    )
+    TRANSGRAN_SBP = PaymentMethodSpec(
+        name="transgran-sbp",
+        url=PAYIN_URL,
+        methods=transactions_res.PAYMENT_METHODS_SBP_TRANSGRAN,
+        build_payload=_payin_payload,
+        response_model=PayInBankResponse2
+    )
+    SIM = PaymentMethodSpec(
+        name="sim",
+        url=PAYIN_URL,
+        methods=transactions_res.PAYMENT_METHODS_SIM[:1],
+        build_payload=_payin_payload,
+        response_model=PayInSimResponse
+    )
+    PAYOUT_CARD = PaymentMethodSpec(
+        name="payout-card",
+        url=PAYOUT_URL,
+        methods=transactions_res.PAYMENT_METHODS_CARD[:1],
+        build_payload=_payout_payload,
+        response_model=PayOutResponse
+    )
+    PAYOUT_SBP = PaymentMethodSpec(
+        name="payout-sbp",
+        url=PAYOUT_URL,
+        methods=transactions_res.PAYMENT_METHODS_SBP[:1],
+        build_payload=_payout_sbp_payload,
+        response_model=PayOutResponse,
+        resolve_bank=_resolve_payout_sbp_bank
+    )
+
+    # Методы по имени в нашем API
+    BY_NAME: Dict[str, PaymentMethodSpec] = {
+        spec.name: spec
+        for spec in (
+            CARD,
+            INTERNAL_CARD,
+            TRANSGRAN_CARD,
+            SBP,
+            INTERNAL_SBP,
+            TRANSGRAN_SBP,
+            SIM,
+            PAYOUT_CARD,
+            PAYOUT_SBP
+        )
+    }
+
+
+method_registry = MethodRegistry
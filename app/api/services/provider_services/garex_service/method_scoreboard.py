@@ -0,0 +1,93 @@
+# СТАТИСТИКА МЕТОДОВ ОПЛАТЫ GAREX (ПОРЯДОК ФОЛБЭКА ТРАНСГРАНА)
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.ttl_cache import TTLCache
+
+
+class MethodStats:
+    def __init__(self):
+        # Без статистики метод считается рабочим - исходный порядок сохраняется
+        self.success_rate = 1.0
+        self.latency: Optional[float] = None
+        self.requests = 0
+
+    def update(self, success: bool, latency: float, alpha: float):
+        self.requests += 1
+        self.success_rate += alpha * ((1.0 if success else 0.0) - self.success_rate)
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += alpha * (latency - self.latency)
+
+
+class MethodScoreboard:
+    def __init__(self):
+        self.stats: Dict[str, MethodStats] = {}
+        # Методы без свободного реквизита: (метод, корзина суммы) -> код ответа провайдера
+        self.negative = TTLCache(10000, settings.transgran_negative_ttl)
+        self.decisions: deque = deque(maxlen=100)
+
+    def _get(self, method: str) -> MethodStats:
+        stats = self.stats.get(method)
+        if stats is None:
+            stats = self.stats[method] = MethodStats()
+        return stats
+
+    @staticmethod
+    def _bucket(amount: int) -> int:
+        return amount // settings.transgran_amount_bucket
+
+    # Порядок перебора методов и методы, пропущенные по негативному кэшу
+    def plan(self, methods: List[str], amount: int) -> Tuple[List[str], List[Tuple[str, int]]]:
+        bucket = self._bucket(amount)
+        ordered = []
+        skipped = []
+        for method in methods:
+            status_code = self.negative.get((method, bucket))
+            if status_code is None:
+                ordered.append(method)
+            else:
+                skipped.append((method, status_code))
+
+        # Сначала самый успешный метод, при равенстве - самый быстрый (сортировка устойчивая)
+        ordered.sort(key=lambda m: (-round(self._get(m).success_rate, 2), self._get(m).latency or 0.0))
+
+        self.decisions.append({
+            "at": time.time(),
+            "amount_bucket": bucket,
+            "order": ordered,
+            "skipped": [method for method, _ in skipped]
+        })
+        return ordered, skipped
+
+    def record_success(self, method: str, latency: float):
+        self._get(method).update(True, latency, settings.transgran_ewma_alpha)
+
+    def record_failure(self, method: str, amount: int, latency: float, status_code: Optional[int] = None):
+        self._get(method).update(False, latency, settings.transgran_ewma_alpha)
+
+        # Запоминаются только ответы "не найдено / нет свободного реквизита"
+        if status_code in (400, 404):
+            self.negative.set((method, self._bucket(amount)), status_code)
+
+    # Состояние для отладочного эндпоинта
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "methods": {
+                method: {
+                    "success_rate": round(stats.success_rate, 4),
+                    "latency": round(stats.latency, 4) if stats.latency is not None else None,
+                    "requests": stats.requests
+                }
+                for method, stats in self.stats.items()
+            },
+            "negative_cache_size": len(self.negative),
+            "decisions": list(self.decisions)[-20:]
+        }
+
+
+# Создание объекта класса MethodScoreboard
+method_scoreboard = MethodScoreboard()
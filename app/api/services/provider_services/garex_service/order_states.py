@@ -0,0 +1,98 @@
+# ТАБЛИЦА СОСТОЯНИЙ ЗАКАЗОВ ПО ВЕБХУКАМ GAREX
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.api.resources.garex_resources.transaction_resources import transactions_res
+
+
+logger = logging.getLogger(__name__)
+
+
+class OrderStateTable:
+    def __init__(self, statuses: List[str], transitions: Dict[str, List[str]], terminal: List[str]):
+        # Статус хранится номером в списке статусов, переходы - битовыми масками
+        self.statuses = statuses
+        self.index = {status: i for i, status in enumerate(statuses)}
+        self.allowed = [
+            (1 << i) | sum(1 << self.index[target] for target in transitions[status])
+            for i, status in enumerate(statuses)
+        ]
+        self.terminal = frozenset(self.index[status] for status in terminal)
+
+        # order_id -> (номер статуса, время обновления); словари упорядочены по времени обновления
+        self.active: Dict[str, tuple] = {}
+        self.finished: Dict[str, tuple] = {}
+
+        self.stale_dropped = 0
+        self.evicted = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._evictor())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # Применение статуса из вебхука: False, если событие устарело или откатывает статус назад
+    def advance(self, order_id: str, state: str) -> bool:
+        new = self.index[state]
+
+        current = self.finished.get(order_id) or self.active.get(order_id)
+        if current is not None and not self.allowed[current[0]] & (1 << new):
+            self.stale_dropped += 1
+            return False
+
+        # Переставка в конец словаря сохраняет порядок по времени обновления
+        self.active.pop(order_id, None)
+        self.finished.pop(order_id, None)
+        table = self.finished if new in self.terminal else self.active
+        table[order_id] = (new, time.monotonic())
+        return True
+
+    def state(self, order_id: str) -> Optional[str]:
+        current = self.finished.get(order_id) or self.active.get(order_id)
+        return self.statuses[current[0]] if current else None
+
+    # Удаление записей старше ttl с начала словаря (записи упорядочены по времени)
+    def _evict(self, table: Dict[str, tuple], ttl: float):
+        expired_before = time.monotonic() - ttl
+        expired = []
+        for order_id, (_, updated_at) in table.items():
+            if updated_at > expired_before:
+                break
+            expired.append(order_id)
+
+        for order_id in expired:
+            del table[order_id]
+        self.evicted += len(expired)
+
+    async def _evictor(self):
+        while True:
+            await asyncio.sleep(settings.order_state_sweep_interval)
+            try:
+                self._evict(self.finished, settings.order_state_finished_ttl)
+                self._evict(self.active, settings.order_state_active_ttl)
+            except Exception as e:
+                logger.error(f"Order state evictor error: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "orders_active": len(self.active),
+            "orders_finished": len(self.finished),
+            "orders_evicted": self.evicted,
+            "stale_dropped": self.stale_dropped
+        }
+
+
+# Создание объекта класса OrderStateTable
+order_states = OrderStateTable(
+    transactions_res.ALL_STATUSES,
+    transactions_res.STATUS_TRANSITIONS,
+    transactions_res.TERMINAL_STATUSES
+)
@@ -1,33 +1,18 @@
 # ИНСТРУМЕНТЫ ПРОВАЙДЕРА GAREX
 from datetime import datetime, timedelta
 from fastapi import HTTPException
-from typing import Dict, Any
+from pydantic import BaseModel
+from typing import Dict, Any, Callable, List, Tuple, Type
 
-from app.api.resources.garex_resources.bank_resources import bank_res
+from app.api.resources.garex_resources.bank_index import bank_index
 from app.core.config import settings
-from app.models.paygatecore.pay_in_bank_model import (
-    PayInBankRequest,
-    PayInBankResponse,
-    PayInBankResponse2
-)
-from app.models.paygatecore.pay_in_model import (
-    PayInRequest,
-    PayInResponse,
-    PayInResponse2
-)
-from app.models.paygatecore.pay_out_model import PayOutRequest, PayOutRequest2, PayOutResponse
-from app.models.paygatecore.pay_in_sim_model import PayInSimResponse
+from app.models.paygatecore.pay_in_bank_model import PayInBankRequest
+from app.models.paygatecore.pay_in_model import PayInRequest
+from app.models.paygatecore.pay_out_model import PayOutRequest, PayOutRequest2
 
 
 def _get_country(bank_code: str) -> str:
-    if bank_code in bank_res.BANKS_RUS:
-        return "РФ"
-    elif bank_code in bank_res.BANKS_AZN:
-        return "Азербайджан"
-    elif bank_code in bank_res.BANKS_ABH:
-        return "Абхазия"
-    else:
-        return "Таджикистан"
+    return bank_index.country(bank_code)
 
 
 def transform_to_provider_format(request: PayInRequest, method: str) -> Dict[str, Any]:
@@ -87,146 +72,48 @@ def transform_to_provider_format_for_out_2(request: PayOutRequest2, method: str,
     return payload
 
 
-def transform_from_provider_format(provider_response: Dict[str, Any]) -> PayInResponse:
-    try:
-        return PayInResponse(
-            id=provider_response["result"]["id"],
-            merchant_transaction_id=provider_response["result"]["orderId"],
-            expires_at=datetime.now() + timedelta(minutes = 10),
-            amount=str(provider_response["result"]["amount"]),
-            currency="RUB",
-            currency_rate=str(provider_response["result"]["rate"]),
-            amount_in_usd=str(provider_response["result"]["amount"] / provider_response["result"]["rate"]),
-            rate="",
-            commission=str(provider_response["result"]["fee"] * provider_response["result"]["amount"]),
-            card_number=provider_response["result"]["address"],
-            owner_name=provider_response["result"]["recipient"],
-            bank_name=provider_response["result"]["bankName"],
-            country_name=_get_country(provider_response["result"]["bank"]),
-            payment_currency="RUB",
-            payment_link=provider_response["url"]
-        )
-    except KeyError:
-        raise HTTPException(
-            status_code=520,
-            detail="Неизвестная ошибка при получении ответа"
-        )
-
-
-def transform_from_provider_format_2(provider_response: Dict[str, Any]) -> PayInResponse2:
-    try:
-        return PayInResponse2(
-            id=provider_response["result"]["id"],
-            merchant_transaction_id=provider_response["result"]["orderId"],
-            expires_at=datetime.now() + timedelta(minutes=10),
-            amount=str(provider_response["result"]["amount"]),
-            currency="RUB",
-            currency_rate=str(provider_response["result"]["rate"]),
-            amount_in_usd=str(provider_response["result"]["amount"] / provider_response["result"]["rate"]),
-            rate="",
-            commission=str(provider_response["result"]["fee"] * provider_response["result"]["amount"]),
-            card_number=provider_response["result"]["address"],
-            owner_name=provider_response["result"]["recipient"],
-            bank_name=provider_response["result"]["bankName"],
-            country_name=_get_country(provider_response["result"]["bank"]),
-            payment_currency="RUB"
-        )
-    except KeyError:
-        raise HTTPException(
-            status_code=520,
-            detail="Неизвестная ошибка при получении ответа"
-        )
-
-
-def transform_from_provider_format_3(provider_response: Dict[str, Any]) -> PayInSimResponse:
-    try:
-        return PayInSimResponse(
-            id=provider_response["result"]["id"],
-            merchant_transaction_id=provider_response["result"]["orderId"],
-            expires_at=datetime.now() + timedelta(minutes = 10),
-            amount=str(provider_response["result"]["amount"]),
-            currency="RUB",
-            currency_rate=str(provider_response["result"]["rate"]),
-            amount_in_usd=str(provider_response["result"]["amount"] / provider_response["result"]["rate"]),
-            rate="",
-            commission=str(provider_response["result"]["fee"] * provider_response["result"]["amount"]),
-            phone_number=provider_response["result"]["address"],
-            owner_name=provider_response["result"]["recipient"],
-            operator=provider_response["result"]["bankName"]
-        )
-    except KeyError:
-        raise HTTPException(
-            status_code=520,
-            detail="Неизвестная ошибка при получении ответа"
-        )
-
-
-def transform_from_provider_format_with_bank(provider_response: Dict[str, Any]) -> PayInBankResponse:
-    try:
-        return PayInBankResponse(
-            id=provider_response["result"]["id"],
-            merchant_transaction_id=provider_response["result"]["orderId"],
-            expires_at=datetime.now() + timedelta(minutes = 10),
-            amount=str(provider_response["result"]["amount"]),
-            currency="RUB",
-            currency_rate=str(provider_response["result"]["rate"]),
-            amount_in_usd=str(provider_response["result"]["amount"] / provider_response["result"]["rate"]),
-            rate="",
-            commission=str(provider_response["result"]["fee"] * provider_response["result"]["amount"]),
-            phone_number=provider_response["result"]["address"],
-            owner_name=provider_response["result"]["recipient"],
-            bank_name=provider_response["result"]["bankName"],
-            country_name=_get_country(provider_response["result"]["bank"]),
-            payment_currency="RUB",
-            payment_link=provider_response["url"]
-        )
-    except KeyError:
-        raise HTTPException(
-            status_code=520,
-            detail="Неизвестная ошибка при получении ответа"
-        )
-
-
-def transform_from_provider_format_with_bank_2(provider_response: Dict[str, Any]) -> PayInBankResponse2:
-    try:
-        return PayInBankResponse2(
-            id=provider_response["result"]["id"],
-            merchant_transaction_id=provider_response["result"]["orderId"],
-            expires_at=datetime.now() + timedelta(minutes = 10),
-            amount=str(provider_response["result"]["amount"]),
-            currency="RUB",
-            currency_rate=str(provider_response["result"]["rate"]),
-            amount_in_usd=str(provider_response["result"]["amount"] / provider_response["result"]["rate"]),
-            rate="",
-            commission=str(provider_response["result"]["fee"] * provider_response["result"]["amount"]),
-            phone_number=provider_response["result"]["address"],
-            owner_name=provider_response["result"]["recipient"],
-            bank_name=provider_response["result"]["bankName"],
-            country_name=_get_country(provider_response["result"]["bank"]),
-            payment_currency="RUB"
-        )
-    except KeyError:
-        raise HTTPException(
-            status_code=520,
-            detail="Неизвестная ошибка при получении ответа"
-        )
-
-
-def transform_from_provider_format_for_out(provider_response: Dict[str, Any]) -> PayOutResponse:
-    try:
-        return PayOutResponse(
-            id=provider_response["result"]["id"],
-            merchant_transaction_id=provider_response["result"]["orderId"],
-            expires_at=datetime.now() + timedelta(minutes = 10),
-            amount=str(provider_response["result"]["amount"]),
-            currency="RUB",
-            currency_rate=str(provider_response["result"]["rate"]),
-            amount_in_usd=str(provider_response["result"]["amount"] / provider_response["result"]["rate"]),
-            rate="",
-            commission=str(provider_response["result"]["fee"] * provider_response["result"]["amount"])
-        )
-    except KeyError:
-        raise HTTPException(
-            status_code=520,
-            detail="Неизвестная ошибка при получении ответа"
-        )
+# Срок действия выданных реквизитов
+EXPIRES_IN = timedelta(minutes=10)
+
+
+# Получение значения поля ответа из result (и полного ответа провайдера)
+FIELD_MAPPERS: Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], Any]] = {
+    "id": lambda result, response: int(result["id"]),
+    "merchant_transaction_id": lambda result, response: str(result["orderId"]),
+    "expires_at": lambda result, response: datetime.now() + EXPIRES_IN,
+    "amount": lambda result, response: str(result["amount"]),
+    "currency": lambda result, response: "RUB",
+    "currency_rate": lambda result, response: str(result["rate"]),
+    "amount_in_usd": lambda result, response: str(result["amount"] / result["rate"]),
+    "rate": lambda result, response: "",
+    "commission": lambda result, response: str(result["fee"] * result["amount"]),
+    "card_number": lambda result, response: str(result["address"]),
+    "phone_number": lambda result, response: str(result["address"]),
+    "owner_name": lambda result, response: str(result["recipient"]),
+    "bank_name": lambda result, response: str(result["bankName"]),
+    "operator": lambda result, response: str(result["bankName"]),
+    "country_name": lambda result, response: _get_country(result["bank"]),
+    "payment_currency": lambda result, response: "RUB",
+    "payment_link": lambda result, response: str(response["url"])
+}
+
+
+# Сборка преобразователя ответа провайдера в модель (один раз при импорте)
+# trusted - модель собирается без повторной валидации: типы полей уже приведены в FIELD_MAPPERS
+def compile_response_mapper(model: Type[BaseModel], trusted: bool = False) -> Callable[[Dict[str, Any]], BaseModel]:
+    # KeyError при импорте, если для поля модели нет правила заполнения
+    fields: List[Tuple[str, Callable]] = [(name, FIELD_MAPPERS[name]) for name in model.model_fields]
+    build = model.model_construct if trusted else model
+
+    def transform_from_provider_format(provider_response: Dict[str, Any]) -> BaseModel:
+        try:
+            result = provider_response["result"]
+            return build(**{name: mapper(result, provider_response) for name, mapper in fields})
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(
+                status_code=520,
+                detail="Неизвестная ошибка при получении ответа"
+            )
+
+    transform_from_provider_format.__name__ = f"transform_to_{model.__name__}"
+    return transform_from_provider_format
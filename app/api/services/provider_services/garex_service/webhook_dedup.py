@@ -0,0 +1,45 @@
+# ДЕДУПЛИКАЦИЯ ВЕБХУКОВ GAREX
+import hashlib
+from typing import Any, Dict
+
+from app.core.config import settings
+from app.utils.ttl_cache import TTLCache
+from app.models.garex.webhook_model import WebhookRequest
+
+
+class WebhookDeduplicator:
+    def __init__(self, max_entries: int, ttl: float):
+        # (id транзакции, статус) -> хэш тела вебхука
+        self.seen = TTLCache(max_entries, ttl)
+        self.dropped = 0
+
+    @staticmethod
+    def _digest(body: bytes) -> bytes:
+        return hashlib.blake2b(body, digest_size=16).digest()
+
+    # Регистрация вебхука: True, если такой вебхук уже принимался (повтор отбрасывается)
+    def is_duplicate(self, webhook: WebhookRequest, body: bytes) -> bool:
+        key = (webhook.id, webhook.state)
+        digest = self._digest(body)
+
+        # Тот же статус с другим телом (например, исправленная сумма) - не повтор
+        if self.seen.get(key) == digest:
+            self.dropped += 1
+            return True
+
+        self.seen.set(key, digest)
+        return False
+
+    # Снятие отметки, если вебхук не удалось обработать (повтор провайдера должен пройти)
+    def forget(self, webhook: WebhookRequest):
+        self.seen.pop((webhook.id, webhook.state))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "dedup_entries": len(self.seen),
+            "dedup_dropped": self.dropped
+        }
+
+
+# Создание объекта класса WebhookDeduplicator
+webhook_dedup = WebhookDeduplicator(settings.webhook_dedup_max_entries, settings.webhook_dedup_ttl)
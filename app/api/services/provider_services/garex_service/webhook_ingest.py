@@ -0,0 +1,109 @@
+# ПРИЕМ ВЕБХУКОВ GAREX С БЫСТРЫМ ПОДТВЕРЖДЕНИЕМ
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.utils.durable_queue import DurableQueue
+
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookIngestor:
+    def __init__(self,
+                 handler: Callable[[bytes], Awaitable[None]],
+                 on_drop: Optional[Callable[[bytes], None]] = None):
+        self.handler = handler  # Обработка тела вебхука (логика статусов и колбэк мерчанту)
+        self.on_drop = on_drop  # Вызывается для вебхука, отброшенного после всех попыток
+        self.journal: Optional[DurableQueue] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+        # Статистика обработки
+        self.accepted = 0
+        self.processed = 0
+        self.failed = 0
+
+    async def start(self):
+        # Журнал принятых вебхуков: необработанные вебхуки переживают перезапуск
+        self.journal = DurableQueue(settings.webhook_journal_path, "webhooks")
+        self.queue = asyncio.Queue(maxsize=settings.webhook_queue_size)
+
+        for _ in range(settings.webhook_workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+        if self.journal:
+            await self.journal.close()
+
+    # Запись вебхука в журнал и постановка в очередь обработки
+    async def enqueue(self, order_id: str, body: bytes):
+        if self.journal is None or self.queue is None:
+            raise RuntimeError("Webhook ingestor is not started")
+
+        self.accepted += 1
+        if self.queue.full():
+            # Очередь переполнена - вебхук заберет sweeper из журнала
+            await self.journal.add(order_id, body, time.time())
+            return
+
+        received_at = time.time()
+        item_id = await self.journal.add(order_id, body, received_at + settings.webhook_lease)
+        try:
+            self.queue.put_nowait((item_id, order_id, body, 0, received_at))
+        except asyncio.QueueFull:
+            # Очередь заполнилась во время записи в журнал - элемент заберет sweeper после lease
+            pass
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(settings.webhook_sweep_interval)
+            try:
+                free_slots = self.queue.maxsize - self.queue.qsize()
+                if free_slots <= 0:
+                    continue
+
+                for row in await self.journal.claim_due(free_slots, settings.webhook_lease):
+                    self.queue.put_nowait(row)
+
+            except Exception as e:
+                logger.error(f"Webhook sweeper error: {str(e)}")
+
+    async def _worker(self):
+        while True:
+            item_id, order_id, body, attempts, _ = await self.queue.get()
+            try:
+                await self.handler(body)
+                await self.journal.delete(item_id)
+                self.processed += 1
+
+            except Exception as e:
+                attempts += 1
+                logger.error(f"Error with webhook: {order_id} attempt: {attempts} error: {str(e)}")
+                if attempts >= settings.webhook_max_attempts:
+                    await self.journal.delete(item_id)
+                    self.failed += 1
+                    if self.on_drop is not None:
+                        self.on_drop(body)
+                else:
+                    await self.journal.reschedule(item_id, attempts, time.time() + settings.webhook_sweep_interval * 2 ** attempts)
+
+            finally:
+                self.queue.task_done()
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "journal_pending": await self.journal.pending_count() if self.journal else 0,
+            "accepted": self.accepted,
+            "processed": self.processed,
+            "failed": self.failed
+        }
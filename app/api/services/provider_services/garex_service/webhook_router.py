@@ -1,11 +1,19 @@
 # РОУТЕР ВЕБХУКОВ ПРОВАЙДЕРА GAREX
-import httpx
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+import hmac
+from pydantic import ValidationError
 import logging
-from typing import Dict, Any
-import asyncio
 
 from app.core.config import settings
+from app.api.services.provider_services.our.callback_service import callback_dispatcher
+from app.api.services.provider_services.our.signature_service import hmac_hexdigest
+from app.api.services.provider_services.garex_service.webhook_ingest import WebhookIngestor
+from app.api.services.provider_services.garex_service.webhook_dedup import webhook_dedup
+from app.api.services.provider_services.garex_service.order_states import order_states
+from app.api.security.merchant_registry import merchant_registry
+from app.api.services.transaction_store import transaction_store
+from app.api.services.status_cache import status_cache
+from app.api.services.status_watch import status_watch
 from app.models.garex.webhook_model import WebhookRequest as WebhookRequestFrom
 from app.models.paygatecore.other_models import WebhookRequest as WebhookRequestTo
 from app.api.resources.garex_resources.transaction_resources import transactions_res
@@ -15,22 +23,6 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-async def _send_callback(webhook_url:str, webhook_data: WebhookRequestTo):
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                webhook_url,
-                json=webhook_data,
-                headers={"Content-Type": "application/json"}
-            )
-
-            if response.status_code == 200:
-                logger.info(f"Webhook sent successfully to: {webhook_url}")
-
-    except Exception as e:
-        logger.info(f"Webhook sent failed: {str(e)}")
-
-
 def _check_paid_amount(state: str) -> bool:
     if state in [
         transactions_res.STATUS_PAID,
@@ -40,66 +32,157 @@ def _check_paid_amount(state: str) -> bool:
     return False
 
 
+# Проверка поля sign: HMAC SHA-256 от "id:orderId:state:amount:fee" на секрете вебхуков провайдера
+def _check_sign(webhook: WebhookRequestFrom) -> bool:
+    secret = settings.providers["garex"].get("webhook_secret")
+    if not secret:
+        return True
+
+    expected = hmac_hexdigest(
+        secret,
+        f"{webhook.id}:{webhook.orderId}:{webhook.state}:{webhook.amount}:{webhook.fee}".encode("utf-8")
+    )
+    return hmac.compare_digest(expected, webhook.sign.lower())
+
+
+# URL колбэка мерчанта транзакции (без своего URL в реестре - общий из настроек)
+async def _callback_url(provider_id: int) -> str:
+    merchant_id = await transaction_store.merchant_of("garex", provider_id)
+    merchant = merchant_registry.get(merchant_id) if merchant_id else None
+    if merchant is not None and merchant.callback_url:
+        return merchant.callback_url
+    return settings.webhook_base_url
+
+
+# Обработка вебхука: логика статусов и колбэк мерчанту
+async def process_webhook(webhook: WebhookRequestFrom):
+    logger.info(f"New webhook: {webhook.orderId}")
+
+    if webhook.state not in transactions_res.ALL_STATUSES:
+        logger.info(f"Unknown transaction: {webhook.orderId} status: {webhook.state}")
+        return
+
+    # Устаревшие и откатывающие статус назад вебхуки не доходят до мерчанта
+    if not order_states.advance(webhook.orderId, webhook.state):
+        logger.info(f"Stale webhook dropped: {webhook.orderId} status: {webhook.state} current: {order_states.state(webhook.orderId)}")
+        return
+
+    paid_amount = str(webhook.amount) if _check_paid_amount(webhook.state) else None
+    transaction_store.record_status("garex", webhook.id, webhook.state, paid_amount)
+    status_cache.put("garex", webhook.id, webhook.state, paid_amount)
+    status_watch.notify(("garex", webhook.id))
+
+    # Мерчант уведомляется только об оплате, отмене и ошибке
+    if webhook.state == transactions_res.STATUS_CREATED:
+        logger.info(f"Transaction created: {webhook.orderId}")
+        return
+
+    elif webhook.state == transactions_res.STATUS_PENDING:
+        logger.info(f"Transaction pending payment: {webhook.orderId}")
+        return
+
+    elif webhook.state == transactions_res.STATUS_PAID:
+        logger.info(f"Transaction paid: {webhook.orderId}")
+
+    elif webhook.state == transactions_res.STATUS_FINISHED:
+        logger.info(f"Transaction finished successfully: {webhook.orderId}")
+        return
+
+    elif webhook.state == transactions_res.STATUS_CANCELED:
+        logger.info(f"Transaction cancelled: {webhook.orderId}")
+
+    elif webhook.state == transactions_res.STATUS_DISPUTE:
+        logger.info(f"Transaction disputing: {webhook.orderId}")
+        return
+
+    elif webhook.state == transactions_res.STATUS_FAILED:
+        logger.info(f"Transaction failed: {webhook.orderId}")
+
+    webhook_data_to = WebhookRequestTo(
+        id=webhook.id,
+        merchant_transaction_id=webhook.orderId,
+        type="",
+        amount=str(webhook.amount),
+        paid_amount=str(webhook.amount) if _check_paid_amount(webhook.state) else "0",
+        currency="RUB",
+        currency_rate=str(webhook.rate),
+        amount_in_usd=str(webhook.amount / webhook.rate),
+        status=webhook.state
+    )
+
+    webhook_url = await _callback_url(webhook.id)
+    await callback_dispatcher.enqueue(webhook_url, webhook_data_to.model_dump_json().encode("utf-8"))
+
+
+async def _process_webhook_body(body: bytes):
+    await process_webhook(WebhookRequestFrom.model_validate_json(body))
+
+
+# Отброшенный после всех попыток вебхук снимается с дедупликации: повтор провайдера будет обработан
+def _forget_webhook_body(body: bytes):
+    webhook_dedup.forget(WebhookRequestFrom.model_validate_json(body))
+
+
+# Создание объекта класса WebhookIngestor
+webhook_ingestor = WebhookIngestor(_process_webhook_body, _forget_webhook_body)
+
+
 @router.post("/garex", status_code=200)
-async def handle_transaction_webhook(
-        webhook_data_from: Dict[str, Any]
-):
+async def handle_transaction_webhook(request: Request):
+    # Тело валидируется сразу в модель, без промежуточного словаря
+    body = await request.body()
     try:
-        webhook = WebhookRequestFrom(**webhook_data_from)
-        logger.info(f"New webhook: {webhook.orderId}")
-
-        if webhook.state not in transactions_res.ALL_STATUSES:
-            logger.info(f"Unknown transaction: {webhook.orderId} status: {webhook.state}")
-            raise
-
-        if webhook.state == transactions_res.STATUS_CREATED:
-            logger.info(f"Transaction created: {webhook.orderId}")
-            raise
-
-        elif webhook.state == transactions_res.STATUS_PENDING:
-            logger.info(f"Transaction pending payment: {webhook.orderId}")
-            raise
-
-        elif webhook.state == transactions_res.STATUS_PAID:
-            logger.info(f"Transaction paid: {webhook.orderId}")
-
-        elif webhook.status == transactions_res.STATUS_FINISHED:
-            logger.info(f"Transaction finished successfully: {webhook.orderId}")
-            raise
-
-        elif webhook.status == transactions_res.STATUS_CANCELED:
-            logger.info(f"Transaction cancelled: {webhook.orderId}")
-
-        elif webhook.status == transactions_res.STATUS_DISPUTE:
-            logger.info(f"Transaction disputing: {webhook.orderId}")
-            raise
-
-        elif webhook.status == transactions_res.STATUS_FAILED:
-            logger.info(f"Transaction failed: {webhook.orderId}")
-
-        webhook_data_to = WebhookRequestTo(
-            id=webhook.id,
-            merchant_transaction_id=webhook.orderId,
-            type="",
-            amount=str(webhook.amount),
-            paid_amount=str(webhook.amount) if _check_paid_amount(webhook.state) else "0",
-            currency="RUB",
-            currency_rate=str(webhook.rate),
-            amount_in_usd=str(webhook.amount / webhook.rate),
-            status=webhook.state
+        webhook = WebhookRequestFrom.model_validate_json(body)
+    except ValidationError as e:
+        logger.error(f"Invalid webhook: {str(e)}")
+        raise HTTPException(
+            status_code=400,
+            detail="Невалидное тело вебхука"
         )
 
-        webhook_url = settings.webhook_base_url
-        asyncio.create_task(
-            _send_callback(webhook_url, webhook_data_to)
+    if not _check_sign(webhook):
+        logger.error(f"Invalid webhook sign: {webhook.orderId}")
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid signature"
         )
 
+    # Повтор уже принятого вебхука подтверждается без обработки и колбэка
+    if webhook_dedup.is_duplicate(webhook, body):
+        logger.info(f"Duplicate webhook dropped: {webhook.orderId} status: {webhook.state}")
+        return {
+            "code": "200",
+            "message": "Webhook already processed"
+        }
+
+    # Быстрое подтверждение: вебхук записан в журнал, обработка в фоне
+    if settings.webhook_fast_ack:
+        try:
+            await webhook_ingestor.enqueue(webhook.orderId, body)
+        except Exception as e:
+            # Вебхук не записан - повтор провайдера не должен считаться дублем
+            webhook_dedup.forget(webhook)
+            logger.error(f"Error with webhook enqueue: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Ошибка при приеме вебхука: {str(e)}"
+            )
+
+        return {
+            "code": "200",
+            "message": "Webhook accepted"
+        }
+
+    try:
+        await process_webhook(webhook)
+
         return {
             "code": "200",
             "message": "Webhook processed successfully"
         }
 
     except Exception as e:
+        webhook_dedup.forget(webhook)
         logger.error(f"Error with webhook: {str(e)}")
         raise HTTPException(
             status_code=500,
@@ -0,0 +1,179 @@
+# СЕРВИС ДОСТАВКИ КОЛБЭКОВ МЕРЧАНТУ
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Dict, Any, Optional, List
+
+import httpx
+
+from app.core.config import settings
+from app.utils.durable_queue import DurableQueue
+from app.api.services.provider_services.our.signature_service import calculate_signature_raw
+
+
+logger = logging.getLogger(__name__)
+
+
+# Коды ответа мерчанта, при которых доставку имеет смысл повторить
+RETRYABLE_STATUSES = {408, 425, 429}
+
+
+class CallbackDispatcher:
+    def __init__(self):
+        self.journal: Optional[DurableQueue] = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+        # Статистика доставки
+        self.delivered = 0
+        self.retried = 0
+        self.dropped = 0
+        self.in_flight = 0
+        self._latencies: deque = deque(maxlen=1000)
+
+    @staticmethod
+    def _backoff(attempts: int) -> float:
+        delay = min(settings.callback_retry_base_delay * 2 ** (attempts - 1), settings.callback_retry_max_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+    # Запуск воркеров (вызывается при старте приложения)
+    async def start(self):
+        # Журнал колбэков на диске: недоставленные колбэки переживают перезапуск
+        self.journal = DurableQueue(settings.callback_journal_path, "callbacks")
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.callback_timeout, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=settings.callback_workers,
+                max_keepalive_connections=settings.callback_workers
+            )
+        )
+        self.queue = asyncio.Queue(maxsize=settings.callback_queue_size)
+
+        for _ in range(settings.callback_workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+        # Подхватывает отложенные повторы и колбэки, не доставленные до перезапуска
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+        logger.info(f"Callback dispatcher started: {settings.callback_workers} workers, "
+                    f"{await self.journal.pending_count()} pending in journal")
+
+    # Остановка воркеров (недоставленные колбэки остаются в журнале)
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+        if self.client:
+            await self.client.aclose()
+        if self.journal:
+            await self.journal.close()
+
+    # Постановка колбэка в очередь доставки
+    async def enqueue(self, url: str, payload: bytes):
+        if self.journal is None or self.queue is None:
+            raise RuntimeError("Callback dispatcher is not started")
+
+        if self.queue.full():
+            # Очередь переполнена - колбэк заберет sweeper из журнала
+            await self.journal.add(url, payload, time.time())
+            logger.warning(f"Callback queue is full, deferred to journal: {url}")
+            return
+
+        created_at = time.time()
+        callback_id = await self.journal.add(url, payload, created_at + settings.callback_lease)
+        try:
+            self.queue.put_nowait((callback_id, url, payload, 0, created_at))
+        except asyncio.QueueFull:
+            # Очередь заполнилась во время записи в журнал - элемент заберет sweeper после lease
+            pass
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(settings.callback_sweep_interval)
+            try:
+                free_slots = self.queue.maxsize - self.queue.qsize()
+                if free_slots <= 0:
+                    continue
+
+                for row in await self.journal.claim_due(free_slots, settings.callback_lease):
+                    self.queue.put_nowait(row)
+
+            except Exception as e:
+                logger.error(f"Callback sweeper error: {str(e)}")
+
+    async def _worker(self):
+        while True:
+            callback_id, url, payload, attempts, created_at = await self.queue.get()
+            self.in_flight += 1
+            try:
+                await self._deliver(callback_id, url, payload, attempts, created_at)
+            except Exception as e:
+                logger.error(f"Callback worker error: {str(e)}")
+            finally:
+                self.in_flight -= 1
+                self.queue.task_done()
+
+    async def _deliver(self, callback_id: int, url: str, payload: bytes, attempts: int, created_at: float):
+        attempts += 1
+        retryable = True
+        try:
+            response = await self.client.post(
+                url,
+                content=payload,
+                headers={
+                    "Content-Type": "application/json",
+                    # Подпись по тем же байтам, что уходят мерчанту
+                    "X-Signature": calculate_signature_raw(url, payload, settings.webhook_secret_key)
+                }
+            )
+
+            if response.is_success:
+                await self.journal.delete(callback_id)
+                self.delivered += 1
+                self._latencies.append(time.time() - created_at)
+                logger.info(f"Webhook sent successfully to: {url}")
+                return
+
+            retryable = response.status_code >= 500 or response.status_code in RETRYABLE_STATUSES
+            logger.info(f"Webhook sent failed: {url} status: {response.status_code} attempt: {attempts}")
+
+        except httpx.HTTPError as e:
+            logger.info(f"Webhook sent failed: {url} error: {str(e)} attempt: {attempts}")
+
+        if not retryable or attempts >= settings.callback_max_attempts:
+            await self.journal.delete(callback_id)
+            self.dropped += 1
+            logger.error(f"Webhook dropped after {attempts} attempts: {url}")
+            return
+
+        await self.journal.reschedule(callback_id, attempts, time.time() + self._backoff(attempts))
+        self.retried += 1
+
+    # Статистика для мониторинга
+    async def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 4)
+
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "journal_pending": await self.journal.pending_count() if self.journal else 0,
+            "in_flight": self.in_flight,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "latency_p99": percentile(0.99)
+        }
+
+
+# Создание объекта класса CallbackDispatcher
+callback_dispatcher = CallbackDispatcher()
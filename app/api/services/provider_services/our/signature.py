@@ -19,16 +19,6 @@ async def verify_webhook_signature(request: Request):
             detail="No secret key provided"
         )
 
-    # Получение тела запроса
-    try:
-        body_bytes = await request.body()
-        request_body = json.loads(body_bytes.decode("utf-8"))
-    except json.JSONDecodeError:
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid format: JSON"
-        )
-
     # Получение подписи из заголовка
     signature_header = request.headers.get("X-Signature")
     if not signature_header:
@@ -40,11 +30,21 @@ async def verify_webhook_signature(request: Request):
     # Получение полного URL запроса
     full_url = str(request.url)
 
-    # Проверка подписи
-    if not verify_signature(full_url, request_body, signature_header, settings.webhook_secret_key):
+    # Проверка подписи по байтам тела до разбора JSON
+    body_bytes = await request.body()
+    if not verify_signature(full_url, body_bytes, signature_header, settings.webhook_secret_key):
         raise HTTPException(
             status_code=401,
             detail="Invalid signature"
         )
 
+    # Получение тела запроса
+    try:
+        request_body = json.loads(body_bytes)
+    except json.JSONDecodeError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid format: JSON"
+        )
+
     return request_body
@@ -2,6 +2,7 @@
 import hashlib
 import hmac
 import json
+from functools import lru_cache
 from urllib.parse import urlparse
 from typing import Dict, Any
 import logging
@@ -10,35 +11,44 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-# Вычисление подписи для вебхука
-def calculate_signature(url: str, request_body: Dict[str, Any], secret: str) -> str:
-    try:
-        request_json_string = json.dumps(request_body)
-        parsed_url = urlparse(url)
-        signature_string = request_json_string + parsed_url.path + parsed_url.query
+# Подготовленное состояние HMAC для секрета (ключ обрабатывается один раз, дальше только copy)
+@lru_cache(maxsize=32)
+def _hmac_state(secret: str):
+    return hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+
+
+# HMAC SHA-256 от последовательности байтовых частей
+def hmac_hexdigest(secret: str, *parts: bytes) -> str:
+    state = _hmac_state(secret).copy()
+    for part in parts:
+        state.update(part)
+    return state.hexdigest()
 
-        # HMAC SHA-256
-        signature = hmac.new(
-            secret.encode("utf-8"),
-            signature_string.encode("utf-8"),
-            hashlib.sha256
-        ).hexdigest().lower()
 
-        return signature
+# Вычисление подписи по байтам тела в том виде, в каком они передаются по сети
+def calculate_signature_raw(url: str, body: bytes, secret: str) -> str:
+    try:
+        parsed_url = urlparse(url)
+        return hmac_hexdigest(secret, body, (parsed_url.path + parsed_url.query).encode("utf-8"))
 
     except Exception as e:
         logger.error(f"Error with calculate signature: {str(e)}")
         raise
 
 
-# Проверка подписи вебхука
-def verify_signature(url: str, request_body: Dict[str, Any], signature_header: str, secret: str) -> bool:
+# Вычисление подписи для вебхука
+def calculate_signature(url: str, request_body: Dict[str, Any], secret: str) -> str:
+    return calculate_signature_raw(url, json.dumps(request_body).encode("utf-8"), secret)
+
+
+# Проверка подписи вебхука по полученным байтам тела (без разбора и повторной сериализации)
+def verify_signature(url: str, body: bytes, signature_header: str, secret: str) -> bool:
     if not signature_header:
         logger.warning("No headers: X-Signature")
         return False
 
     try:
-        expected_signature = calculate_signature(url, request_body, secret)
+        expected_signature = calculate_signature_raw(url, body, secret)
         return hmac.compare_digest(expected_signature, signature_header.lower())
 
     except Exception as e:
@@ -0,0 +1,105 @@
+# КЭШ СТАТУСОВ ТРАНЗАКЦИЙ
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.api.resources.providers_resources import providers_res
+from app.api.resources.garex_resources.transaction_resources import transactions_res
+from app.api.services.provider_services.garex_service.order_states import order_states
+from app.api.services.transaction_store import transaction_store
+from app.api.services.status_watch import status_watch
+from app.utils.single_flight import SingleFlight
+from app.utils.ttl_cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+
+# Статусы, которые уже не меняются - хранятся долго (canceled может перейти в dispute, поэтому не входит)
+FINAL_STATUSES = frozenset(transactions_res.TERMINAL_STATUSES)
+
+# Статусы, при которых сумма оплаты равна сумме транзакции
+PAID_STATUSES = frozenset([
+    transactions_res.STATUS_PAID,
+    transactions_res.STATUS_FINISHED
+])
+
+
+# Статус в кэше: (статус, сумма оплаты или None, время обновления)
+CachedStatus = Tuple[str, Optional[str], float]
+
+
+class StatusCache:
+    def __init__(self):
+        self.cache = TTLCache(settings.status_cache_max_entries, settings.status_cache_ttl)
+        self.single_flight = SingleFlight()
+
+        self.hits = 0
+        self.refreshes = 0
+
+    @staticmethod
+    def ttl(status: str) -> float:
+        return settings.status_cache_final_ttl if status in FINAL_STATUSES else settings.status_cache_ttl
+
+    @staticmethod
+    def paid_amount(status: str, amount: Any) -> Optional[str]:
+        return str(amount) if status in PAID_STATUSES else None
+
+    # Статус из вебхука провайдера или ответа на запрос статуса
+    def put(self, provider: str, provider_id: int, status: str, paid_amount: Optional[str]):
+        self.cache.set((provider, provider_id), (status, paid_amount, time.time()), ttl=self.ttl(status))
+
+    # Статус транзакции: из кэша, иначе один общий запрос к провайдеру на все одновременные чтения
+    async def get(self, provider: str, provider_id: int, order_id: str) -> CachedStatus:
+        cached = self.cache.get((provider, provider_id))
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        return await self.single_flight.do(
+            (provider, provider_id),
+            lambda: self._refresh(provider, provider_id, order_id)
+        )
+
+    async def _refresh(self, provider: str, provider_id: int, order_id: str) -> CachedStatus:
+        self.refreshes += 1
+        status, amount = await providers_res.PROVIDERS[provider].get_status(provider_id)
+        if status not in transactions_res.ALL_STATUSES:
+            raise HTTPException(
+                status_code=502,
+                detail={
+                    "code": "502",
+                    "message": f"Неизвестный статус провайдера: {status}"
+                }
+            )
+
+        # Ответ на опрос проходит те же переходы, что и вебхуки: устаревший статус не откатывает хранилище
+        if not order_states.advance(order_id, status):
+            current = order_states.state(order_id)
+            logger.info(f"Stale provider status ignored: {order_id} status: {status} current: {current}")
+            cached = (current, None, time.time())
+            self.cache.set((provider, provider_id), cached, ttl=self.ttl(current))
+            return cached
+
+        paid_amount = self.paid_amount(status, amount)
+        cached = (status, paid_amount, time.time())
+        self.cache.set((provider, provider_id), cached, ttl=self.ttl(status))
+        transaction_store.record_status(provider, provider_id, status, paid_amount)
+        status_watch.notify((provider, provider_id))
+        logger.info(f"Status refreshed from provider: {provider} id: {provider_id} status: {status}")
+        return cached
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.cache),
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "coalesced": self.single_flight.coalesced
+        }
+
+
+# Создание объекта класса StatusCache
+status_cache = StatusCache()
@@ -0,0 +1,45 @@
+# ПОДПИСКИ НА ИЗМЕНЕНИЕ СТАТУСА ТРАНЗАКЦИЙ
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterator, List
+
+
+class StatusWatch:
+    def __init__(self):
+        # Ключ транзакции -> [событие, количество ожидающих]; событие создается только при наличии подписчиков
+        self._events: Dict[Hashable, List[Any]] = {}
+        self.notified = 0
+
+    # Регистрация ожидающего: состояние транзакции читается уже после регистрации,
+    # поэтому уведомление между чтением и ожиданием не теряется
+    @contextmanager
+    def watch(self, key: Hashable) -> Iterator[asyncio.Event]:
+        entry = self._events.get(key)
+        if entry is None:
+            entry = self._events[key] = [asyncio.Event(), 0]
+        entry[1] += 1
+
+        try:
+            yield entry[0]
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._events.get(key) is entry:
+                del self._events[key]
+
+    # Пробуждение всех ожидающих транзакцию (следующие ожидания получат новое событие)
+    def notify(self, key: Hashable):
+        entry = self._events.pop(key, None)
+        if entry is not None:
+            self.notified += entry[1]
+            entry[0].set()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "watched": len(self._events),
+            "waiting": sum(entry[1] for entry in self._events.values()),
+            "notified": self.notified
+        }
+
+
+# Создание объекта класса StatusWatch
+status_watch = StatusWatch()
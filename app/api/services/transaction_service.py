@@ -0,0 +1,231 @@
+# СЕРВИС ЧТЕНИЯ ТРАНЗАКЦИЙ ИЗ ЛОКАЛЬНОГО ХРАНИЛИЩА
+import asyncio
+import base64
+import logging
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException, Response
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.api.services.transaction_store import transaction_store
+from app.api.services.status_cache import status_cache, FINAL_STATUSES
+from app.api.services.status_watch import status_watch
+from app.models.paygatecore.other_models import (
+    InfoTransactionResponse,
+    TransactionListResponse,
+    TransactionStatusItem
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Сериализатор ответа массовой проверки статусов
+_status_items = TypeAdapter(List[TransactionStatusItem])
+
+
+def _to_info(row: Dict[str, Any]) -> InfoTransactionResponse:
+    return InfoTransactionResponse(
+        id=row["provider_id"],
+        created_at=datetime.fromtimestamp(row["created_at"]),
+        updated_at=datetime.fromtimestamp(row["updated_at"]),
+        expires_at=datetime.fromisoformat(row["expires_at"]),
+        merchant_transaction_id=row["merchant_transaction_id"],
+        type=row["type"],
+        payment_method=row["payment_method"],
+        amount=row["amount"],
+        paid_amount=row["paid_amount"],
+        currency=row["currency"],
+        currency_rate=row["currency_rate"],
+        amount_in_usd=row["amount_in_usd"],
+        rate=row["rate"],
+        commission=row["commission"],
+        status=row["status"],
+        paid_at=datetime.fromtimestamp(row["paid_at"]) if row["paid_at"] is not None else None,
+        card_number=row["card_number"],
+        phone_number=row["phone_number"],
+        owner_name=row["owner_name"],
+        bank_name=row["bank_name"] or ""
+    )
+
+
+# Курсор - ключ (created_at, rowid) последней записи страницы
+def _encode_cursor(row: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(f"{row['created_at']!r}:{row['row_id']}".encode("ascii")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii").split(":")
+        return float(created_at), int(row_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "code": "400",
+                "message": "Некорректный курсор страницы"
+            }
+        )
+
+
+# Актуальный статус: запись хранилища, если она свежее TTL своего статуса, иначе кэш или провайдер
+async def _refresh_status(row: Dict[str, Any]):
+    if time.time() - row["updated_at"] < status_cache.ttl(row["status"]):
+        return
+
+    try:
+        status, paid_amount, updated_at = await status_cache.get(row["provider"], row["provider_id"], row["merchant_transaction_id"])
+    except (HTTPException, httpx.HTTPError) as e:
+        # Провайдер недоступен - отдается последний известный статус
+        logger.warning(f"Status refresh failed: {row['merchant_transaction_id']} error: {str(e)}")
+        return
+
+    row["status"] = status
+    if paid_amount is not None:
+        row["paid_amount"] = paid_amount
+    row["updated_at"] = max(row["updated_at"], updated_at)
+
+
+async def _load_transaction(merchant_id: str, merchant_transaction_id: str) -> Dict[str, Any]:
+    row = await transaction_store.get(merchant_id, merchant_transaction_id)
+    if row is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "code": "404",
+                "message": f"Транзакция {merchant_transaction_id} не найдена"
+            }
+        )
+
+    await _refresh_status(row)
+    return row
+
+
+async def get_transaction(merchant_id: str, merchant_transaction_id: str) -> InfoTransactionResponse:
+    return _to_info(await _load_transaction(merchant_id, merchant_transaction_id))
+
+
+# Ожидание смены статуса: True - статус сменился, False - истек timeout.
+# Будит обработка вебхука; перечитывание хранилища раз в status_watch_recheck ловит вебхуки других воркеров
+async def _wait_change(row: Dict[str, Any], timeout: float) -> Tuple[Dict[str, Any], bool]:
+    key = (row["provider"], row["provider_id"])
+    deadline = time.monotonic() + timeout
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return row, False
+
+        with status_watch.watch(key) as changed:
+            current = await transaction_store.get(row["merchant_id"], row["merchant_transaction_id"])
+            if current is not None and (current["status"], current["paid_amount"]) != (row["status"], row["paid_amount"]):
+                return current, True
+
+            try:
+                await asyncio.wait_for(changed.wait(), min(remaining, settings.status_watch_recheck))
+            except asyncio.TimeoutError:
+                pass
+
+
+# Long-poll: ответ сразу, если статус отличается от известного клиенту или уже конечный, иначе - после смены или timeout
+async def wait_transaction(merchant_id: str,
+                           merchant_transaction_id: str,
+                           known_status: Optional[str],
+                           timeout: float) -> InfoTransactionResponse:
+    row = await _load_transaction(merchant_id, merchant_transaction_id)
+    if row["status"] in FINAL_STATUSES or (known_status is not None and known_status != row["status"]):
+        return _to_info(row)
+
+    row, _ = await _wait_change(row, timeout)
+    return _to_info(row)
+
+
+def _sse_event(row: Dict[str, Any]) -> bytes:
+    return f"event: status\ndata: {_to_info(row).model_dump_json()}\n\n".encode("utf-8")
+
+
+# Поток SSE: текущее состояние, затем событие на каждую смену статуса; закрывается на конечном статусе
+async def stream_transaction(merchant_id: str, merchant_transaction_id: str) -> AsyncIterator[bytes]:
+    row = await _load_transaction(merchant_id, merchant_transaction_id)
+
+    async def events() -> AsyncIterator[bytes]:
+        nonlocal row
+        yield _sse_event(row)
+
+        while row["status"] not in FINAL_STATUSES:
+            row, changed = await _wait_change(row, settings.status_watch_recheck)
+            # Комментарий-keepalive не дает прокси закрыть простаивающее соединение
+            yield _sse_event(row) if changed else b": keepalive\n\n"
+
+    return events()
+
+
+# Список транзакций: по курсору (основной режим) или по номеру страницы (совместимость, OFFSET)
+async def list_transactions(merchant_id: str,
+                            status: Optional[str],
+                            payment_method: Optional[str],
+                            created_from: Optional[datetime],
+                            created_to: Optional[datetime],
+                            cursor: Optional[str],
+                            page_size: int,
+                            page_number: Optional[int]) -> TransactionListResponse:
+    after = _decode_cursor(cursor) if cursor else None
+    offset = (page_number - 1) * page_size if page_number and after is None else 0
+
+    # OFFSET просматривает все пропускаемые записи - глубокие страницы только по курсору
+    if offset > settings.transaction_list_max_offset:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "code": "400",
+                "message": "Слишком большой номер страницы, используйте курсор next_cursor"
+            }
+        )
+
+    # Лишняя запись показывает, есть ли следующая страница
+    rows = await transaction_store.list(
+        merchant_id,
+        status=status,
+        payment_method=payment_method,
+        created_from=created_from.timestamp() if created_from else None,
+        created_to=created_to.timestamp() if created_to else None,
+        after=after,
+        offset=offset,
+        limit=page_size + 1
+    )
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    return TransactionListResponse(
+        items=[_to_info(row) for row in rows],
+        next_cursor=_encode_cursor(rows[-1]) if has_next else None,
+        page_size=page_size,
+        page_number=page_number if after is None else None
+    )
+
+
+# Статусы транзакций в порядке запроса: элементы из хранилища собираются без валидации (model_construct),
+# сериализация - по той же схеме TransactionStatusItem, что объявлена в ответе эндпоинта
+async def get_statuses(merchant_id: str, merchant_transaction_ids: List[str]) -> Response:
+    found = await transaction_store.get_statuses(merchant_id, merchant_transaction_ids)
+
+    items = []
+    for merchant_transaction_id in merchant_transaction_ids:
+        row = found.get(merchant_transaction_id)
+        if row is None:
+            items.append(TransactionStatusItem.model_construct(merchant_transaction_id=merchant_transaction_id))
+            continue
+
+        provider_id, status, paid_amount, updated_at = row
+        items.append(TransactionStatusItem.model_construct(
+            merchant_transaction_id=merchant_transaction_id,
+            id=provider_id,
+            status=status,
+            paid_amount=paid_amount,
+            updated_at=datetime.fromtimestamp(updated_at)
+        ))
+
+    return Response(content=_status_items.dump_json(items), media_type="application/json")
@@ -0,0 +1,362 @@
+# ЛОКАЛЬНОЕ ХРАНИЛИЩЕ ТРАНЗАКЦИЙ (SQLITE В РЕЖИМЕ WAL)
+import asyncio
+import logging
+import queue
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.sqlite_db import connect
+from app.api.resources.garex_resources.transaction_resources import transactions_res
+
+
+logger = logging.getLogger(__name__)
+
+
+# Колонки таблицы транзакций в порядке вставки
+COLUMNS = (
+    "merchant_id",
+    "merchant_transaction_id",
+    "provider",
+    "provider_id",
+    "type",
+    "payment_method",
+    "amount",
+    "paid_amount",
+    "currency",
+    "currency_rate",
+    "amount_in_usd",
+    "rate",
+    "commission",
+    "status",
+    "card_number",
+    "phone_number",
+    "owner_name",
+    "bank_name",
+    "expires_at",
+    "paid_at",
+    "created_at",
+    "updated_at"
+)
+
+INSERT_SQL = (
+    f"INSERT OR REPLACE INTO transactions ({', '.join(COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in COLUMNS)})"
+)
+
+# Обновление по вебхуку провайдера (сумма оплаты и время оплаты - только для оплаченных статусов)
+UPDATE_SQL = (
+    "UPDATE transactions SET status = ?, paid_amount = COALESCE(?, paid_amount), "
+    "paid_at = COALESCE(paid_at, ?), updated_at = ? "
+    "WHERE provider = ? AND provider_id = ?"
+)
+
+
+# Идентификаторов в одном запросе IN (...) при пакетном чтении статусов
+STATUS_CHUNK = 500
+
+
+class TransactionStore:
+    def __init__(self):
+        self.writer: Optional[sqlite3.Connection] = None
+        # Пул соединений чтения и потоки, в которых выполняются чтения
+        self._readers: Optional[queue.SimpleQueue] = None
+        self._read_executor: Optional[ThreadPoolExecutor] = None
+
+        # Записи, ожидающие групповой фиксации: (SQL, параметры)
+        self._pending: List[Tuple[str, tuple]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # Ожидающие фиксации текущего буфера (чтение сразу после записи)
+        self._flush_waiters: List[asyncio.Future] = []
+        # Мерчанты созданных, но еще не зафиксированных транзакций: (provider, provider_id) -> merchant_id
+        self._unflushed_merchants: Dict[Tuple[str, int], str] = {}
+
+        self.commits = 0
+        self.written = 0
+
+    async def start(self):
+        self.writer = connect(settings.transaction_db_path)
+        self.writer.executescript(
+            "CREATE TABLE IF NOT EXISTS transactions ("
+            "merchant_id TEXT NOT NULL, "
+            "merchant_transaction_id TEXT NOT NULL, "
+            "provider TEXT NOT NULL, "
+            "provider_id INTEGER NOT NULL, "
+            "type TEXT NOT NULL, "
+            "payment_method TEXT NOT NULL, "
+            "amount TEXT NOT NULL, "
+            "paid_amount TEXT NOT NULL, "
+            "currency TEXT NOT NULL, "
+            "currency_rate TEXT NOT NULL, "
+            "amount_in_usd TEXT NOT NULL, "
+            "rate TEXT NOT NULL, "
+            "commission TEXT NOT NULL, "
+            "status TEXT NOT NULL, "
+            "card_number TEXT, "
+            "phone_number TEXT, "
+            "owner_name TEXT, "
+            "bank_name TEXT, "
+            "expires_at TEXT, "
+            "paid_at REAL, "
+            "created_at REAL NOT NULL, "
+            "updated_at REAL NOT NULL, "
+            "PRIMARY KEY (merchant_id, merchant_transaction_id));"
+            "CREATE INDEX IF NOT EXISTS transactions_provider ON transactions (provider, provider_id);"
+            "CREATE INDEX IF NOT EXISTS transactions_merchant_created ON transactions (merchant_id, created_at);"
+            "CREATE INDEX IF NOT EXISTS transactions_merchant_status ON transactions (merchant_id, status, created_at);"
+            "CREATE INDEX IF NOT EXISTS transactions_created ON transactions (created_at);"
+        )
+        self._readers = queue.SimpleQueue()
+        for _ in range(settings.transaction_read_threads):
+            self._readers.put(connect(settings.transaction_db_path))
+        self._read_executor = ThreadPoolExecutor(
+            max_workers=settings.transaction_read_threads,
+            thread_name_prefix="transaction-read"
+        )
+
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._flusher())
+
+    async def stop(self):
+        # Остаток буфера фиксируется перед остановкой
+        if self._task:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        if self.writer:
+            self.writer.close()
+        if self._read_executor:
+            self._read_executor.shutdown(wait=True)
+            self._read_executor = None
+        if self._readers:
+            while not self._readers.empty():
+                self._readers.get().close()
+            self._readers = None
+
+    # Запись созданной транзакции (без ожидания фиксации на диске)
+    def record_created(self,
+                       merchant_id: str,
+                       provider: str,
+                       transaction_type: str,
+                       payment_method: str,
+                       result: Any):
+        now = time.time()
+        self._unflushed_merchants[(provider, result.id)] = merchant_id
+        self._add(INSERT_SQL, (
+            merchant_id,
+            result.merchant_transaction_id,
+            provider,
+            result.id,
+            transaction_type,
+            payment_method,
+            result.amount,
+            "0",
+            result.currency,
+            result.currency_rate,
+            result.amount_in_usd,
+            result.rate,
+            result.commission,
+            transactions_res.STATUS_CREATED,
+            getattr(result, "card_number", None),
+            getattr(result, "phone_number", None),
+            getattr(result, "owner_name", None),
+            getattr(result, "bank_name", None),
+            result.expires_at.isoformat(),
+            None,
+            now,
+            now
+        ))
+
+    # Обновление статуса по вебхуку провайдера
+    def record_status(self, provider: str, provider_id: int, status: str, paid_amount: Optional[str] = None):
+        now = time.time()
+        paid_at = now if paid_amount is not None else None
+        self._add(UPDATE_SQL, (status, paid_amount, paid_at, now, provider, provider_id))
+
+    def _add(self, sql: str, params: tuple):
+        self._pending.append((sql, params))
+        if self._wakeup is not None and len(self._pending) >= settings.transaction_commit_batch:
+            self._wakeup.set()
+
+    def _take(self) -> List[Tuple[str, tuple]]:
+        batch, self._pending = self._pending, []
+        return batch
+
+    # Одна транзакция SQLite на пачку записей (порядок записей сохраняется)
+    def _commit(self, batch: List[Tuple[str, tuple]]):
+        self.writer.execute("BEGIN")
+        try:
+            index = 0
+            while index < len(batch):
+                sql = batch[index][0]
+                end = index
+                while end < len(batch) and batch[end][0] == sql:
+                    end += 1
+                self.writer.executemany(sql, [params for _, params in batch[index:end]])
+                index = end
+            self.writer.execute("COMMIT")
+        except Exception:
+            self.writer.execute("ROLLBACK")
+            raise
+
+        self.commits += 1
+        self.written += len(batch)
+
+    # Групповая фиксация: раз в интервал или при наполнении пачки, запись на диск вне цикла событий
+    async def _flusher(self):
+        while True:
+            if not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.transaction_commit_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+            if self._pending:
+                batch = self._take()
+                waiters, self._flush_waiters = self._flush_waiters, []
+                try:
+                    await asyncio.to_thread(self._commit, batch)
+                except Exception as e:
+                    logger.error(f"Transaction store commit error: {str(e)} records lost: {len(batch)}")
+                finally:
+                    for sql, params in batch:
+                        if sql is INSERT_SQL:
+                            self._unflushed_merchants.pop((params[2], params[3]), None)
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_result(None)
+
+            if self._stopping and not self._pending:
+                return
+
+    # Ожидание фиксации уже принятых записей
+    async def flush(self):
+        if not self._pending or self._task is None:
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._flush_waiters.append(waiter)
+        self._wakeup.set()
+        await waiter
+
+    # Чтение на одном из соединений пула в потоке чтения (event loop не ждет диск и блокировки)
+    async def _read(self, fn: Callable[..., Any], *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._read_executor, self._with_reader, fn, *args)
+
+    def _with_reader(self, fn: Callable[..., Any], *args) -> Any:
+        connection = self._readers.get()
+        try:
+            return fn(connection, *args)
+        finally:
+            self._readers.put(connection)
+
+    @staticmethod
+    def _row(cursor: sqlite3.Cursor, row: tuple) -> Dict[str, Any]:
+        return {column[0]: value for column, value in zip(cursor.description, row)}
+
+    async def get(self, merchant_id: str, merchant_transaction_id: str) -> Optional[Dict[str, Any]]:
+        await self.flush()
+        return await self._read(self._get, merchant_id, merchant_transaction_id)
+
+    def _get(self, connection: sqlite3.Connection, merchant_id: str, merchant_transaction_id: str) -> Optional[Dict[str, Any]]:
+        cursor = connection.execute(
+            "SELECT * FROM transactions WHERE merchant_id = ? AND merchant_transaction_id = ?",
+            (merchant_id, merchant_transaction_id)
+        )
+        row = cursor.fetchone()
+        return self._row(cursor, row) if row else None
+
+    # Мерчант транзакции по идентификатору провайдера (None - транзакции нет в хранилище).
+    # Вызывается на каждый вебхук: без принудительной фиксации, незафиксированные записи берутся из памяти
+    async def merchant_of(self, provider: str, provider_id: int) -> Optional[str]:
+        merchant_id = self._unflushed_merchants.get((provider, provider_id))
+        if merchant_id is not None:
+            return merchant_id
+        return await self._read(self._merchant_of, provider, provider_id)
+
+    @staticmethod
+    def _merchant_of(connection: sqlite3.Connection, provider: str, provider_id: int) -> Optional[str]:
+        row = connection.execute(
+            "SELECT merchant_id FROM transactions WHERE provider = ? AND provider_id = ? LIMIT 1",
+            (provider, provider_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    # Статусы набора транзакций мерчанта: merchant_transaction_id -> (provider_id, status, paid_amount, updated_at)
+    async def get_statuses(self, merchant_id: str, merchant_transaction_ids: List[str]) -> Dict[str, tuple]:
+        await self.flush()
+        return await self._read(self._get_statuses, merchant_id, merchant_transaction_ids)
+
+    @staticmethod
+    def _get_statuses(connection: sqlite3.Connection, merchant_id: str, merchant_transaction_ids: List[str]) -> Dict[str, tuple]:
+        found: Dict[str, tuple] = {}
+        unique = list(dict.fromkeys(merchant_transaction_ids))
+        for start in range(0, len(unique), STATUS_CHUNK):
+            chunk = unique[start:start + STATUS_CHUNK]
+            rows = connection.execute(
+                "SELECT merchant_transaction_id, provider_id, status, paid_amount, updated_at FROM transactions "
+                f"WHERE merchant_id = ? AND merchant_transaction_id IN ({', '.join('?' for _ in chunk)})",
+                (merchant_id, *chunk)
+            ).fetchall()
+            for row in rows:
+                found[row[0]] = row[1:]
+        return found
+
+    # Страница транзакций мерчанта от новых к старым.
+    # after - ключ (created_at, rowid) последней записи предыдущей страницы, offset - для постраничного режима
+    async def list(self,
+                   merchant_id: str,
+                   status: Optional[str] = None,
+                   payment_method: Optional[str] = None,
+                   created_from: Optional[float] = None,
+                   created_to: Optional[float] = None,
+                   after: Optional[Tuple[float, int]] = None,
+                   offset: int = 0,
+                   limit: int = 10) -> List[Dict[str, Any]]:
+        await self.flush()
+
+        conditions = ["merchant_id = ?"]
+        params: List[Any] = [merchant_id]
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if payment_method is not None:
+            conditions.append("payment_method = ?")
+            params.append(payment_method)
+        if created_from is not None:
+            conditions.append("created_at >= ?")
+            params.append(created_from)
+        if created_to is not None:
+            conditions.append("created_at < ?")
+            params.append(created_to)
+        if after is not None:
+            conditions.append("(created_at, rowid) < (?, ?)")
+            params.extend(after)
+
+        sql = (
+            f"SELECT rowid AS row_id, * FROM transactions WHERE {' AND '.join(conditions)} "
+            "ORDER BY created_at DESC, rowid DESC LIMIT ? OFFSET ?"
+        )
+        return await self._read(self._list, sql, (*params, limit, offset))
+
+    def _list(self, connection: sqlite3.Connection, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        cursor = connection.execute(sql, params)
+        return [self._row(cursor, row) for row in cursor.fetchall()]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "commits": self.commits,
+            "written": self.written
+        }
+
+
+# Создание объекта класса TransactionStore
+transaction_store = TransactionStore()
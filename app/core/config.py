@@ -1,20 +1,39 @@
 # КОНФИГУРАЦИЯ
-from typing import Dict, Any
+import os
+from typing import Dict, Any, Optional
 
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 
+# Файлы в каталоге данных по умолчанию: настройка пути -> имя файла
+DATA_FILES: Dict[str, str] = {
+    "merchants_path": "merchants.json",
+    "rate_limit_db_path": "rate_limits.db",
+    "callback_journal_path": "callbacks.db",
+    "webhook_journal_path": "webhooks.db",
+    "transaction_db_path": "transactions.db",
+    "idempotency_db_path": "idempotency.db",
+    "payout_db_path": "payouts.db"
+}
+
+
 class Settings(BaseSettings):
     api_base_url: str = "http://localhost:8000"
 
-    # Токен мерчанта в нашем API
+    # Токен мерчанта в нашем API (мерчант "default")
     merchant_token: str = "test_token"
 
+    # Реестр мерчантов: {merchant_id: {"token" | "token_sha256", "providers", "callback_url", лимиты}}
+    merchants: Dict[str, Dict[str, Any]] = {}
+
     # Провайдеры
     providers: Dict[str, Dict[str, Any]] = {
         "garex": {
             "base_url": f"https://stage.garex.one/default",
-            "api_key": "provider_test_key"
+            "api_key": "provider_test_key",
+            # Секрет проверки поля sign во вебхуках (пустой - проверка выключена)
+            "webhook_secret": ""
         }
     }
 
@@ -28,6 +47,147 @@ class Settings(BaseSettings):
     # URL приложения для формирования подписи
     base_webhook_url: str = "http://localhost:8000"
 
+    # Быстрое подтверждение вебхуков провайдера (запись в журнал, обработка в фоне)
+    webhook_fast_ack: bool = True
+    webhook_workers: int = 8
+    webhook_queue_size: int = 10000
+    webhook_max_attempts: int = 5
+    webhook_sweep_interval: float = 1.0
+    webhook_lease: float = 60.0
+
+    # Дедупликация повторных вебхуков провайдера по (id, статус)
+    webhook_dedup_ttl: float = 3600.0
+    webhook_dedup_max_entries: int = 200000
+
+    # Таблица состояний заказов (отбрасывание устаревших вебхуков)
+    order_state_finished_ttl: float = 3600.0  # Сколько хранить завершенный заказ
+    order_state_active_ttl: float = 604800.0  # Сколько хранить заказ без новых вебхуков
+    order_state_sweep_interval: float = 60.0
+
+    # Каталог локальных данных (журналы, хранилища)
+    data_dir: str = "data"
+
+    # Файл реестра мерчантов (перечитывается при изменении без перезапуска)
+    merchants_path: Optional[str] = None  # По умолчанию {data_dir}/merchants.json
+    merchants_reload_interval: float = 5.0
+
+    # Лимиты мерчанта по умолчанию, отдельно для payin и payout (memory | sqlite - общие для воркеров)
+    rate_limit_backend: str = "memory"
+    rate_limit_db_path: Optional[str] = None  # По умолчанию {data_dir}/rate_limits.db
+    merchant_rate_limit: float = 50.0  # Запросов в секунду
+    merchant_burst: float = 100.0
+    merchant_max_concurrency: int = 50  # Одновременных запросов (клиент провайдера держит 100 соединений)
+
+    # Справедливая очередь запросов к провайдеру между мерчантами
+    provider_concurrency: int = 100  # Одновременных запросов к провайдеру (размер пула соединений)
+    fair_queue_default_weight: float = 1.0
+
+    # Исходящие лимиты провайдеров по семействам эндпоинтов (запросов в секунду)
+    provider_rate_limits: Dict[str, Dict[str, Dict[str, float]]] = {
+        "garex": {
+            "payin": {"rate": 50.0, "burst": 50.0},
+            "payout": {"rate": 20.0, "burst": 20.0},
+            "status": {"rate": 20.0, "burst": 20.0}
+        }
+    }
+    provider_rate_max_waiting: int = 50  # Запросов в очереди на токен, сверх - отказ 503
+
+    # Контроль допуска при перегрузке: класс трафика отклоняется, когда нагрузка достигает его порога
+    admission_enabled: bool = True
+    admission_occupancy: float = 0.9  # Доля занятого пула, с которой учитывается очередь к провайдеру
+    admission_queue_limit: int = 200  # Очередь к провайдеру, соответствующая нагрузке 1.0
+    admission_max_loop_lag: float = 0.2  # Задержка цикла событий, соответствующая нагрузке 1.0
+    admission_lag_interval: float = 0.1
+    admission_thresholds: Dict[str, float] = {
+        "payout": 0.5,
+        "payin": 1.0,
+        "webhook": 2.0
+    }
+    admission_retry_after: float = 1.0  # Retry-After на единицу нагрузки, секунды
+
+    # Настройки доставки колбэков мерчанту
+    callback_workers: int = 16
+    callback_queue_size: int = 10000
+    callback_timeout: float = 10.0
+    callback_max_attempts: int = 8
+    callback_retry_base_delay: float = 1.0
+    callback_retry_max_delay: float = 300.0
+    callback_sweep_interval: float = 1.0
+    callback_lease: float = 300.0  # Время резерва колбэка за воркером
+    callback_journal_path: Optional[str] = None  # По умолчанию {data_dir}/callbacks.db
+    webhook_journal_path: Optional[str] = None  # По умолчанию {data_dir}/webhooks.db
+
+    # Локальное хранилище транзакций (групповая фиксация записей)
+    transaction_db_path: Optional[str] = None  # По умолчанию {data_dir}/transactions.db
+    transaction_commit_interval: float = 0.05  # Не дольше, секунды
+    transaction_commit_batch: int = 500  # Записей в пачке, при наполнении - фиксация сразу
+    transaction_read_threads: int = 4  # Потоков (и соединений) чтения
+    transaction_list_max_offset: int = 10000  # Глубже по номеру страницы - только по курсору
+
+    # Кэш статусов транзакций (заполняется вебхуками, промах - один запрос к провайдеру)
+    status_cache_max_entries: int = 100000
+    status_cache_ttl: float = 5.0  # Для промежуточных статусов
+    status_cache_final_ttl: float = 86400.0  # Для конечных статусов (finished, failed)
+
+    # Ожидание смены статуса (long-poll и SSE), пробуждение - обработкой вебхука
+    status_wait_max_timeout: int = 60  # Максимальный timeout long-poll, секунды
+    status_watch_recheck: float = 15.0  # Перечитывание хранилища (вебхук мог прийти на другой воркер) и keepalive SSE
+
+    # Идемпотентность создания транзакций (memory | sqlite)
+    idempotency_backend: str = "memory"
+    idempotency_ttl: float = 86400.0
+    idempotency_max_entries: int = 100000
+    idempotency_db_path: Optional[str] = None  # По умолчанию {data_dir}/idempotency.db
+
+    # Порядок фолбэка методов трансграна
+    transgran_ewma_alpha: float = 0.2
+    transgran_negative_ttl: float = 30.0  # Время жизни ответа "нет свободного реквизита"
+    transgran_amount_bucket: int = 1000  # Шаг корзины суммы для негативного кэша
+
+    # Автоматические выключатели провайдеров (по провайдеру и по методу оплаты)
+    breaker_window: int = 50  # Количество последних запросов для расчета долей
+    breaker_min_requests: int = 20
+    breaker_error_rate: float = 0.5
+    breaker_slow_call: float = 10.0  # Порог медленного ответа, секунды
+    breaker_slow_rate: float = 0.5
+    breaker_open_seconds: float = 30.0
+    breaker_half_open_probes: int = 3
+
+    # Сборка моделей ответа без повторной валидации и сериализация сразу в JSON
+    response_fast_path: bool = False
+
+    # Пакетное создание транзакций (количество одновременных запросов к провайдеру)
+    batch_concurrency: int = 10
+
+    # Массовые выплаты (темп подстраивается под ответы провайдера, запросов в секунду)
+    payout_workers: int = 20
+    payout_rate_initial: float = 10.0
+    payout_rate_min: float = 1.0
+    payout_rate_max: float = 200.0
+    payout_rate_step: float = 1.0
+    payout_max_attempts: int = 10
+    payout_retry_base_delay: float = 2.0
+    payout_retry_max_delay: float = 300.0
+    payout_poll_interval: float = 0.5
+    payout_lease: float = 120.0
+    payout_db_path: Optional[str] = None  # По умолчанию {data_dir}/payouts.db
+
+    # Бюджет времени запроса мерчанта (заголовок X-Request-Timeout, секунды)
+    request_timeout_default: float = 30.0
+    request_timeout_max: float = 60.0
+    request_timeouts: Dict[str, float] = {
+        "transgran-card": 45.0,
+        "transgran-sbp": 45.0
+    }
+
+    # Пути файлов данных, не заданные явно, строятся от data_dir при загрузке настроек
+    # (f-строка в значении по умолчанию вычислялась бы один раз, и DATA_DIR не переносил бы файлы)
+    @model_validator(mode="after")
+    def _default_data_paths(self):
+        for name, file_name in DATA_FILES.items():
+            if getattr(self, name) is None:
+                setattr(self, name, os.path.join(self.data_dir, file_name))
+        return self
 
     class Config:
         env_file = "set.env"
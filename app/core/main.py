@@ -1,29 +1,77 @@
 # ОСНОВНОЕ ПРИЛОЖЕНИЕ
 import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
 
 from fastapi import status as http_status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Dict, List, Optional, Any
 from fastapi.exceptions import RequestValidationError
-from fastapi import FastAPI, HTTPException, Request, Depends, Header
+from fastapi import FastAPI, HTTPException, Request, Depends, Header, Query
 
+from app.core.config import settings
 from app.api.security.auth import security
+from app.api.security.rate_limits import payin_limits, payout_limits
+from app.api.security.merchant_registry import current_merchant
+from app.api.services.admission_service import admission, classify, CLASS_WEBHOOK
+from app.api.services.transaction_store import transaction_store
+from app.api.services.status_cache import status_cache
+from app.api.services.status_watch import status_watch
 from app.api.resources.providers_resources import providers_res
 from app.models.paygatecore.pay_in_model import PayInRequest
 from app.models.paygatecore.pay_in_bank_model import PayInBankRequest
-from app.api.services.provider_services.garex_service.webhook_router import router as webhook_router
+from app.api.services.provider_services.garex_service.webhook_router import router as webhook_router, webhook_ingestor
+from app.api.services.provider_services.garex_service.webhook_dedup import webhook_dedup
+from app.api.services.provider_services.garex_service.order_states import order_states
+from app.api.services.provider_services.our.callback_service import callback_dispatcher
+from app.api.services.idempotency_service import idempotency
+from app.api.services.batch_service import process_batch
+from app.api.services.payout_batch_service import payout_batches
+from app.api.services.provider_services.garex_service.method_scoreboard import method_scoreboard
+from app.utils.circuit_breaker import circuit_breakers
+from app.utils.deadline import set_request_deadline
 from app.models.paygatecore.pay_out_model import PayOutRequest, PayOutRequest2
+from app.models.paygatecore.batch_model import BatchRequest
+from app.models.paygatecore.other_models import (
+    PaginationParams,
+    InfoTransactionResponse,
+    TransactionListResponse,
+    TransactionStatusRequest,
+    TransactionStatusItem
+)
+from app.api.services.transaction_service import (
+    get_transaction, list_transactions, get_statuses, wait_transaction, stream_transaction
+)
 
 # Настройка логгера
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Запуск и остановка фоновых сервисов
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await callback_dispatcher.start()
+    await admission.start()
+    await transaction_store.start()
+    await order_states.start()
+    await webhook_ingestor.start()
+    await payout_batches.start()
+    yield
+    await payout_batches.stop()
+    await webhook_ingestor.stop()
+    await order_states.stop()
+    await transaction_store.stop()
+    await admission.stop()
+    await callback_dispatcher.stop()
+
+
 # Инициализация приложения
 app = FastAPI(
     title="Payment API Gateway",
     description="Сервис трансляции API между нашей системой и провайдером",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
 
@@ -47,6 +95,27 @@ def _create_error_response(code: str,
     return error_response
 
 
+# Контроль допуска: при перегрузке запрос отклоняется до разбора тела, начиная с менее важных классов
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    traffic_class = classify(request.method, request.url.path) if settings.admission_enabled else None
+    if traffic_class is not None:
+        retry_after = admission.admit(traffic_class)
+        if retry_after is not None:
+            logger.warning(f"Request shed by admission control: {request.url.path} class: {traffic_class}")
+            if traffic_class == CLASS_WEBHOOK:
+                content = {"error": "Шлюз перегружен, повторите позже", "status": "error"}
+            else:
+                content = _create_error_response(code="503", message="Шлюз перегружен, повторите позже")
+            return JSONResponse(
+                status_code=503,
+                content=content,
+                headers={"Retry-After": str(retry_after)}
+            )
+
+    return await call_next(request)
+
+
 # Обработчик HTTP исключений
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -63,7 +132,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 
         return JSONResponse(
             status_code=exc.status_code,
-            content=error_detail
+            content=error_detail,
+            headers=exc.headers
         )
     else:
         if isinstance(exc.detail, dict) and "code" in exc.detail:
@@ -78,7 +148,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 
         return JSONResponse(
             status_code=exc.status_code,
-            content=error_detail
+            content=error_detail,
+            headers=exc.headers
         )
 
 
@@ -146,6 +217,66 @@ async def health_check():
     return {"status": "healthy"}
 
 
+# Статистика доставки колбэков мерчантам
+@app.get("/metrics/callbacks", tags=["metrics"])
+async def callbacks_metrics():
+    return await callback_dispatcher.stats()
+
+
+# Статистика приема вебхуков провайдера
+@app.get("/metrics/webhooks", tags=["metrics"])
+async def webhooks_metrics():
+    return {**(await webhook_ingestor.stats()), **webhook_dedup.stats(), **order_states.stats()}
+
+
+# Групповая фиксация хранилища транзакций
+@app.get("/metrics/transactions", tags=["metrics"])
+async def transactions_metrics():
+    return {
+        **transaction_store.stats(),
+        "status_cache": status_cache.stats(),
+        "status_watch": status_watch.stats()
+    }
+
+
+# Нагрузка и решения контроля допуска
+@app.get("/metrics/admission", tags=["metrics"])
+async def admission_metrics():
+    return admission.stats()
+
+
+# Отказы по лимитам мерчантов
+@app.get("/metrics/limits", tags=["metrics"])
+async def limits_metrics():
+    return {
+        "payin": payin_limits.stats(),
+        "payout": payout_limits.stats()
+    }
+
+
+# Очередь запросов к провайдеру по мерчантам
+@app.get("/metrics/fair-queue", tags=["metrics"])
+async def fair_queue_metrics():
+    return {name: provider.scheduler.snapshot() for name, provider in providers_res.PROVIDERS.items()}
+
+
+# Состояние автоматических выключателей провайдеров
+@app.get("/metrics/breakers", tags=["metrics"])
+async def breakers_metrics():
+    return circuit_breakers.snapshot()
+
+
+# Порядок фолбэка методов трансграна (только в режиме отладки)
+@app.get("/debug/transgran", tags=["debug"])
+async def transgran_debug():
+    if not settings.debug:
+        raise HTTPException(
+            status_code=404,
+            detail="Not Found"
+        )
+    return method_scoreboard.snapshot()
+
+
 # Домашняя страница API
 @app.get("/")
 async def root():
@@ -157,9 +288,12 @@ async def root():
 async def pay_in_card(
         request: PayInRequest,
         provider_name: str = Header(..., alias="Provider-data"),
-        token: str = Depends(security)
+        timeout: Optional[float] = Header(None, alias="X-Request-Timeout"),
+        merchant_id: str = Depends(payin_limits)
 ):
     try:
+        set_request_deadline("card", timeout)
+
         logger.info(f"Creating transaction: "
                     f"{request.merchant_transaction_id} on provider: {provider_name} "
                     f"via method: card")
@@ -172,7 +306,10 @@ async def pay_in_card(
                 detail="Провайдер не найден в системе"
             )
 
-        pay_in_provider = await provider.pay_in_card(request)
+        pay_in_provider = await idempotency.execute(
+            merchant_id, request.merchant_transaction_id, "card",
+            lambda: provider.pay_in_card(request)
+        )
         return pay_in_provider
 
     except HTTPException as e:
@@ -181,7 +318,8 @@ async def pay_in_card(
                     f"via method: card")
         raise HTTPException(
             status_code=e.status_code,
-            detail=e.detail
+            detail=e.detail,
+            headers=e.headers
         )
 
 
@@ -190,9 +328,12 @@ async def pay_in_card(
 async def pay_in_internal_card(
         request: PayInBankRequest,
         provider_name: str = Header(..., alias="Provider-data"),
-        token: str = Depends(security)
+        timeout: Optional[float] = Header(None, alias="X-Request-Timeout"),
+        merchant_id: str = Depends(payin_limits)
 ):
     try:
+        set_request_deadline("internal-card", timeout)
+
         logger.info(f"Creating transaction: "
                     f"{request.merchant_transaction_id} on provider: {provider_name} "
                     f"via method: internal-card")
@@ -205,7 +346,10 @@ async def pay_in_internal_card(
                 detail="Провайдер не найден в системе"
             )
 
-        pay_in_provider = await provider.pay_in_internal_card(request)
+        pay_in_provider = await idempotency.execute(
+            merchant_id, request.merchant_transaction_id, "internal-card",
+            lambda: provider.pay_in_internal_card(request)
+        )
         return pay_in_provider
 
     except HTTPException as e:
@@ -214,7 +358,8 @@ async def pay_in_internal_card(
                     f"via method: internal-card")
         raise HTTPException(
             status_code=e.status_code,
-            detail=e.detail
+            detail=e.detail,
+            headers=e.headers
         )
 
 
@@ -223,9 +368,12 @@ async def pay_in_internal_card(
 async def pay_in_transgran_card(
         request: PayInRequest,
         provider_name: str = Header(..., alias="Provider-data"),
-        token: str = Depends(security)
+        timeout: Optional[float] = Header(None, alias="X-Request-Timeout"),
+        merchant_id: str = Depends(payin_limits)
 ):
     try:
+        set_request_deadline("transgran-card", timeout)
+
         logger.info(f"Creating transaction: "
                     f"{request.merchant_transaction_id} on provider: {provider_name} "
                     f"via method: transgran-card")
@@ -238,7 +386,10 @@ async def pay_in_transgran_card(
                 detail="Провайдер не найден в системе"
             )
 
-        pay_in_provider = await provider.pay_in_transgran_card(request)
+        pay_in_provider = await idempotency.execute(
+            merchant_id, request.merchant_transaction_id, "transgran-card",
+            lambda: provider.pay_in_transgran_card(request)
+        )
         return pay_in_provider
 
     except HTTPException as e:
@@ -247,7 +398,8 @@ async def pay_in_transgran_card(
                     f"via method: transgran-card")
         raise HTTPException(
             status_code=e.status_code,
-            detail=e.detail
+            detail=e.detail,
+            headers=e.headers
         )
 
 
@@ -256,9 +408,12 @@ async def pay_in_transgran_card(
 async def pay_in_sbp(
         request: PayInRequest,
         provider_name: str = Header(..., alias="Provider-data"),
-        token: str = Depends(security)
+        timeout: Optional[float] = Header(None, alias="X-Request-Timeout"),
+        merchant_id: str = Depends(payin_limits)
 ):
     try:
+        set_request_deadline("sbp", timeout)
+
         logger.info(f"Creating transaction: "
                     f"{request.merchant_transaction_id} on provider: {provider_name} "
                     f"via method: sbp")
@@ -271,7 +426,10 @@ async def pay_in_sbp(
                 detail="Провайдер не найден в системе"
             )
 
-        pay_in_provider = await provider.pay_in_sbp(request)
+        pay_in_provider = await idempotency.execute(
+            merchant_id, request.merchant_transaction_id, "sbp",
+            lambda: provider.pay_in_sbp(request)
+        )
         return pay_in_provider
 
     except HTTPException as e:
@@ -280,7 +438,8 @@ async def pay_in_sbp(
                     f"via method: sbp")
         raise HTTPException(
             status_code=e.status_code,
-            detail=e.detail
+            detail=e.detail,
+            headers=e.headers
         )
 
 
@@ -289,9 +448,12 @@ async def pay_in_sbp(
 async def pay_in_internal_sbp(
         request: PayInBankRequest,
         provider_name: str = Header(..., alias="Provider-data"),
-        token: str = Depends(security)
+        timeout: Optional[float] = Header(None, alias="X-Request-Timeout"),
+        merchant_id: str = Depends(payin_limits)
 ):
     try:
+        set_request_deadline("internal-sbp", timeout)
+
         logger.info(f"Creating transaction: "
                     f"{request.merchant_transaction_id} on provider: {provider_name} "
                     f"via method: internal-sbp")
@@ -304,7 +466,10 @@ async def pay_in_internal_sbp(
                 detail="Провайдер не найден в системе"
             )
 
-        pay_in_provider = await provider.pay_in_internal_sbp(request)
+        pay_in_provider = await idempotency.execute(
+            merchant_id, request.merchant_transaction_id, "internal-sbp",
+            lambda: provider.pay_in_internal_sbp(request)
+        )
         return pay_in_provider
 
     except HTTPException as e:
@@ -313,7 +478,8 @@ async def pay_in_internal_sbp(
                     f"via method: internal-sbp")
         raise HTTPException(
             status_code=e.status_code,
-            detail=e.detail
+            detail=e.detail,
+            headers=e.headers
         )
 
 
@@ -322,9 +488,12 @@ async def pay_in_internal_sbp(
 async def pay_in_transgran_sbp(
         request: PayInRequest,
         provider_name: str = Header(..., alias="Provider-data"),
-        token: str = Depends(security)
+        timeout: Optional[float] = Header(None, alias="X-Request-Timeout"),
+        merchant_id: str = Depends(payin_limits)
 ):
     try:
+        set_request_deadline("transgran-sbp", timeout)
+
         logger.info(f"Creating transaction: "
                     f"{request.merchant_transaction_id} on provider: {provider_name} "
                     f"via method: transgran-sbp")
@@ -337,7 +506,10 @@ async def pay_in_transgran_sbp(
                 detail="Провайдер не найден в системе"
             )
 
-        pay_in_provider = await provider.pay_in_transgran_sbp(request)
+        pay_in_provider = await idempotency.execute(
+            merchant_id, request.merchant_transaction_id, "transgran-sbp",
+            lambda: provider.pay_in_transgran_sbp(request)
+        )
         return pay_in_provider
 
     except HTTPException as e:
@@ -346,7 +518,8 @@ async def pay_in_transgran_sbp(
                     f"via method: transgran-sbp")
         raise HTTPException(
             status_code=e.status_code,
-            detail=e.detail
+            detail=e.detail,
+            headers=e.headers
         )
 
 
@@ -355,9 +528,12 @@ async def pay_in_transgran_sbp(
 async def pay_in_qr(
         request: PayInRequest,
         provider_name: str = Header(..., alias="Provider-data"),
-        token: str = Depends(security)
+        timeout: Optional[float] = Header(None, alias="X-Request-Timeout"),
+        merchant_id: str = Depends(payin_limits)
 ):
     try:
+        set_request_deadline("qr", timeout)
+
         logger.info(f"Creating transaction: "
                     f"{request.merchant_transaction_id} on provider: {provider_name} "
                     f"via method: qr")
@@ -379,7 +555,8 @@ async def pay_in_qr(
                     f"via method: qr")
         raise HTTPException(
             status_code=e.status_code,
-            detail=e.detail
+            detail=e.detail,
+            headers=e.headers
         )
 
 
@@ -388,9 +565,12 @@ async def pay_in_qr(
 async def pay_in_sim(
         request: PayInRequest,
         provider_name: str = Header(..., alias="Provider-data"),
-        token: str = Depends(security)
+        timeout: Optional[float] = Header(None, alias="X-Request-Timeout"),
+        merchant_id: str = Depends(payin_limits)
 ):
     try:
+        set_request_deadline("sim", timeout)
+
         logger.info(f"Creating transaction: "
                     f"{request.merchant_transaction_id} on provider: {provider_name} "
                     f"via method: sim")
@@ -403,7 +583,10 @@ async def pay_in_sim(
                 detail="Провайдер не найден в системе"
             )
 
-        pay_in_provider = await provider.pay_in_sim(request)
+        pay_in_provider = await idempotency.execute(
+            merchant_id, request.merchant_transaction_id, "sim",
+            lambda: provider.pay_in_sim(request)
+        )
         return pay_in_provider
 
     except HTTPException as e:
@@ -412,18 +595,45 @@ async def pay_in_sim(
                     f"via method: sim")
         raise HTTPException(
             status_code=e.status_code,
-            detail=e.detail
+            detail=e.detail,
+            headers=e.headers
         )
 
 
+# PayIn | Пакет заявок (результаты в формате NDJSON по мере готовности)
+@app.post("/api/v1/transactions/batch", tags=["payin"])
+async def pay_in_batch(
+        request: BatchRequest,
+        provider_name: str = Header(..., alias="Provider-data"),
+        merchant_id: str = Depends(payin_limits)
+):
+    logger.info(f"Creating batch of {len(request.items)} transactions on provider: {provider_name}")
+
+    try:
+        provider = providers_res.PROVIDERS[provider_name]
+    except KeyError:
+        raise HTTPException(
+            status_code=404,
+            detail="Провайдер не найден в системе"
+        )
+
+    return StreamingResponse(
+        process_batch(provider, current_merchant(), request.items),
+        media_type="application/x-ndjson"
+    )
+
+
 # PayOut | Карта
 @app.post("/api/v1/transactions/payout-card", tags=["payout"])
 async def pay_out_card(
         request: PayOutRequest,
         provider_name: str = Header(..., alias="Provider-data"),
-        token: str = Depends(security)
+        timeout: Optional[float] = Header(None, alias="X-Request-Timeout"),
+        merchant_id: str = Depends(payout_limits)
 ):
     try:
+        set_request_deadline("payout-card", timeout)
+
         logger.info(f"Creating out transaction: "
                     f"{request.merchant_transaction_id} on provider: {provider_name} "
                     f"via method: card")
@@ -436,7 +646,10 @@ async def pay_out_card(
                 detail="Провайдер не найден в системе"
             )
 
-        pay_in_provider = await provider.pay_out_card(request)
+        pay_in_provider = await idempotency.execute(
+            merchant_id, request.merchant_transaction_id, "payout-card",
+            lambda: provider.pay_out_card(request)
+        )
         return pay_in_provider
 
     except HTTPException as e:
@@ -445,7 +658,8 @@ async def pay_out_card(
                     f"via method: card")
         raise HTTPException(
             status_code=e.status_code,
-            detail=e.detail
+            detail=e.detail,
+            headers=e.headers
         )
 
 
@@ -454,9 +668,12 @@ async def pay_out_card(
 async def pay_out_sbp(
         request: PayOutRequest2,
         provider_name: str = Header(..., alias="Provider-data"),
-        token: str = Depends(security)
+        timeout: Optional[float] = Header(None, alias="X-Request-Timeout"),
+        merchant_id: str = Depends(payout_limits)
 ):
     try:
+        set_request_deadline("payout-sbp", timeout)
+
         logger.info(f"Creating out transaction: "
                     f"{request.merchant_transaction_id} on provider: {provider_name} "
                     f"via method: sbp")
@@ -469,7 +686,10 @@ async def pay_out_sbp(
                 detail="Провайдер не найден в системе"
             )
 
-        pay_in_provider = await provider.pay_out_sbp(request)
+        pay_in_provider = await idempotency.execute(
+            merchant_id, request.merchant_transaction_id, "payout-sbp",
+            lambda: provider.pay_out_sbp(request)
+        )
         return pay_in_provider
 
     except HTTPException as e:
@@ -478,9 +698,109 @@ async def pay_out_sbp(
                     f"via method: sbp")
         raise HTTPException(
             status_code=e.status_code,
-            detail=e.detail
+            detail=e.detail,
+            headers=e.headers
+        )
+
+
+# PayOut | Пакет выплат (файл NDJSON: {"method": "payout-card" | "payout-sbp", "request": {...}} на строку)
+@app.post("/api/v1/transactions/payout-batch", tags=["payout"], status_code=202)
+async def pay_out_batch(
+        request: Request,
+        provider_name: str = Header(..., alias="Provider-data"),
+        merchant_id: str = Depends(payout_limits)
+):
+    if provider_name not in providers_res.PROVIDERS:
+        raise HTTPException(
+            status_code=404,
+            detail="Провайдер не найден в системе"
         )
 
+    return await payout_batches.upload(merchant_id, provider_name, request.stream())
+
+
+# PayOut | Прогресс пакета выплат
+@app.get("/api/v1/transactions/payout-batch/{batch_id}", tags=["payout"])
+async def pay_out_batch_progress(
+        batch_id: str,
+        merchant_id: str = Depends(security)
+):
+    return await payout_batches.progress(merchant_id, batch_id)
+
+
+# PayOut | Статусы выплат пакета (постранично по возрастанию index)
+@app.get("/api/v1/transactions/payout-batch/{batch_id}/items", tags=["payout"])
+async def pay_out_batch_items(
+        batch_id: str,
+        status: Optional[str] = None,
+        after: int = -1,
+        limit: int = Query(default=100, ge=1, le=1000),
+        merchant_id: str = Depends(security)
+):
+    return await payout_batches.items(merchant_id, batch_id, status, after, limit)
+
+
+# Статусы набора транзакций мерчанта одним запросом (в порядке переданных идентификаторов)
+@app.post("/api/v1/transactions/status", tags=["transactions"], response_model=List[TransactionStatusItem])
+async def transactions_status(
+        request: TransactionStatusRequest,
+        merchant_id: str = Depends(security)
+):
+    return await get_statuses(merchant_id, request.merchant_transaction_ids)
+
+
+# Транзакции мерчанта (от новых к старым, постранично по курсору next_cursor)
+@app.get("/api/v1/transactions", tags=["transactions"], response_model=TransactionListResponse)
+async def transactions_list(
+        status: Optional[str] = None,
+        method: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        page_size: int = Query(default=10, ge=10, le=100),
+        page_number: int = Query(default=1, ge=1),
+        merchant_id: str = Depends(security)
+):
+    # Номер страницы - режим совместимости (OFFSET), при переданном курсоре не используется
+    pagination = PaginationParams(page_size=page_size, page_number=page_number)
+    return await list_transactions(
+        merchant_id, status, method, created_from, created_to, cursor,
+        pagination.page_size, pagination.page_number
+    )
+
+
+# Ожидание смены статуса транзакции (long-poll); status - последний известный клиенту статус
+@app.get("/api/v1/transactions/{merchant_transaction_id}/wait", tags=["transactions"], response_model=InfoTransactionResponse)
+async def transaction_wait(
+        merchant_transaction_id: str,
+        timeout: int = Query(default=30, ge=1, le=settings.status_wait_max_timeout),
+        status: Optional[str] = None,
+        merchant_id: str = Depends(security)
+):
+    return await wait_transaction(merchant_id, merchant_transaction_id, status, timeout)
+
+
+# Подписка на статусы транзакции (Server-Sent Events)
+@app.get("/api/v1/transactions/{merchant_transaction_id}/events", tags=["transactions"])
+async def transaction_events(
+        merchant_transaction_id: str,
+        merchant_id: str = Depends(security)
+):
+    return StreamingResponse(
+        await stream_transaction(merchant_id, merchant_transaction_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Транзакция мерчанта
+@app.get("/api/v1/transactions/{merchant_transaction_id}", tags=["transactions"], response_model=InfoTransactionResponse)
+async def transaction_info(
+        merchant_transaction_id: str,
+        merchant_id: str = Depends(security)
+):
+    return await get_transaction(merchant_id, merchant_transaction_id)
+
 
 # Запуск приложения
 if __name__ == "__main__":
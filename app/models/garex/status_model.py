@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class StatusResult(BaseModel):
+    id: int
+    state: str
+    amount: int
+
+
+class StatusResponse(BaseModel):
+    result: StatusResult
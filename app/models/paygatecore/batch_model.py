@@ -0,0 +1,13 @@
+# МОДЕЛИ ДАННЫХ (Пакетное создание транзакций)
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, Field
+
+
+class BatchItem(BaseModel):
+    method: str = Field(..., min_length=1, description="Метод оплаты (card, sbp, internal-card, ...)")
+    request: Dict[str, Any] = Field(..., description="Тело запроса метода (PayInRequest или PayInBankRequest)")
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(..., min_length=1, max_length=1000, description="Заявки пакета")
@@ -38,6 +38,25 @@ class InfoTransactionResponse(BaseModel):
     bank_name: str  # Название банка
 
 
+class TransactionListResponse(BaseModel):
+    items: List[InfoTransactionResponse]  # Транзакции от новых к старым
+    next_cursor: Optional[str] = None  # Курсор следующей страницы (null - страница последняя)
+    page_size: int  # Размер страницы
+    page_number: Optional[int] = None  # Номер страницы (только в постраничном режиме)
+
+
+class TransactionStatusRequest(BaseModel):
+    merchant_transaction_ids: List[str] = Field(..., min_length=1, max_length=5000, description="Идентификаторы платежей мерчанта")
+
+
+class TransactionStatusItem(BaseModel):
+    merchant_transaction_id: str  # Идентификатор платежа в системе мерчанта
+    id: Optional[int] = None  # Идентификатор платежа в системе провайдера (null - транзакция не найдена)
+    status: Optional[str] = None  # Статус платежа (null - транзакция не найдена)
+    paid_amount: Optional[str] = None  # Сумма, на которую была выполнена оплата
+    updated_at: Optional[datetime] = None  # Время последнего изменения платежа
+
+
 class WebhookRequest(BaseModel):
     id: int # Идентификатор платежа в системе провайдера
     merchant_transaction_id: str # Идентификатор платежа в системе мерчанта
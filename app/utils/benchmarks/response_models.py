@@ -0,0 +1,54 @@
+# БЕНЧМАРК: СБОРКА И СЕРИАЛИЗАЦИЯ МОДЕЛЕЙ ОТВЕТА
+# Запуск: python -m app.utils.benchmarks.response_models
+import json
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+
+from app.api.services.provider_services.garex_service import tools
+from app.models.paygatecore.pay_in_model import PayInResponse
+
+
+PROVIDER_RESPONSE = {
+    "result": {
+        "id": 123456,
+        "orderId": "merchant-order-1",
+        "amount": 1500,
+        "rate": 90,
+        "fee": 0.05,
+        "address": "4111111111111111",
+        "recipient": "Иван Иванов",
+        "bankName": "Сбер",
+        "bank": "sber"
+    },
+    "url": "https://pay.example/123456"
+}
+
+NUMBER = 20000
+
+
+# Текущий путь: полная валидация, затем jsonable_encoder и json.dumps внутри FastAPI
+def _current_path(mapper):
+    model = mapper(PROVIDER_RESPONSE)
+    return json.dumps(jsonable_encoder(model), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# Быстрый путь: сборка без валидации и сериализация сразу в байты
+def _fast_path(mapper):
+    return mapper(PROVIDER_RESPONSE).model_dump_json().encode("utf-8")
+
+
+def main():
+    validated = tools.compile_response_mapper(PayInResponse)
+    trusted = tools.compile_response_mapper(PayInResponse, trusted=True)
+
+    current = min(timeit.repeat(lambda: _current_path(validated), number=NUMBER, repeat=5)) / NUMBER
+    fast = min(timeit.repeat(lambda: _fast_path(trusted), number=NUMBER, repeat=5)) / NUMBER
+
+    print(f"current path: {current * 1e6:.1f} us/request")
+    print(f"fast path:    {fast * 1e6:.1f} us/request")
+    print(f"saved:        {(current - fast) * 1e6:.1f} us/request ({(1 - fast / current) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
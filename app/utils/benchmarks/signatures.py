@@ -0,0 +1,56 @@
+# БЕНЧМАРК: ПРОВЕРКА ПОДПИСИ ВЕБХУКА
+# Запуск: python -m app.utils.benchmarks.signatures
+import hashlib
+import hmac
+import json
+import timeit
+
+from app.api.services.provider_services.our import signature_service
+
+
+SECRET = "test_secret_key_123"
+URL = "http://localhost:8000/api/v1/webhooks/transaction?source=garex"
+
+BODY = json.dumps({
+    "id": 123456,
+    "merchant_transaction_id": "merchant-order-1",
+    "type": "",
+    "amount": "1500",
+    "paid_amount": "1500",
+    "currency": "RUB",
+    "currency_rate": "90",
+    "amount_in_usd": "16.666666666666668",
+    "status": "paid"
+}).encode("utf-8")
+
+SIGNATURE = signature_service.calculate_signature_raw(URL, BODY, SECRET)
+
+NUMBER = 50000
+
+
+# Прежний путь: разбор тела, повторная сериализация и новый HMAC на каждый вызов
+def _previous_path():
+    request_body = json.loads(BODY.decode("utf-8"))
+    signature_string = json.dumps(request_body) + "/api/v1/webhooks/transaction" + "source=garex"
+    expected = hmac.new(SECRET.encode("utf-8"), signature_string.encode("utf-8"), hashlib.sha256).hexdigest().lower()
+    return hmac.compare_digest(expected, SIGNATURE)
+
+
+# Текущий путь: подпись по полученным байтам с подготовленным состоянием HMAC
+def _raw_path():
+    return signature_service.verify_signature(URL, BODY, SIGNATURE, SECRET)
+
+
+def main():
+    assert _previous_path() and _raw_path()
+
+    previous = min(timeit.repeat(_previous_path, number=NUMBER, repeat=5)) / NUMBER
+    raw = min(timeit.repeat(_raw_path, number=NUMBER, repeat=5)) / NUMBER
+
+    print(f"previous path: {1 / previous:,.0f} verifications/s ({previous * 1e6:.1f} us)")
+    print(f"raw path:      {1 / raw:,.0f} verifications/s ({raw * 1e6:.1f} us)")
+    print(f"speedup:       {previous / raw:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
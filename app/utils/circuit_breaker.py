@@ -0,0 +1,114 @@
+# АВТОМАТИЧЕСКИЙ ВЫКЛЮЧАТЕЛЬ (CIRCUIT BREAKER)
+import math
+import time
+from collections import deque
+from typing import Dict, Any
+
+from app.core.config import settings
+
+
+class CircuitBreaker:
+    CLOSED = "closed"  # запросы проходят
+    OPEN = "open"  # быстрый отказ
+    HALF_OPEN = "half_open"  # пропускается несколько пробных запросов
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._outcomes: deque = deque(maxlen=settings.breaker_window)  # (успех, медленный)
+        self._probes = 0
+        self._probe_successes = 0
+
+    # Можно ли отправить запрос
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < settings.breaker_open_seconds:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+
+        if self.state == self.HALF_OPEN:
+            if self._probes >= settings.breaker_half_open_probes:
+                self.rejected += 1
+                return False
+            self._probes += 1
+
+        return True
+
+    # Возврат разрешения, если запрос так и не был отправлен
+    def release(self):
+        if self.state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    # Учет результата запроса
+    def record(self, success: bool, latency: float):
+        slow = latency >= settings.breaker_slow_call
+
+        if self.state == self.HALF_OPEN:
+            if success and not slow:
+                self._probe_successes += 1
+                if self._probe_successes >= settings.breaker_half_open_probes:
+                    self._close()
+            else:
+                self._open()
+            return
+
+        # Ответы запросов, отправленных до размыкания
+        if self.state == self.OPEN:
+            return
+
+        self._outcomes.append((success, slow))
+        total = len(self._outcomes)
+        if total < settings.breaker_min_requests:
+            return
+
+        errors = sum(1 for ok, _ in self._outcomes if not ok)
+        slow_calls = sum(1 for _, is_slow in self._outcomes if is_slow)
+        if errors / total >= settings.breaker_error_rate or slow_calls / total >= settings.breaker_slow_rate:
+            self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def _close(self):
+        self.state = self.CLOSED
+        self._outcomes.clear()
+
+    # Через сколько секунд имеет смысл повторить запрос
+    def retry_after(self) -> int:
+        remaining = settings.breaker_open_seconds - (time.monotonic() - self.opened_at)
+        return max(1, math.ceil(remaining))
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = len(self._outcomes)
+        return {
+            "state": self.state,
+            "requests_in_window": total,
+            "error_rate": round(sum(1 for ok, _ in self._outcomes if not ok) / total, 4) if total else 0.0,
+            "slow_rate": round(sum(1 for _, is_slow in self._outcomes if is_slow) / total, 4) if total else 0.0,
+            "rejected": self.rejected
+        }
+
+
+class CircuitBreakers:
+    def __init__(self):
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers[name] = CircuitBreaker(name)
+        return breaker
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+
+
+# Создание объекта класса CircuitBreakers
+circuit_breakers = CircuitBreakers()
@@ -0,0 +1,43 @@
+# ДЕДЛАЙН ЗАПРОСА МЕРЧАНТА
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+
+# Момент (time.monotonic), после которого ответ мерчанту уже не нужен
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+# Установка дедлайна: бюджет из заголовка мерчанта или значение по умолчанию для эндпоинта
+def set_request_deadline(endpoint: str, timeout: Optional[float] = None):
+    budget = settings.request_timeouts.get(endpoint, settings.request_timeout_default)
+    if timeout is not None and timeout > 0:
+        budget = min(timeout, settings.request_timeout_max)
+    _deadline.set(time.monotonic() + budget)
+
+
+# Оставшееся время в секундах (None - дедлайн не задан)
+def remaining() -> Optional[float]:
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+# Отказ по истекшему бюджету мерчанта (ответ самого шлюза, а не провайдера)
+class DeadlineExceeded(HTTPException):
+    pass
+
+
+def deadline_exceeded_error() -> HTTPException:
+    return DeadlineExceeded(
+        status_code=504,
+        detail={
+            "code": "504",
+            "message": "Истекло время ожидания ответа провайдера"
+        }
+    )
@@ -0,0 +1,68 @@
+# ОЧЕРЕДЬ НА ДИСКЕ (SQLITE В РЕЖИМЕ WAL)
+import time
+from typing import List, Tuple
+
+from app.utils.sqlite_db import SqliteDatabase
+
+
+class DurableQueue:
+    def __init__(self, path: str, table: str):
+        self.table = table
+        self.db = SqliteDatabase(path, f"journal-{table}")
+        self.connection = self.db.connection
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "key TEXT NOT NULL, "
+            "payload BLOB NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt_at REAL NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_next_attempt ON {table} (next_attempt_at)"
+        )
+
+    # Запись нового элемента (next_attempt_at в будущем = элемент захвачен текущим процессом)
+    async def add(self, key: str, payload: bytes, next_attempt_at: float) -> int:
+        return await self.db.run(self._add, key, payload, next_attempt_at)
+
+    def _add(self, key: str, payload: bytes, next_attempt_at: float) -> int:
+        cursor = self.connection.execute(
+            f"INSERT INTO {self.table} (key, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+            (key, payload, next_attempt_at, time.time())
+        )
+        return cursor.lastrowid
+
+    # Атомарный захват просроченных элементов (безопасно для нескольких воркеров uvicorn)
+    async def claim_due(self, limit: int, lease: float) -> List[Tuple[int, str, bytes, int, float]]:
+        return await self.db.transaction(self._claim_due, limit, lease)
+
+    def _claim_due(self, limit: int, lease: float) -> List[Tuple[int, str, bytes, int, float]]:
+        now = time.time()
+        return self.connection.execute(
+            f"UPDATE {self.table} SET next_attempt_at = ? "
+            f"WHERE id IN (SELECT id FROM {self.table} WHERE next_attempt_at <= ? "
+            "ORDER BY next_attempt_at LIMIT ?) "
+            "RETURNING id, key, payload, attempts, created_at",
+            (now + lease, now, limit)
+        ).fetchall()
+
+    async def reschedule(self, item_id: int, attempts: int, next_attempt_at: float):
+        await self.db.run(
+            self.connection.execute,
+            f"UPDATE {self.table} SET attempts = ?, next_attempt_at = ? WHERE id = ?",
+            (attempts, next_attempt_at, item_id)
+        )
+
+    async def delete(self, item_id: int):
+        await self.db.run(self.connection.execute, f"DELETE FROM {self.table} WHERE id = ?", (item_id,))
+
+    async def pending_count(self) -> int:
+        return await self.db.run(self._pending_count)
+
+    def _pending_count(self) -> int:
+        return self.connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    async def close(self):
+        await self.db.close()
@@ -0,0 +1,90 @@
+# ВЗВЕШЕННАЯ СПРАВЕДЛИВАЯ ОЧЕРЕДЬ (START-TIME FAIR QUEUING)
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+
+class FairScheduler:
+    def __init__(self, capacity: int):
+        self.capacity = capacity  # Одновременно выполняемых вызовов
+        self.active = 0
+
+        # Виртуальное время и метка окончания последнего вызова каждого ключа
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+
+        # Ожидающие вызовы: (метка начала, порядковый номер, ключ, future)
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+
+        self.granted: Dict[str, int] = {}
+        self.queued_max = 0
+
+    # Метка начала вызова: ключ с весом w получает 1/w виртуального времени на вызов
+    def _tag(self, key: str, weight: float) -> float:
+        start = max(self.virtual_time, self.last_finish.get(key, 0.0))
+        self.last_finish[key] = start + 1.0 / weight
+        return start
+
+    def _grant(self, key: str, start: float):
+        self.active += 1
+        self.virtual_time = start
+        self.granted[key] = self.granted.get(key, 0) + 1
+
+    # Ожидание слота (timeout - не дольше, asyncio.TimeoutError при истечении)
+    async def acquire(self, key: str, weight: float, timeout: Optional[float] = None):
+        start = self._tag(key, weight)
+        if self.active < self.capacity and not self._waiters:
+            self._grant(key, start)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (start, next(self._seq), key, future))
+        self.queued_max = max(self.queued_max, len(self._waiters))
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except BaseException:
+            # Слот мог быть выдан одновременно с отменой - возвращаем его
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+            raise
+
+    def release(self):
+        self.active -= 1
+
+        while self._waiters and self.active < self.capacity:
+            start, _, key, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._grant(key, start)
+            future.set_result(None)
+
+        # Все очереди пусты - метки больше не нужны
+        if not self._waiters and self.active == 0:
+            self.virtual_time = 0.0
+            self.last_finish.clear()
+
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(self, key: str, weight: float, timeout: Optional[float] = None):
+        await self.acquire(key, weight, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "queued": self.queued(),
+            "queued_max": self.queued_max,
+            "granted": dict(self.granted)
+        }
@@ -0,0 +1,33 @@
+# ОБЪЕДИНЕНИЕ ОДНОВРЕМЕННЫХ ОДИНАКОВЫХ ВЫЗОВОВ (SINGLE-FLIGHT)
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    # Первый вызов по ключу выполняет call, остальные ждут и получают тот же результат (или ошибку)
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+
+        # Отмена одного ожидающего (обрыв соединения клиентом) не прерывает общий вызов
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+        # Ошибка считается обработанной, даже если все ожидающие были отменены
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
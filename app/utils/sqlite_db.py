@@ -0,0 +1,48 @@
+# ФАЙЛЫ SQLITE, ОБЩИЕ ДЛЯ ВОРКЕРОВ (РЕЖИМ WAL)
+import asyncio
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+# Соединение с файлом базы (каталог создается при необходимости)
+def connect(path: str) -> sqlite3.Connection:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA busy_timeout=5000")
+    return connection
+
+
+# Соединение с собственным потоком: все обращения выполняются в нем по очереди,
+# ожидание блокировки файла (busy_timeout) не останавливает event loop, а операции не перемешиваются в транзакциях
+class SqliteDatabase:
+    def __init__(self, path: str, thread_name: str):
+        self.connection = connect(path)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=thread_name)
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # fn выполняется в транзакции с блокировкой записи (BEGIN IMMEDIATE)
+    async def transaction(self, fn: Callable[..., Any], *args) -> Any:
+        return await self.run(self._transaction, fn, *args)
+
+    def _transaction(self, fn: Callable[..., Any], *args) -> Any:
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(*args)
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return result
+
+    async def close(self):
+        await self.run(self.connection.close)
+        self._executor.shutdown(wait=True)
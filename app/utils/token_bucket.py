@@ -0,0 +1,75 @@
+# ОГРАНИЧЕНИЕ ЧАСТОТЫ ЗАПРОСОВ (TOKEN BUCKET)
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # Пополнение, токенов в секунду
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    # Попытка взять токены: 0 - успешно, иначе через сколько секунд их станет достаточно
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    # Ожидание токенов
+    async def acquire(self, tokens: float = 1.0):
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return
+            await asyncio.sleep(wait)
+
+    def set_rate(self, rate: float):
+        self._refill()
+        self.rate = rate
+
+
+# Token bucket с ограниченной очередью ожидания (порядок FIFO за счет резервирования токенов)
+class BoundedTokenBucket(TokenBucket):
+    def __init__(self, rate: float, capacity: float, max_waiting: int):
+        super().__init__(rate, capacity)
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self.shed = 0
+
+    # Через сколько секунд освободится место в очереди
+    def retry_after(self) -> float:
+        self._refill()
+        return max(0.0, -self.tokens) / self.rate
+
+    # Ожидание своей очереди: False - очередь заполнена или токен не успеет появиться за max_wait секунд
+    async def acquire_or_shed(self, tokens: float = 1.0, max_wait: Optional[float] = None) -> bool:
+        self._refill()
+        if self.tokens < tokens:
+            wait = (tokens - self.tokens) / self.rate
+            if self.waiting >= self.max_waiting or (max_wait is not None and wait > max_wait):
+                self.shed += 1
+                return False
+
+        # Токен резервируется сразу (баланс может уйти в минус), ожидание - до момента его появления
+        self.tokens -= tokens
+        if self.tokens >= 0:
+            return True
+
+        self.waiting += 1
+        try:
+            await asyncio.sleep(-self.tokens / self.rate)
+        except BaseException:
+            self.tokens += tokens
+            raise
+        finally:
+            self.waiting -= 1
+        return True
@@ -0,0 +1,105 @@
+# ОБЩИЕ ФИКСТУРЫ ТЕСТОВ
+import inspect
+import itertools
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.main import app
+from app.api.services.provider_services.garex_service.garex import garex
+
+
+# Идентификаторы провайдера уникальны во всей сессии (кэши статусов и дедупликации - общие синглтоны)
+_provider_ids = itertools.count(100000)
+
+# Заголовки мерчанта "default"
+HEADERS = {"Authorization": f"Bearer {settings.merchant_token}", "Provider-data": "garex"}
+
+
+# Базы SQLite и журналы - во временном каталоге теста (пути в настройках относительные)
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+# Провайдер Garex без сети: handler(request) (обычный или async) может вернуть свой ответ, иначе - успешное создание
+@pytest.fixture
+def provider(monkeypatch):
+    calls: List[httpx.Request] = []
+    state: Dict[str, Optional[Callable[[httpx.Request], Any]]] = {"handler": None}
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if state["handler"] is not None:
+            response = state["handler"](request)
+            if inspect.isawaitable(response):
+                response = await response
+            if response is not None:
+                return response
+
+        body = json.loads(request.content)
+        return httpx.Response(200, json={
+            "result": {
+                "id": next(_provider_ids),
+                "orderId": body["orderId"],
+                "amount": body["amount"],
+                "rate": 90,
+                "fee": 0.01,
+                "address": "4111111111111111",
+                "recipient": "Ivan",
+                "bankName": "Сбер",
+                "bank": "sber"
+            },
+            "url": "http://pay"
+        })
+
+    monkeypatch.setattr(garex, "client", httpx.AsyncClient(transport=httpx.MockTransport(handle)))
+
+    class Provider:
+        def __init__(self):
+            self.calls = calls
+
+        def set_handler(self, handler: Callable[[httpx.Request], Any]):
+            state["handler"] = handler
+
+    return Provider()
+
+
+# Клиент API с запущенными фоновыми сервисами (lifespan)
+@pytest.fixture
+def client(provider):
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def card_request(merchant_transaction_id: str, amount: str = "1000") -> Dict[str, Any]:
+    return {
+        "amount": amount,
+        "currency": "RUB",
+        "merchant_transaction_id": merchant_transaction_id,
+        "customer_name": "Ivan",
+        "customer_email": "ivan@example.com",
+        "customer_ip": "1.1.1.1"
+    }
+
+
+def garex_webhook(provider_id: int, order_id: str, state: str, amount: int = 1000) -> Dict[str, Any]:
+    return {
+        "id": provider_id,
+        "orderId": order_id,
+        "state": state,
+        "amount": amount,
+        "rate": 90,
+        "fee": 1,
+        "address": "4111111111111111",
+        "bik": "044525225",
+        "recipient": "Ivan",
+        "bank": "sber",
+        "bankName": "Сбер",
+        "sign": "x"
+    }
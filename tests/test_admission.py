@@ -0,0 +1,82 @@
+# ТЕСТЫ КОНТРОЛЯ ДОПУСКА ПРИ ПЕРЕГРУЗКЕ
+import pytest
+
+from app.core.config import settings
+from app.utils.fair_scheduler import FairScheduler
+from app.api.services.admission_service import AdmissionController, admission, classify
+from app.api.services.provider_services.garex_service.garex import garex
+from tests.conftest import HEADERS, card_request, garex_webhook
+
+
+def test_requests_classified_by_path():
+    assert classify("POST", "/api/v1/webhooks/garex") == "webhook"
+    assert classify("POST", "/api/v1/transactions/payout-card") == "payout"
+    assert classify("POST", "/api/v1/transactions/card") == "payin"
+    # Чтение статусов и служебные эндпоинты не ограничиваются
+    assert classify("POST", "/api/v1/transactions/status") is None
+    assert classify("GET", "/api/v1/transactions") is None
+    assert classify("GET", "/metrics/admission") is None
+    assert classify("POST", "/api/v1/transactions/payout-batch") == "payout"
+    assert classify("GET", "/api/v1/transactions/payout-batch/batch-1") is None
+    assert classify("GET", "/api/v1/transactions/payout-batch/batch-1/items") is None
+
+
+def _saturated_scheduler(active: int, queued: int) -> FairScheduler:
+    scheduler = FairScheduler(10)
+    scheduler.active = active
+    scheduler._waiters = [None] * queued
+    return scheduler
+
+
+def test_provider_queue_counts_only_when_pool_busy(monkeypatch):
+    controller = AdmissionController()
+
+    monkeypatch.setattr(garex, "scheduler", _saturated_scheduler(active=5, queued=100))
+    assert controller.pressure() == 0.0
+
+    monkeypatch.setattr(garex, "scheduler", _saturated_scheduler(active=10, queued=100))
+    assert controller.pressure() == pytest.approx(100 / settings.admission_queue_limit)
+
+
+def test_payouts_shed_before_payins_and_webhooks(monkeypatch):
+    controller = AdmissionController()
+    monkeypatch.setattr(controller, "pressure", lambda: 0.75)
+
+    assert controller.admit("payout") is not None
+    assert controller.admit("payin") is None
+    assert controller.admit("webhook") is None
+
+    monkeypatch.setattr(controller, "pressure", lambda: 1.5)
+    assert controller.admit("payin") == 2
+    assert controller.admit("webhook") is None
+
+    assert controller.stats()["rejected"] == {"payout": 1, "payin": 1}
+
+
+def test_loop_lag_raises_pressure():
+    controller = AdmissionController()
+    controller.loop_lag = settings.admission_max_loop_lag / 2
+
+    assert controller.pressure() == pytest.approx(0.5)
+
+
+def test_overloaded_gateway_rejects_with_retry_after(client, provider, monkeypatch):
+    monkeypatch.setattr(admission, "pressure", lambda: 1.2)
+
+    payin = client.post("/api/v1/transactions/card", json=card_request("admission-1"), headers=HEADERS)
+    assert payin.status_code == 503
+    assert payin.headers["Retry-After"] == "2"
+    assert provider.calls == []
+
+    # Вебхуки принимаются дольше всех, статусы читаются локально
+    webhook = client.post("/api/v1/webhooks/garex", json=garex_webhook(1801, "admission-2", "pending"))
+    assert webhook.status_code == 200
+    assert client.post("/api/v1/transactions/status", json={"merchant_transaction_ids": ["admission-1"]}, headers=HEADERS).status_code == 200
+
+
+def test_admission_can_be_disabled(client, monkeypatch):
+    monkeypatch.setattr(admission, "pressure", lambda: 5.0)
+    monkeypatch.setattr(settings, "admission_enabled", False)
+
+    response = client.post("/api/v1/transactions/card", json=card_request("admission-3"), headers=HEADERS)
+    assert response.status_code == 200
@@ -0,0 +1,37 @@
+# ТЕСТЫ ИНДЕКСА БАНКОВ GAREX
+from app.api.resources.garex_resources.bank_index import (
+    BankIndex,
+    bank_index,
+    COUNTRY_ABH,
+    COUNTRY_RUS,
+    COUNTRY_TJS,
+    DEFAULT_COUNTRY
+)
+
+
+def test_name_lookup_normalized():
+    # Регистр, пробелы, знаки препинания и уточнение в скобках не важны
+    assert bank_index.find("  СБЕР ").code == "sber"
+    assert bank_index.find("т банк").code == "t-bank"
+    assert bank_index.find("Промсвязьбанк").code == "psbank"
+    assert bank_index.find("ozonbank").code == "ozonbank"
+    assert bank_index.find("Несуществующий банк") is None
+
+
+def test_country_by_code():
+    assert bank_index.country("sber") == COUNTRY_RUS
+    assert bank_index.country("amra-bank") == COUNTRY_ABH
+    assert bank_index.country("unknown-bank") == DEFAULT_COUNTRY
+
+
+def test_bank_in_several_lists_keeps_first_country():
+    index = BankIndex([
+        (COUNTRY_TJS, {"Общий банк": "shared"}),
+        (COUNTRY_RUS, {"Общий банк (РФ)": "shared", "Местный": "local"})
+    ])
+
+    shared = index.get("shared")
+    assert shared.country == COUNTRY_TJS
+    assert shared.countries == {COUNTRY_TJS, COUNTRY_RUS}
+    assert index.find("Общий банк (РФ)") is shared
+    assert index.get("local").countries == {COUNTRY_RUS}
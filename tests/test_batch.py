@@ -0,0 +1,67 @@
+# ТЕСТЫ ПАКЕТНОГО СОЗДАНИЯ ТРАНЗАКЦИЙ
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.api.security.merchant_registry import merchant_registry
+from tests.conftest import HEADERS, card_request
+
+
+BATCH_HEADERS = {"Authorization": "Bearer batch_token", "Provider-data": "garex"}
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.fixture
+def batch_merchant(monkeypatch):
+    monkeypatch.setattr(settings, "merchants", {
+        "batcher": {"token": "batch_token", "rate_limit": 5, "burst": 2, "max_concurrency": 2}
+    })
+    merchant_registry.reload()
+    yield
+    monkeypatch.undo()
+    merchant_registry.reload()
+
+
+def test_batch_streams_result_per_item(client):
+    items = [
+        {"method": "card", "request": card_request("batch-1")},
+        {"method": "unknown", "request": card_request("batch-2")},
+        {"method": "card", "request": {"merchant_transaction_id": "batch-3"}}
+    ]
+    response = client.post("/api/v1/transactions/batch", json={"items": items}, headers=HEADERS)
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = sorted(_lines(response), key=lambda line: line["index"])
+    assert [line["status"] for line in lines] == [200, 400, 422]
+    assert lines[0]["result"]["merchant_transaction_id"] == "batch-1"
+
+
+def test_batch_items_charged_to_merchant_limits(client, provider, batch_merchant):
+    in_flight = 0
+    peak = 0
+
+    async def slow(request: httpx.Request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+
+    provider.set_handler(slow)
+    items = [{"method": "card", "request": card_request(f"batch-limit-{i}")} for i in range(6)]
+
+    started = time.monotonic()
+    response = client.post("/api/v1/transactions/batch", json={"items": items}, headers=BATCH_HEADERS)
+    elapsed = time.monotonic() - started
+
+    assert [line["status"] for line in _lines(response)] == [200] * 6
+    # Запрос и первая заявка укладываются в burst, остальные 5 заявок - по 5 в секунду
+    assert elapsed >= 0.8
+    assert peak <= 2
@@ -0,0 +1,116 @@
+# ТЕСТЫ ЖУРНАЛА И ДОСТАВКИ КОЛБЭКОВ МЕРЧАНТУ
+import asyncio
+import sqlite3
+import threading
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.utils.durable_queue import DurableQueue
+from app.api.services.provider_services.our.callback_service import CallbackDispatcher
+from app.api.services.provider_services.our.signature_service import verify_signature
+
+
+def test_journal_roundtrip():
+    async def scenario():
+        journal = DurableQueue("data/journal.db", "items")
+        first = await journal.add("a", b"1", time.time())
+        await journal.add("b", b"2", time.time() + 60)
+
+        # Захватывается только просроченный элемент, повторный захват до конца lease пуст
+        claimed = await journal.claim_due(10, lease=60)
+        assert [(row[0], row[1], row[2]) for row in claimed] == [(first, "a", b"1")]
+        assert await journal.claim_due(10, lease=60) == []
+
+        await journal.reschedule(first, 3, time.time() - 1)
+        assert (await journal.claim_due(10, lease=60))[0][3] == 3
+
+        await journal.delete(first)
+        assert await journal.pending_count() == 1
+        await journal.close()
+
+    asyncio.run(scenario())
+
+
+def test_journal_lock_wait_does_not_block_loop():
+    async def scenario():
+        journal = DurableQueue("data/journal.db", "items")
+
+        # Другой процесс держит блокировку записи файла журнала
+        other = sqlite3.connect("data/journal.db", isolation_level=None, check_same_thread=False)
+        other.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.3, lambda: other.execute("COMMIT")).start()
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await journal.add("a", b"1", time.time())
+        task.cancel()
+
+        # Пока запись ждала блокировку, event loop продолжал работать
+        assert ticks >= 10
+        other.close()
+        await journal.close()
+
+    asyncio.run(scenario())
+
+
+def _run_dispatcher(monkeypatch, handler, wait_for):
+    monkeypatch.setattr(settings, "callback_workers", 2)
+    monkeypatch.setattr(settings, "callback_retry_base_delay", 0.01)
+    monkeypatch.setattr(settings, "callback_sweep_interval", 0.02)
+
+    async def scenario():
+        dispatcher = CallbackDispatcher()
+        await dispatcher.start()
+        await dispatcher.client.aclose()
+        dispatcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            await dispatcher.enqueue("http://merchant/callback?x=1", b'{"status":"paid"}')
+            deadline = time.monotonic() + 5
+            while not wait_for(dispatcher) and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            return await dispatcher.stats()
+        finally:
+            await dispatcher.stop()
+
+    return asyncio.run(scenario())
+
+
+def test_callback_retried_until_delivered_with_signature(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(503 if len(requests) < 3 else 200)
+
+    stats = _run_dispatcher(monkeypatch, handler, lambda dispatcher: dispatcher.delivered == 1)
+
+    assert stats["delivered"] == 1
+    assert stats["retried"] == 2
+    assert stats["journal_pending"] == 0
+    # Каждая попытка подписана по байтам тела, которые получил мерчант
+    for request in requests:
+        assert verify_signature(str(request.url), request.content, request.headers["X-Signature"],
+                                settings.webhook_secret_key)
+
+
+def test_callback_not_retried_on_client_error(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(400)
+
+    stats = _run_dispatcher(monkeypatch, handler, lambda dispatcher: dispatcher.dropped == 1)
+
+    assert len(requests) == 1
+    assert stats["dropped"] == 1
+    assert stats["journal_pending"] == 0
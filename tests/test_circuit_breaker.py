@@ -0,0 +1,95 @@
+# ТЕСТЫ АВТОМАТИЧЕСКОГО ВЫКЛЮЧАТЕЛЯ
+import time
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.utils.circuit_breaker import CircuitBreaker, circuit_breakers
+from app.api.services.provider_services.garex_service.garex import garex
+from tests.conftest import HEADERS, card_request
+
+
+@pytest.fixture
+def fast_breaker(monkeypatch):
+    monkeypatch.setattr(settings, "breaker_min_requests", 4)
+    monkeypatch.setattr(settings, "breaker_open_seconds", 0.05)
+    monkeypatch.setattr(settings, "breaker_half_open_probes", 2)
+    monkeypatch.setattr(settings, "breaker_slow_call", 1.0)
+
+
+def _open(breaker: CircuitBreaker):
+    for _ in range(settings.breaker_min_requests):
+        assert breaker.allow()
+        breaker.record(False, 0.01)
+
+
+def test_opens_on_error_rate_and_rejects(fast_breaker):
+    breaker = CircuitBreaker("test")
+    for _ in range(3):
+        breaker.record(False, 0.01)
+    # Меньше breaker_min_requests - решения нет
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record(False, 0.01)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+
+def test_opens_on_slow_calls(fast_breaker):
+    breaker = CircuitBreaker("test")
+    for _ in range(4):
+        breaker.record(True, 2.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_probes_close_breaker(fast_breaker):
+    breaker = CircuitBreaker("test")
+    _open(breaker)
+    time.sleep(0.06)
+
+    # Пропускается не больше breaker_half_open_probes пробных запросов
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record(True, 0.01)
+    breaker.record(True, 0.01)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_breaker(fast_breaker):
+    breaker = CircuitBreaker("test")
+    _open(breaker)
+    time.sleep(0.06)
+
+    assert breaker.allow()
+    breaker.record(False, 0.01)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_released_probe_slot_reused(fast_breaker):
+    breaker = CircuitBreaker("test")
+    _open(breaker)
+    time.sleep(0.06)
+
+    assert breaker.allow() and breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_open_breaker_fails_fast_without_provider_call(client, provider, fast_breaker, monkeypatch):
+    monkeypatch.setattr(settings, "breaker_open_seconds", 30.0)
+    monkeypatch.setattr(circuit_breakers, "breakers", {})
+    monkeypatch.setattr(garex, "breaker", CircuitBreaker("garex"))
+    provider.set_handler(lambda request: httpx.Response(500))
+
+    for index in range(4):
+        client.post("/api/v1/transactions/card", json=card_request(f"breaker-{index}"), headers=HEADERS)
+    calls_before = len(provider.calls)
+    response = client.post("/api/v1/transactions/card", json=card_request("breaker-open"), headers=HEADERS)
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert len(provider.calls) == calls_before
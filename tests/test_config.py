@@ -0,0 +1,21 @@
+# ТЕСТЫ КОНФИГУРАЦИИ
+import os
+
+from app.core.config import DATA_FILES, Settings
+
+
+def test_data_paths_follow_data_dir(monkeypatch):
+    monkeypatch.setenv("DATA_DIR", "/var/lib/gateway")
+    configured = Settings()
+
+    for name, file_name in DATA_FILES.items():
+        assert getattr(configured, name) == os.path.join("/var/lib/gateway", file_name)
+
+
+def test_explicit_path_kept(monkeypatch):
+    monkeypatch.setenv("DATA_DIR", "/var/lib/gateway")
+    monkeypatch.setenv("PAYOUT_DB_PATH", "/mnt/payouts.db")
+    configured = Settings()
+
+    assert configured.payout_db_path == "/mnt/payouts.db"
+    assert configured.transaction_db_path == os.path.join("/var/lib/gateway", "transactions.db")
@@ -0,0 +1,60 @@
+# ТЕСТЫ ПЕРЕДАЧИ ДЕДЛАЙНА МЕРЧАНТА ПРОВАЙДЕРУ
+import asyncio
+import contextvars
+
+import httpx
+
+from app.core.config import settings
+from app.utils import deadline
+from tests.conftest import HEADERS, card_request
+
+
+def _in_context(fn):
+    return contextvars.copy_context().run(fn)
+
+
+def test_budget_from_header_capped_by_maximum():
+    def budget(endpoint, timeout):
+        deadline.set_request_deadline(endpoint, timeout)
+        return deadline.remaining()
+
+    assert _in_context(lambda: deadline.remaining()) is None
+    # Без заголовка - бюджет эндпоинта или общий по умолчанию
+    transgran = settings.request_timeouts["transgran-card"]
+    assert transgran - 1 < _in_context(lambda: budget("transgran-card", None)) <= transgran
+    assert _in_context(lambda: budget("card", None)) <= settings.request_timeout_default
+    assert 4 < _in_context(lambda: budget("card", 5)) <= 5
+    assert _in_context(lambda: budget("card", 10000)) <= settings.request_timeout_max
+
+
+def test_provider_gets_remaining_budget(client, provider):
+    timeouts = []
+
+    def handler(request: httpx.Request):
+        timeouts.append(request.extensions["timeout"]["read"])
+
+    provider.set_handler(handler)
+    response = client.post(
+        "/api/v1/transactions/card",
+        json=card_request("deadline-1"),
+        headers={**HEADERS, "X-Request-Timeout": "2"}
+    )
+
+    assert response.status_code == 200
+    assert 0 < timeouts[0] <= 2
+
+
+def test_exhausted_budget_not_sent_to_provider(client, provider):
+    async def slow(request: httpx.Request):
+        await asyncio.sleep(0.2)
+
+    provider.set_handler(slow)
+    # Бюджет заканчивается в очереди к провайдеру - второй запрос не отправляется
+    response = client.post(
+        "/api/v1/transactions/card",
+        json=card_request("deadline-2"),
+        headers={**HEADERS, "X-Request-Timeout": "0.000001"}
+    )
+
+    assert response.status_code == 504
+    assert provider.calls == []
@@ -0,0 +1,98 @@
+# ТЕСТЫ СПРАВЕДЛИВОЙ ОЧЕРЕДИ ВЫЗОВОВ ПРОВАЙДЕРА
+import asyncio
+
+import pytest
+
+from app.utils.fair_scheduler import FairScheduler
+from app.api.resources.providers_resources import providers_res
+from tests.conftest import HEADERS, card_request
+
+
+async def _drain(scheduler: FairScheduler, keys_weights):
+    # Слот занят, все вызовы встают в очередь; каждый вызов освобождает слот следующему
+    order = []
+
+    async def call(key: str, weight: float):
+        async with scheduler.slot(key, weight):
+            order.append(key)
+
+    await scheduler.acquire("holder", 1.0)
+    tasks = []
+    for key, weight in keys_weights:
+        tasks.append(asyncio.create_task(call(key, weight)))
+        await asyncio.sleep(0)
+
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_slots_granted_immediately_below_capacity():
+    async def scenario():
+        scheduler = FairScheduler(2)
+        await asyncio.wait_for(scheduler.acquire("a", 1.0), 0.1)
+        await asyncio.wait_for(scheduler.acquire("b", 1.0), 0.1)
+        return scheduler.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert (snapshot["active"], snapshot["queued"]) == (2, 0)
+
+
+def test_slots_shared_in_proportion_to_weight():
+    async def scenario():
+        scheduler = FairScheduler(1)
+        return await _drain(scheduler, [("light", 1.0)] * 6 + [("heavy", 2.0)] * 6)
+
+    order = asyncio.run(scenario())
+    # Мерчант с весом 2 получает вдвое больше слотов, пока в очереди есть оба
+    assert order[:6].count("heavy") == 4
+    assert order[:6].count("light") == 2
+
+
+def test_backlog_of_one_merchant_does_not_starve_another():
+    async def scenario():
+        scheduler = FairScheduler(1)
+        return await _drain(scheduler, [("bulk", 1.0)] * 20 + [("single", 1.0)])
+
+    order = asyncio.run(scenario())
+    assert order.index("single") <= 1
+
+
+def test_wait_timeout_leaves_no_waiter():
+    async def scenario():
+        scheduler = FairScheduler(1)
+        await scheduler.acquire("a", 1.0)
+        with pytest.raises(asyncio.TimeoutError):
+            await scheduler.acquire("b", 1.0, timeout=0.01)
+
+        scheduler.release()
+        return scheduler.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert (snapshot["active"], snapshot["queued"]) == (0, 0)
+
+
+def test_slot_granted_to_cancelled_waiter_is_returned():
+    async def scenario():
+        scheduler = FairScheduler(1)
+        await scheduler.acquire("a", 1.0)
+        waiter = asyncio.create_task(scheduler.acquire("b", 1.0))
+        await asyncio.sleep(0)
+
+        # Слот выдан и ожидание отменено до того, как задача успела продолжиться
+        scheduler.release()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return scheduler.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["active"] == 0
+
+
+def test_provider_calls_accounted_per_merchant(client):
+    before = providers_res.PROVIDERS["garex"].scheduler.snapshot()["granted"].get("default", 0)
+
+    assert client.post("/api/v1/transactions/card", json=card_request("fair-1"), headers=HEADERS).status_code == 200
+
+    granted = client.get("/metrics/fair-queue").json()["garex"]["granted"]
+    assert granted["default"] == before + 1
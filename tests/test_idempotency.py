@@ -0,0 +1,96 @@
+# ТЕСТЫ ИДЕМПОТЕНТНОСТИ СОЗДАНИЯ ТРАНЗАКЦИЙ
+import asyncio
+import sqlite3
+import time
+
+import httpx
+
+from app.api.services.idempotency_service import MemoryIdempotencyBackend, SqliteIdempotencyBackend
+from tests.conftest import HEADERS, card_request
+
+
+def test_repeated_request_replayed_without_provider_call(client, provider):
+    first = client.post("/api/v1/transactions/card", json=card_request("idem-1"), headers=HEADERS)
+    repeat = client.post("/api/v1/transactions/card", json=card_request("idem-1"), headers=HEADERS)
+
+    assert first.status_code == repeat.status_code == 200
+    assert repeat.json() == first.json()
+    assert len(provider.calls) == 1
+
+
+def test_same_id_via_other_method_conflicts(client, provider):
+    assert client.post("/api/v1/transactions/card", json=card_request("idem-2"), headers=HEADERS).status_code == 200
+    conflict = client.post("/api/v1/transactions/sbp", json=card_request("idem-2"), headers=HEADERS)
+
+    assert conflict.status_code == 422
+    assert "уже создана методом: card" in conflict.json()["message"]
+    assert len(provider.calls) == 1
+
+
+def _last_used_at(path: str) -> float:
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT last_used_at FROM idempotency").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_sqlite_backend_shared_between_workers_and_read_without_write():
+    async def scenario():
+        writer = SqliteIdempotencyBackend("data/idempotency.db", 100, ttl=3600)
+        await writer.set("default", "idem-3", ("card", b'{"id":1}'))
+        written_at = _last_used_at("data/idempotency.db")
+
+        # Другой воркер (свой кэш в памяти) находит ответ в общем файле
+        reader = SqliteIdempotencyBackend("data/idempotency.db", 100, ttl=3600)
+        assert await reader.get("default", "idem-3") == ("card", b'{"id":1}')
+        assert await reader.get("default", "idem-4") is None
+
+        # Свежая запись читается без обновления last_used_at
+        assert _last_used_at("data/idempotency.db") == written_at
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_backend_touches_stale_entries():
+    async def scenario():
+        backend = SqliteIdempotencyBackend("data/idempotency.db", 100, ttl=3600)
+        await backend.set("default", "idem-5", ("card", b"{}"))
+        backend.connection.execute("UPDATE idempotency SET last_used_at = ?", (time.time() - 3000,))
+
+        other = SqliteIdempotencyBackend("data/idempotency.db", 100, ttl=3600)
+        await other.get("default", "idem-5")
+        assert time.time() - _last_used_at("data/idempotency.db") < 60
+
+    asyncio.run(scenario())
+
+
+def test_provider_error_not_cached(client, provider):
+    provider.set_handler(lambda request: httpx.Response(500))
+    failed = client.post("/api/v1/transactions/card", json=card_request("idem-6"), headers=HEADERS)
+    assert failed.status_code >= 500
+
+    # После ошибки повтор мерчанта снова уходит к провайдеру
+    provider.set_handler(lambda request: None)
+    retried = client.post("/api/v1/transactions/card", json=card_request("idem-6"), headers=HEADERS)
+    assert retried.status_code == 200
+    assert len(provider.calls) == 2
+
+
+def test_memory_backend_scoped_by_merchant():
+    async def scenario():
+        backend = MemoryIdempotencyBackend(100, ttl=3600)
+        await backend.set("first", "idem-7", ("card", b"{}"))
+        return await backend.get("first", "idem-7"), await backend.get("second", "idem-7")
+
+    assert asyncio.run(scenario()) == (("card", b"{}"), None)
+
+
+def test_memory_backend_entries_expire():
+    async def scenario():
+        backend = MemoryIdempotencyBackend(100, ttl=0.01)
+        await backend.set("default", "idem-8", ("card", b"{}"))
+        await asyncio.sleep(0.02)
+        return await backend.get("default", "idem-8")
+
+    assert asyncio.run(scenario()) is None
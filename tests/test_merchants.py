@@ -0,0 +1,63 @@
+# ТЕСТЫ РЕЕСТРА МЕРЧАНТОВ
+import pytest
+
+from app.core.config import settings
+from app.api.security.merchant_registry import hash_token, merchant_registry
+from app.api.services.provider_services.our.callback_service import callback_dispatcher
+from tests.conftest import HEADERS, card_request, garex_webhook
+
+
+SHOP_HEADERS = {"Authorization": "Bearer shop_token", "Provider-data": "garex"}
+
+
+@pytest.fixture
+def merchants(monkeypatch):
+    monkeypatch.setattr(settings, "merchants", {
+        "shop": {
+            "token_sha256": hash_token("shop_token").hex(),
+            "providers": ["garex"],
+            "callback_url": "http://shop.example/callbacks"
+        },
+        "closed": {"token": "closed_token", "providers": []}
+    })
+    merchant_registry.reload()
+    yield merchant_registry
+    monkeypatch.undo()
+    merchant_registry.reload()
+
+
+@pytest.fixture
+def callbacks(monkeypatch):
+    sent = []
+
+    async def enqueue(url: str, payload: bytes):
+        sent.append(url)
+
+    monkeypatch.setattr(callback_dispatcher, "enqueue", enqueue)
+    return sent
+
+
+def test_token_resolved_to_merchant(merchants):
+    assert merchants.authenticate("shop_token").merchant_id == "shop"
+    assert merchants.authenticate(settings.merchant_token).merchant_id == "default"
+    assert merchants.authenticate("unknown_token") is None
+
+
+def test_unknown_token_and_disallowed_provider_rejected(client, merchants):
+    unknown = {"Authorization": "Bearer unknown_token", "Provider-data": "garex"}
+    closed = {"Authorization": "Bearer closed_token", "Provider-data": "garex"}
+
+    assert client.post("/api/v1/transactions/card", json=card_request("m-1"), headers=unknown).status_code == 401
+    assert client.post("/api/v1/transactions/card", json=card_request("m-1"), headers=closed).status_code == 403
+
+
+def test_callback_sent_to_merchant_url(client, merchants, callbacks, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_fast_ack", False)
+
+    shop_id = client.post("/api/v1/transactions/card", json=card_request("m-2"), headers=SHOP_HEADERS).json()["id"]
+    default_id = client.post("/api/v1/transactions/card", json=card_request("m-3"), headers=HEADERS).json()["id"]
+    client.post("/api/v1/webhooks/garex", json=garex_webhook(shop_id, "m-2", "paid"))
+    client.post("/api/v1/webhooks/garex", json=garex_webhook(default_id, "m-3", "paid"))
+
+    # Мерчант без своего URL получает колбэк на общий адрес из настроек
+    assert callbacks == ["http://shop.example/callbacks", settings.webhook_base_url]
@@ -0,0 +1,87 @@
+# ТЕСТЫ ПОРЯДКА ФОЛБЭКА ТРАНСГРАН-МЕТОДОВ
+import json
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.utils.circuit_breaker import circuit_breakers
+from app.api.services.provider_services.garex_service import garex as garex_module
+from app.api.services.provider_services.garex_service.method_scoreboard import MethodScoreboard
+from tests.conftest import HEADERS, card_request
+
+
+def test_failing_method_moved_down():
+    scoreboard = MethodScoreboard()
+    for _ in range(5):
+        scoreboard.record_failure("first", 1000, 0.1, 500)
+        scoreboard.record_success("second", 0.1)
+
+    ordered, skipped = scoreboard.plan(["first", "second"], 1000)
+    assert ordered == ["second", "first"]
+    assert skipped == []
+
+
+def test_no_requisite_answer_cached_per_amount_bucket():
+    scoreboard = MethodScoreboard()
+    scoreboard.record_failure("first", 1500, 0.1, 404)
+
+    assert scoreboard.plan(["first", "second"], 1900) == (["second"], [("first", 404)])
+    # Другая корзина суммы - метод снова пробуется
+    other_bucket = 1500 + settings.transgran_amount_bucket
+    assert scoreboard.plan(["first", "second"], other_bucket)[1] == []
+
+
+@pytest.fixture
+def first_method_empty(provider):
+    methods = []
+
+    def handler(request: httpx.Request):
+        method = json.loads(request.content)["method"]
+        methods.append(method)
+        if method == "m2tjs_c2c":
+            return httpx.Response(404, json={"message": "no requisite"})
+
+    provider.set_handler(handler)
+    return methods
+
+
+def test_fallback_to_next_method_and_skip_recently_empty(client, first_method_empty):
+    first = client.post("/api/v1/transactions/transgran-card", json=card_request("fallback-1", "77000"), headers=HEADERS)
+    assert first.status_code == 200
+    assert first_method_empty == ["m2tjs_c2c", "m2abh_c2c"]
+
+    # Метод без реквизита для этой суммы пропускается без запроса к провайдеру
+    second = client.post("/api/v1/transactions/transgran-card", json=card_request("fallback-2", "77500"), headers=HEADERS)
+    assert second.status_code == 200
+    assert first_method_empty[2:] == ["m2abh_c2c"]
+
+
+@pytest.fixture
+def scoreboard(monkeypatch):
+    fresh = MethodScoreboard()
+    monkeypatch.setattr(garex_module, "method_scoreboard", fresh)
+    return fresh
+
+
+def test_open_breaker_not_counted_against_method(client, provider, scoreboard, monkeypatch):
+    monkeypatch.setattr(circuit_breakers.get("garex:m2tjs_c2c"), "allow", lambda: False)
+
+    response = client.post("/api/v1/transactions/transgran-card", json=card_request("fallback-3", "78000"), headers=HEADERS)
+
+    # Отказ выключателя - переход к следующему методу без штрафа первому
+    assert response.status_code == 200
+    assert [json.loads(request.content)["method"] for request in provider.calls] == ["m2abh_c2c"]
+    assert scoreboard.snapshot()["methods"]["m2tjs_c2c"]["requests"] == 0
+
+
+def test_exceeded_deadline_not_counted_against_method(client, provider, scoreboard):
+    response = client.post(
+        "/api/v1/transactions/transgran-card",
+        json=card_request("fallback-4", "79000"),
+        headers={**HEADERS, "X-Request-Timeout": "0.000001"}
+    )
+
+    assert response.status_code == 504
+    assert provider.calls == []
+    assert all(stats["requests"] == 0 for stats in scoreboard.snapshot()["methods"].values())
@@ -0,0 +1,58 @@
+# ТЕСТЫ РЕЕСТРА МЕТОДОВ ОПЛАТЫ GAREX
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.services.provider_services.garex_service.method_registry import (
+    MethodRegistry,
+    PAYIN_URL,
+    PAYOUT_URL
+)
+from app.models.paygatecore.pay_in_bank_model import PayInBankRequest
+from app.models.paygatecore.pay_in_model import PayInRequest
+from tests.conftest import HEADERS, card_request
+
+
+def test_specs_describe_type_and_payment_method():
+    specs = MethodRegistry.BY_NAME
+
+    assert (specs["card"].type, specs["card"].payment_method, specs["card"].url) == ("in", "card", PAYIN_URL)
+    assert (specs["payout-sbp"].type, specs["payout-sbp"].payment_method) == ("out", "sbp")
+    assert specs["payout-card"].url == PAYOUT_URL
+    assert specs["transgran-card"].fallback and not specs["card"].fallback
+
+
+def test_payin_payload_built_from_request():
+    spec = MethodRegistry.BY_NAME["card"]
+    payload = spec.build_payload(PayInRequest(**card_request("registry-1")), spec.methods[0], None)
+
+    assert payload["orderId"] == "registry-1"
+    assert payload["method"] == "c2c"
+    assert payload["amount"] == 1000
+
+
+def test_internal_card_resolves_bank_and_method():
+    spec = MethodRegistry.BY_NAME["internal-card"]
+    request = PayInBankRequest(**card_request("registry-2"), bank_name="сбер")
+
+    bank_code = spec.resolve_bank(request)
+    assert bank_code == "sber"
+    assert spec.resolve_methods(bank_code, request) == ["sber2sber"]
+    assert spec.build_payload(request, "sber2sber", bank_code)["assetOrBank"] == "sber"
+
+
+def test_unknown_bank_rejected():
+    spec = MethodRegistry.BY_NAME["internal-card"]
+    with pytest.raises(HTTPException) as error:
+        spec.resolve_bank(PayInBankRequest(**card_request("registry-3"), bank_name="Несуществующий банк"))
+    assert error.value.status_code == 404
+
+
+def test_endpoint_sends_registry_payload(client, provider):
+    response = client.post("/api/v1/transactions/sbp", json=card_request("registry-4"), headers=HEADERS)
+
+    assert response.status_code == 200
+    sent = provider.calls[0]
+    assert str(sent.url) == PAYIN_URL
+    assert json.loads(sent.content)["method"] == "sbp"
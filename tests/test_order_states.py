@@ -0,0 +1,90 @@
+# ТЕСТЫ ТАБЛИЦЫ СОСТОЯНИЙ ЗАКАЗОВ
+import time
+
+from app.core.config import settings
+from app.api.resources.garex_resources.transaction_resources import transactions_res
+from app.api.services.provider_services.garex_service.order_states import OrderStateTable
+from tests.conftest import garex_webhook
+
+
+def _table() -> OrderStateTable:
+    return OrderStateTable(
+        transactions_res.ALL_STATUSES,
+        transactions_res.STATUS_TRANSITIONS,
+        transactions_res.TERMINAL_STATUSES
+    )
+
+
+def test_forward_transitions_applied():
+    table = _table()
+
+    assert table.advance("o-1", "created")
+    assert table.advance("o-1", "pending")
+    assert table.advance("o-1", "paid")
+    assert table.advance("o-1", "finished")
+    assert table.state("o-1") == "finished"
+
+
+def test_regressive_and_out_of_order_events_dropped():
+    table = _table()
+
+    assert table.advance("o-2", "paid")
+    # Опоздавший pending после paid и откат из завершенного статуса
+    assert not table.advance("o-2", "pending")
+    assert table.advance("o-2", "finished")
+    assert not table.advance("o-2", "dispute")
+
+    assert table.state("o-2") == "finished"
+    assert table.stats()["stale_dropped"] == 2
+
+
+def test_repeated_state_accepted():
+    table = _table()
+
+    assert table.advance("o-3", "pending")
+    assert table.advance("o-3", "pending")
+    assert table.stats()["stale_dropped"] == 0
+
+
+def test_dispute_can_resolve_either_way():
+    table = _table()
+
+    assert table.advance("o-4", "paid")
+    assert table.advance("o-4", "dispute")
+    assert table.advance("o-4", "canceled")
+    assert not table.advance("o-4", "pending")
+
+
+def test_expired_orders_evicted_oldest_first():
+    table = _table()
+    table.advance("o-old", "pending")
+    table.advance("o-new", "pending")
+    # Присваивание существующему ключу не меняет порядок: запись остается первой
+    table.active["o-old"] = (table.active["o-old"][0], time.monotonic() - 100)
+
+    table._evict(table.active, ttl=50)
+
+    assert table.state("o-old") is None
+    assert table.state("o-new") == "pending"
+    assert table.stats()["orders_evicted"] == 1
+
+
+def test_finished_orders_kept_separately():
+    table = _table()
+    table.advance("o-5", "failed")
+    table.advance("o-6", "pending")
+
+    stats = table.stats()
+    assert (stats["orders_finished"], stats["orders_active"]) == (1, 1)
+
+
+def test_stale_webhook_not_forwarded_to_merchant(client, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_fast_ack", False)
+    url = "/api/v1/webhooks/garex"
+
+    assert client.post(url, json=garex_webhook(1501, "states-1", "paid")).status_code == 200
+    before = client.get("/metrics/webhooks").json()["stale_dropped"]
+
+    late = client.post(url, json=garex_webhook(1501, "states-1", "pending"))
+    assert late.status_code == 200
+    assert client.get("/metrics/webhooks").json()["stale_dropped"] == before + 1
@@ -0,0 +1,143 @@
+# ТЕСТЫ ИСХОДЯЩЕГО ЛИМИТА ЗАПРОСОВ К ПРОВАЙДЕРУ
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils import deadline
+from app.utils.fair_scheduler import FairScheduler
+from app.utils.token_bucket import BoundedTokenBucket
+from app.api.services.provider_services.garex_service.garex import garex
+from app.api.services.provider_services.garex_service.method_registry import PAYIN_URL, PAYOUT_URL
+from tests.conftest import HEADERS, card_request
+
+
+def test_waiters_paced_at_bucket_rate():
+    async def scenario():
+        bucket = BoundedTokenBucket(rate=50.0, capacity=1.0, max_waiting=10)
+        started = time.monotonic()
+        results = await asyncio.gather(*(bucket.acquire_or_shed() for _ in range(6)))
+        return results, time.monotonic() - started
+
+    results, elapsed = asyncio.run(scenario())
+    assert all(results)
+    # Один токен сразу, еще пять - с темпом 50 в секунду
+    assert 0.09 <= elapsed < 0.5
+
+
+def test_excess_over_queue_shed():
+    async def scenario():
+        bucket = BoundedTokenBucket(rate=10.0, capacity=1.0, max_waiting=2)
+        waiters = [asyncio.create_task(bucket.acquire_or_shed()) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        shed = await bucket.acquire_or_shed()
+        retry_after = bucket.retry_after()
+        await asyncio.gather(*waiters)
+        return shed, retry_after, bucket.shed
+
+    shed, retry_after, shed_count = asyncio.run(scenario())
+    assert shed is False
+    assert shed_count == 1
+    # Два зарезервированных токена освободятся через 0.2 секунды
+    assert retry_after == pytest.approx(0.2, abs=0.05)
+
+
+def test_cancelled_waiter_returns_reserved_token():
+    async def scenario():
+        bucket = BoundedTokenBucket(rate=1.0, capacity=1.0, max_waiting=5)
+        assert await bucket.acquire_or_shed()
+        waiter = asyncio.create_task(bucket.acquire_or_shed())
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return bucket.waiting, bucket.tokens
+
+    waiting, tokens = asyncio.run(scenario())
+    assert waiting == 0
+    assert tokens > -0.5
+
+
+@pytest.fixture
+def exhausted_payin(monkeypatch):
+    bucket = BoundedTokenBucket(rate=0.5, capacity=1.0, max_waiting=0)
+    monkeypatch.setitem(garex.rate_limits, "payin", bucket)
+    return bucket
+
+
+def test_request_over_limit_rejected_with_retry_after(client, provider, exhausted_payin):
+    assert client.post("/api/v1/transactions/card", json=card_request("outbound-1"), headers=HEADERS).status_code == 200
+
+    rejected = client.post("/api/v1/transactions/card", json=card_request("outbound-2"), headers=HEADERS)
+    assert rejected.status_code == 503
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert len(provider.calls) == 1
+
+
+def test_rate_limited_transgran_does_not_fall_back(client, provider, exhausted_payin):
+    exhausted_payin.tokens = 0.0
+
+    response = client.post("/api/v1/transactions/transgran-card", json=card_request("outbound-3", "91000"), headers=HEADERS)
+    assert response.status_code == 503
+    # Следующий метод упрется в тот же лимит - провайдер не вызывается вовсе
+    assert provider.calls == []
+    assert exhausted_payin.shed == 1
+
+
+def test_wait_longer_than_budget_shed_without_reservation():
+    async def scenario():
+        bucket = BoundedTokenBucket(rate=1.0, capacity=1.0, max_waiting=5)
+        assert await bucket.acquire_or_shed()
+        tokens = bucket.tokens
+
+        shed = await bucket.acquire_or_shed(max_wait=0.1)
+        return shed, bucket.tokens - tokens, bucket.waiting
+
+    shed, reserved, waiting = asyncio.run(scenario())
+    assert shed is False
+    assert reserved == pytest.approx(0.0, abs=0.01)
+    assert waiting == 0
+
+
+def test_token_wait_does_not_hold_provider_slot(provider, monkeypatch):
+    monkeypatch.setattr(garex, "scheduler", FairScheduler(1))
+    payout_bucket = BoundedTokenBucket(rate=2.0, capacity=1.0, max_waiting=10)
+    payout_bucket.tokens = 0.0
+    monkeypatch.setitem(garex.rate_limits, "payout", payout_bucket)
+    monkeypatch.setitem(garex.rate_limits, "payin", BoundedTokenBucket(rate=100.0, capacity=10.0, max_waiting=10))
+
+    async def scenario():
+        # Выплата ждет токен своего семейства около 0.5 секунды
+        payout = asyncio.create_task(garex._request("payout", PAYOUT_URL, "payout_card", {"orderId": "slot-1", "amount": 1}))
+        await asyncio.sleep(0.01)
+
+        started = time.monotonic()
+        await garex._request("payin", PAYIN_URL, "card", {"orderId": "slot-2", "amount": 1})
+        payin_elapsed = time.monotonic() - started
+
+        await payout
+        return payin_elapsed
+
+    # Единственный слот пула не занят ожидающей выплатой - платеж проходит сразу
+    assert asyncio.run(scenario()) < 0.2
+
+
+def test_token_wait_bounded_by_deadline(provider, monkeypatch):
+    bucket = BoundedTokenBucket(rate=0.5, capacity=1.0, max_waiting=10)
+    bucket.tokens = 0.0
+    monkeypatch.setitem(garex.rate_limits, "payin", bucket)
+
+    async def scenario():
+        deadline.set_request_deadline("card", 1)
+        started = time.monotonic()
+        with pytest.raises(HTTPException) as error:
+            await garex._request("payin", PAYIN_URL, "card", {"orderId": "slot-3", "amount": 1})
+        return error.value.status_code, time.monotonic() - started
+
+    status_code, elapsed = asyncio.run(scenario())
+    # Токен появится через 2 секунды при бюджете в 1 секунду - отказ сразу, без ожидания
+    assert status_code == 503
+    assert elapsed < 0.1
+    assert provider.calls == []
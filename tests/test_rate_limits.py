@@ -0,0 +1,91 @@
+# ТЕСТЫ ЛИМИТОВ ЗАПРОСОВ МЕРЧАНТА
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.api.security.merchant_registry import merchant_registry
+from app.api.security.rate_limits import MemoryLimiterBackend, SqliteLimiterBackend
+from tests.conftest import card_request
+
+
+LIMITED_HEADERS = {"Authorization": "Bearer limited_token", "Provider-data": "garex"}
+
+
+@pytest.fixture
+def limited_merchant(monkeypatch):
+    monkeypatch.setattr(settings, "merchants", {
+        "limited": {"token": "limited_token", "rate_limit": 0.5, "burst": 2}
+    })
+    merchant_registry.reload()
+    yield
+    monkeypatch.undo()
+    merchant_registry.reload()
+
+
+def test_merchant_throttled_after_burst(client, limited_merchant):
+    statuses = [
+        client.post("/api/v1/transactions/card", json=card_request(f"limit-{i}"), headers=LIMITED_HEADERS)
+        for i in range(3)
+    ]
+
+    assert [response.status_code for response in statuses] == [200, 200, 429]
+    assert int(statuses[2].headers["Retry-After"]) >= 1
+
+
+def test_concurrency_slots_released():
+    async def scenario():
+        backend = MemoryLimiterBackend()
+        first = await backend.acquire_slot("m:payin", 2)
+        second = await backend.acquire_slot("m:payin", 2)
+        assert await backend.acquire_slot("m:payin", 2) is None
+
+        await backend.release_slot("m:payin", first)
+        assert await backend.acquire_slot("m:payin", 2) is not None
+        assert second is not None
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_backend_shared_between_workers():
+    async def scenario():
+        first = SqliteLimiterBackend("data/rate_limits.db", slot_lease=60)
+        second = SqliteLimiterBackend("data/rate_limits.db", slot_lease=60)
+
+        # Токены и слоты общие для всех воркеров, работающих с файлом
+        assert await first.acquire_rate("m:payin", rate=0.1, burst=1) == 0
+        assert await second.acquire_rate("m:payin", rate=0.1, burst=1) > 0
+
+        slot = await first.acquire_slot("m:payout", 1)
+        assert await second.acquire_slot("m:payout", 1) is None
+        await first.release_slot("m:payout", slot)
+        assert await second.acquire_slot("m:payout", 1) is not None
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_lock_wait_does_not_block_loop():
+    async def scenario():
+        backend = SqliteLimiterBackend("data/rate_limits.db", slot_lease=60)
+        other = sqlite3.connect("data/rate_limits.db", isolation_level=None, check_same_thread=False)
+        other.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.3, lambda: other.execute("COMMIT")).start()
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await backend.acquire_rate("m:payin", rate=10, burst=10)
+        task.cancel()
+
+        assert ticks >= 10
+        other.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,51 @@
+# ТЕСТЫ ПРЕОБРАЗОВАТЕЛЕЙ ОТВЕТА ПРОВАЙДЕРА В МОДЕЛИ
+import pytest
+from fastapi import HTTPException
+
+from app.api.services.provider_services.garex_service import tools
+from app.models.paygatecore.pay_in_model import PayInResponse
+from app.models.paygatecore.pay_in_sim_model import PayInSimResponse
+
+
+PROVIDER_RESPONSE = {
+    "result": {
+        "id": 123456,
+        "orderId": "mapper-1",
+        "amount": 1500,
+        "rate": 90,
+        "fee": 0.05,
+        "address": "4111111111111111",
+        "recipient": "Иван Иванов",
+        "bankName": "Сбер",
+        "bank": "sber"
+    },
+    "url": "https://pay.example/123456"
+}
+
+
+@pytest.mark.parametrize("model", [PayInResponse, PayInSimResponse])
+def test_trusted_construction_matches_validated_model(model):
+    validated = tools.compile_response_mapper(model)(PROVIDER_RESPONSE)
+    trusted = tools.compile_response_mapper(model, trusted=True)(PROVIDER_RESPONSE)
+
+    # Отличаться может только время истечения реквизитов (вычисляется при сборке)
+    exclude = {"expires_at"}
+    assert trusted.model_dump_json(exclude=exclude) == validated.model_dump_json(exclude=exclude)
+    assert type(trusted) is model
+
+
+def test_mapped_fields():
+    response = tools.compile_response_mapper(PayInResponse, trusted=True)(PROVIDER_RESPONSE)
+
+    assert response.id == 123456
+    assert response.merchant_transaction_id == "mapper-1"
+    assert response.amount == "1500"
+    assert response.card_number == "4111111111111111"
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+def test_incomplete_provider_response_rejected(trusted):
+    mapper = tools.compile_response_mapper(PayInResponse, trusted=trusted)
+    with pytest.raises(HTTPException) as error:
+        mapper({"result": {"id": 1}})
+    assert error.value.status_code == 520
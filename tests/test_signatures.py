@@ -0,0 +1,93 @@
+# ТЕСТЫ ПОДПИСИ ВЕБХУКОВ
+import hashlib
+import hmac
+import json
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.api.services.provider_services.our.signature import verify_webhook_signature
+from app.api.services.provider_services.our.signature_service import (
+    calculate_signature,
+    calculate_signature_raw,
+    hmac_hexdigest,
+    verify_signature
+)
+from tests.conftest import garex_webhook
+
+
+URL = "http://localhost:8000/api/v1/webhooks/transaction?source=garex"
+SECRET = "test_secret"
+
+
+def _legacy_signature(body: bytes) -> str:
+    return hmac.new(SECRET.encode(), body + b"/api/v1/webhooks/transactionsource=garex", hashlib.sha256).hexdigest()
+
+
+def test_raw_signature_matches_previous_format():
+    body = json.dumps({"id": 1, "status": "paid"}).encode()
+
+    assert calculate_signature_raw(URL, body, SECRET) == _legacy_signature(body)
+    assert calculate_signature(URL, {"id": 1, "status": "paid"}, SECRET) == _legacy_signature(body)
+
+
+def test_hmac_state_not_shared_between_secrets():
+    first = hmac_hexdigest("first", b"a", b"b")
+
+    assert first == hmac_hexdigest("first", b"ab")
+    assert first != hmac_hexdigest("second", b"ab")
+    # Подготовленное состояние не накапливает данные предыдущих вызовов
+    assert first == hmac_hexdigest("first", b"a", b"b")
+
+
+def test_verify_signature_over_received_bytes():
+    # Тело с другим форматированием JSON подписывается так, как пришло по сети
+    body = b'{"status":"paid",  "id":1}'
+    signature = calculate_signature_raw(URL, body, SECRET)
+
+    assert verify_signature(URL, body, signature, SECRET)
+    assert verify_signature(URL, body, signature.upper(), SECRET)
+    assert not verify_signature(URL, body.replace(b"1", b"2"), signature, SECRET)
+    assert not verify_signature(URL, body, "", SECRET)
+
+
+def test_webhook_dependency_checks_signature(monkeypatch):
+    monkeypatch.setattr(settings, "webhook_secret_key", SECRET)
+    app = FastAPI()
+
+    @app.post("/api/v1/webhooks/transaction")
+    async def transaction_webhook(body=Depends(verify_webhook_signature)):
+        return body
+
+    client = TestClient(app)
+    body = b'{"id": 1}'
+    signature = calculate_signature_raw(URL, body, SECRET)
+
+    accepted = client.post(URL, content=body, headers={"X-Signature": signature})
+    assert (accepted.status_code, accepted.json()) == (200, {"id": 1})
+    assert client.post(URL, content=body, headers={"X-Signature": "0" * 64}).status_code == 401
+    assert client.post(URL, content=body).status_code == 401
+
+
+def _signed_webhook(provider_id: int, order_id: str, secret: str):
+    webhook = garex_webhook(provider_id, order_id, "pending")
+    webhook["sign"] = hmac_hexdigest(
+        secret, f"{provider_id}:{order_id}:pending:{webhook['amount']}:{webhook['fee']}".encode()
+    )
+    return webhook
+
+
+def test_garex_sign_checked_when_secret_configured(client, monkeypatch):
+    monkeypatch.setitem(settings.providers["garex"], "webhook_secret", "garex_secret")
+    url = "/api/v1/webhooks/garex"
+
+    assert client.post(url, json=_signed_webhook(1601, "sign-1", "garex_secret")).status_code == 200
+    assert client.post(url, json=_signed_webhook(1602, "sign-2", "other_secret")).status_code == 401
+
+
+def test_garex_sign_skipped_without_secret(client, monkeypatch):
+    monkeypatch.setitem(settings.providers["garex"], "webhook_secret", "")
+
+    response = client.post("/api/v1/webhooks/garex", json=garex_webhook(1603, "sign-3", "pending"))
+    assert response.status_code == 200
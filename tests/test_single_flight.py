@@ -0,0 +1,84 @@
+# ТЕСТЫ ОБЪЕДИНЕНИЯ ОДНОВРЕМЕННЫХ ЗАПРОСОВ
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.main import app
+from app.utils.single_flight import SingleFlight
+from tests.conftest import HEADERS, card_request
+
+
+def test_concurrent_calls_share_result():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return calls
+
+        results = await asyncio.gather(*[flight.do("key", call) for _ in range(10)])
+        return calls, results, flight
+
+    calls, results, flight = asyncio.run(scenario())
+    assert calls == 1
+    assert results == [1] * 10
+    assert flight.coalesced == 9
+    assert flight.in_flight() == 0
+
+
+def test_error_delivered_to_every_waiter():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.01)
+            raise ValueError("provider failed")
+
+        return await asyncio.gather(*[flight.do("key", call) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.create_task(flight.do("key", call))
+        second = asyncio.create_task(flight.do("key", call))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_duplicate_creation_requests_reach_provider_once(client, provider):
+    async def slow(request: httpx.Request):
+        await asyncio.sleep(0.1)
+
+    provider.set_handler(slow)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as api:
+            return await asyncio.gather(*[
+                api.post("/api/v1/transactions/card", json=card_request("flight-1"), headers=HEADERS)
+                for _ in range(5)
+            ])
+
+    responses = client.portal.call(scenario)
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert len(provider.calls) == 1
@@ -0,0 +1,40 @@
+# ТЕСТЫ ОБЩЕГО СОЕДИНЕНИЯ SQLITE
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.sqlite_db import SqliteDatabase
+
+
+def test_calls_run_in_own_thread_with_wal():
+    async def scenario():
+        db = SqliteDatabase("data/nested/test.db", "test-db")
+        thread = await db.run(lambda: threading.current_thread().name)
+        mode = await db.run(lambda: db.connection.execute("PRAGMA journal_mode").fetchone()[0])
+        await db.close()
+        return thread, mode
+
+    thread, mode = asyncio.run(scenario())
+    assert thread.startswith("test-db")
+    assert mode == "wal"
+
+
+def test_failed_transaction_rolled_back():
+    async def scenario():
+        db = SqliteDatabase("data/test.db", "test-db")
+        await db.run(db.connection.execute, "CREATE TABLE items (id INTEGER)")
+
+        def insert_and_fail():
+            db.connection.execute("INSERT INTO items VALUES (1)")
+            raise RuntimeError("failure inside transaction")
+
+        with pytest.raises(RuntimeError):
+            await db.transaction(insert_and_fail)
+        await db.transaction(db.connection.execute, "INSERT INTO items VALUES (2)")
+
+        rows = await db.run(lambda: db.connection.execute("SELECT id FROM items").fetchall())
+        await db.close()
+        return rows
+
+    assert asyncio.run(scenario()) == [(2,)]
@@ -0,0 +1,78 @@
+# ТЕСТЫ КЭША СТАТУСОВ ТРАНЗАКЦИЙ
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.api.services import transaction_service
+from app.api.services.status_cache import StatusCache
+from tests.conftest import HEADERS, card_request, garex_webhook
+
+
+def _status_gets(provider):
+    return [request for request in provider.calls if request.method == "GET"]
+
+
+@pytest.fixture
+def stale_reads(monkeypatch):
+    # Запись хранилища сразу считается устаревшей, кэш не хранит промежуточные статусы
+    monkeypatch.setattr(settings, "status_cache_ttl", 0.0)
+    monkeypatch.setattr(settings, "webhook_fast_ack", False)
+
+
+def _create(client, merchant_transaction_id: str) -> int:
+    return client.post("/api/v1/transactions/card", json=card_request(merchant_transaction_id), headers=HEADERS).json()["id"]
+
+
+def test_concurrent_reads_share_one_provider_request(client, provider, stale_reads):
+    provider_id = _create(client, "cache-1")
+
+    async def status(request: httpx.Request):
+        if request.method == "GET":
+            await asyncio.sleep(0.1)
+            return httpx.Response(200, json={"result": {"id": provider_id, "state": "paid", "amount": 1000}})
+
+    provider.set_handler(status)
+
+    async def scenario():
+        return await asyncio.gather(*[transaction_service.get_transaction("default", "cache-1") for _ in range(20)])
+
+    results = client.portal.call(scenario)
+
+    assert {result.status for result in results} == {"paid"}
+    assert len(_status_gets(provider)) == 1
+
+
+def test_malformed_provider_status_falls_back_to_stored(client, provider, stale_reads):
+    _create(client, "cache-2")
+    provider.set_handler(lambda request: httpx.Response(200, json={"data": []}) if request.method == "GET" else None)
+
+    response = client.get("/api/v1/transactions/cache-2", headers=HEADERS)
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "created"
+    assert len(_status_gets(provider)) == 1
+
+
+def test_stale_provider_status_does_not_roll_back_store(client, provider, stale_reads):
+    provider_id = _create(client, "cache-3")
+    client.post("/api/v1/webhooks/garex", json=garex_webhook(provider_id, "cache-3", "paid"))
+
+    # Провайдер отвечает устаревшим статусом - переход paid -> pending недопустим
+    provider.set_handler(
+        lambda request: httpx.Response(200, json={"result": {"id": provider_id, "state": "pending", "amount": 1000}})
+        if request.method == "GET" else None
+    )
+    response = client.get("/api/v1/transactions/cache-3", headers=HEADERS)
+    stored = client.post("/api/v1/transactions/status", json={"merchant_transaction_ids": ["cache-3"]}, headers=HEADERS)
+
+    assert response.json()["status"] == "paid"
+    assert stored.json()[0]["status"] == "paid"
+
+
+def test_canceled_cached_as_intermediate_status():
+    # Отмененный платеж может уйти в спор - хранится с обычным TTL
+    assert StatusCache.ttl("canceled") == settings.status_cache_ttl
+    assert StatusCache.ttl("finished") == settings.status_cache_final_ttl
+    assert StatusCache.ttl("failed") == settings.status_cache_final_ttl
@@ -0,0 +1,136 @@
+# ТЕСТЫ ОЖИДАНИЯ СМЕНЫ СТАТУСА (LONG-POLL И SSE)
+import threading
+import time
+
+from app.core.config import settings
+from app.api.services.transaction_store import transaction_store
+from app.api.services.status_watch import status_watch
+from app.api.services import transaction_service
+from tests.conftest import HEADERS, card_request, garex_webhook
+
+
+def _create(client, merchant_transaction_id: str) -> int:
+    response = client.post("/api/v1/transactions/card", json=card_request(merchant_transaction_id), headers=HEADERS)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _send_later(client, delay: float, *webhooks):
+    def send():
+        for webhook in webhooks:
+            time.sleep(delay)
+            client.post("/api/v1/webhooks/garex", json=webhook)
+
+    thread = threading.Thread(target=send)
+    thread.start()
+    return thread
+
+
+def test_long_poll_woken_by_webhook(client, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_fast_ack", False)
+    provider_id = _create(client, "wait-1")
+
+    sender = _send_later(client, 0.2, garex_webhook(provider_id, "wait-1", "paid"))
+    started = time.monotonic()
+    response = client.get("/api/v1/transactions/wait-1/wait?timeout=10", headers=HEADERS)
+    sender.join()
+
+    assert response.json()["status"] == "paid"
+    assert time.monotonic() - started < 2
+
+
+def test_long_poll_returns_at_once_when_status_differs(client):
+    _create(client, "wait-2")
+
+    started = time.monotonic()
+    response = client.get("/api/v1/transactions/wait-2/wait?timeout=10&status=pending", headers=HEADERS)
+
+    assert response.json()["status"] == "created"
+    assert time.monotonic() - started < 1
+
+
+def test_long_poll_times_out_with_current_status(client):
+    _create(client, "wait-3")
+
+    started = time.monotonic()
+    response = client.get("/api/v1/transactions/wait-3/wait?timeout=1", headers=HEADERS)
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "created"
+    assert time.monotonic() - started >= 1
+
+
+def test_long_poll_validates_timeout_and_transaction(client):
+    assert client.get("/api/v1/transactions/wait-none/wait", headers=HEADERS).status_code == 404
+    too_long = settings.status_wait_max_timeout + 1
+    assert client.get(f"/api/v1/transactions/wait-none/wait?timeout={too_long}", headers=HEADERS).status_code == 422
+
+
+def test_change_between_read_and_wait_is_not_missed(client, monkeypatch):
+    monkeypatch.setattr(settings, "status_watch_recheck", 15.0)
+    provider_id = _create(client, "wait-4")
+
+    async def scenario():
+        row = await transaction_store.get("default", "wait-4")
+
+        # Вебхук обработан после чтения строки, но до регистрации ожидающего
+        transaction_store.record_status("garex", provider_id, "paid", "1000")
+        status_watch.notify(("garex", provider_id))
+
+        started = time.monotonic()
+        current, changed = await transaction_service._wait_change(row, 10)
+        return current["status"], changed, time.monotonic() - started
+
+    status, changed, elapsed = client.portal.call(scenario)
+
+    assert (status, changed) == ("paid", True)
+    assert elapsed < 1
+
+
+def test_event_stream_follows_status_until_final(client, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_fast_ack", False)
+    provider_id = _create(client, "sse-1")
+
+    sender = _send_later(
+        client, 0.2,
+        garex_webhook(provider_id, "sse-1", "paid"),
+        garex_webhook(provider_id, "sse-1", "finished")
+    )
+    response = client.get("/api/v1/transactions/sse-1/events", headers=HEADERS)
+    sender.join()
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line for line in response.text.split("\n\n") if line.startswith("event: status")]
+    statuses = [event.split('"status":"')[1].split('"')[0] for event in events]
+    assert statuses == ["created", "paid", "finished"]
+    assert status_watch.stats()["waiting"] == 0
+
+
+def test_event_stream_follows_canceled_into_dispute(client, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_fast_ack", False)
+    provider_id = _create(client, "sse-2")
+
+    sender = _send_later(
+        client, 0.2,
+        garex_webhook(provider_id, "sse-2", "canceled"),
+        garex_webhook(provider_id, "sse-2", "dispute"),
+        garex_webhook(provider_id, "sse-2", "finished")
+    )
+    response = client.get("/api/v1/transactions/sse-2/events", headers=HEADERS)
+    sender.join()
+
+    events = [line for line in response.text.split("\n\n") if line.startswith("event: status")]
+    statuses = [event.split('"status":"')[1].split('"')[0] for event in events]
+    assert statuses == ["created", "canceled", "dispute", "finished"]
+
+
+def test_long_poll_waits_on_canceled(client, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_fast_ack", False)
+    provider_id = _create(client, "wait-5")
+    client.post("/api/v1/webhooks/garex", json=garex_webhook(provider_id, "wait-5", "canceled"))
+
+    sender = _send_later(client, 0.2, garex_webhook(provider_id, "wait-5", "dispute"))
+    response = client.get("/api/v1/transactions/wait-5/wait?timeout=10&status=canceled", headers=HEADERS)
+    sender.join()
+
+    assert response.json()["status"] == "dispute"
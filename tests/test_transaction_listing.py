@@ -0,0 +1,117 @@
+# ТЕСТЫ ПРОСМОТРА И СПИСКА ТРАНЗАКЦИЙ МЕРЧАНТА
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.api.security.merchant_registry import merchant_registry
+from app.api.services.transaction_store import TransactionStore
+from tests.conftest import HEADERS, card_request, garex_webhook
+
+
+LIST_URL = "/api/v1/transactions"
+
+
+@pytest.fixture
+def second_merchant(monkeypatch):
+    monkeypatch.setattr(settings, "merchants", {"other": {"token": "other_token"}})
+    merchant_registry.reload()
+    yield {"Authorization": "Bearer other_token", "Provider-data": "garex"}
+    monkeypatch.undo()
+    merchant_registry.reload()
+
+
+def _create(client, count: int, prefix: str):
+    ids = []
+    for index in range(count):
+        response = client.post("/api/v1/transactions/card", json=card_request(f"{prefix}-{index}"), headers=HEADERS)
+        assert response.status_code == 200
+        ids.append(response.json()["id"])
+    return ids
+
+
+def _all_pages(client, **params):
+    pages = []
+    cursor = None
+    while True:
+        query = {"page_size": 10, **params}
+        if cursor:
+            query["cursor"] = cursor
+        page = client.get(LIST_URL, params=query, headers=HEADERS).json()
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_pages_cover_all_rows_newest_first(client):
+    _create(client, 25, "list")
+
+    pages = _all_pages(client)
+    ids = [item["merchant_transaction_id"] for page in pages for item in page["items"]]
+
+    assert [len(page["items"]) for page in pages] == [10, 10, 5]
+    assert ids == [f"list-{index}" for index in reversed(range(25))]
+    # В режиме курсора номер страницы не возвращается
+    assert pages[1]["page_number"] is None
+
+
+def test_page_number_mode_matches_cursor_mode(client):
+    _create(client, 15, "offset")
+
+    by_number = client.get(LIST_URL, params={"page_size": 10, "page_number": 2}, headers=HEADERS).json()
+    by_cursor = _all_pages(client)[1]
+
+    assert by_number["page_number"] == 2
+    assert by_number["items"] == by_cursor["items"]
+
+
+def test_status_filter(client):
+    provider_ids = _create(client, 3, "filter")
+    client.post("/api/v1/webhooks/garex", json=garex_webhook(provider_ids[1], "filter-1", "paid"))
+
+    pages = _all_pages(client, status="paid")
+    assert [item["merchant_transaction_id"] for item in pages[0]["items"]] == ["filter-1"]
+
+
+def test_bad_cursor_rejected(client):
+    response = client.get(LIST_URL, params={"cursor": "not-a-cursor"}, headers=HEADERS)
+
+    assert response.status_code == 400
+    assert response.json()["message"] == "Некорректный курсор страницы"
+
+
+def test_transaction_visible_only_to_its_merchant(client, second_merchant):
+    _create(client, 1, "owner")
+
+    own = client.get(f"{LIST_URL}/owner-0", headers=HEADERS)
+    assert own.status_code == 200
+    assert own.json()["merchant_transaction_id"] == "owner-0"
+
+    assert client.get(f"{LIST_URL}/owner-0", headers=second_merchant).status_code == 404
+    assert client.get(LIST_URL, headers=second_merchant).json()["items"] == []
+
+
+def test_listing_uses_merchant_indexes():
+    async def scenario():
+        store = TransactionStore()
+        await store.start()
+        try:
+            plans = {}
+            for name, sql in {
+                "all": "SELECT rowid, * FROM transactions WHERE merchant_id = ? AND (created_at, rowid) < (?, ?) "
+                       "ORDER BY created_at DESC, rowid DESC LIMIT 11",
+                "status": "SELECT rowid, * FROM transactions WHERE merchant_id = ? AND status = ? "
+                          "ORDER BY created_at DESC, rowid DESC LIMIT 11"
+            }.items():
+                params = ("shop", 1.0, 1) if name == "all" else ("shop", "paid")
+                plans[name] = " ".join(row[-1] for row in store.writer.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+            return plans
+        finally:
+            await store.stop()
+
+    plans = asyncio.run(scenario())
+    assert "transactions_merchant_created" in plans["all"]
+    assert "transactions_merchant_status" in plans["status"]
+    # Порядок выдачи берется из индекса, без сортировки
+    assert not any("TEMP B-TREE" in plan for plan in plans.values())
@@ -0,0 +1,39 @@
+# ТЕСТЫ МАССОВОЙ ПРОВЕРКИ СТАТУСОВ ТРАНЗАКЦИЙ
+from app.models.paygatecore.other_models import TransactionStatusItem
+from tests.conftest import HEADERS, card_request
+
+
+STATUS_URL = "/api/v1/transactions/status"
+
+
+def test_statuses_returned_in_request_order(client):
+    for merchant_transaction_id in ["bulk-1", "bulk-2", "bulk-3"]:
+        assert client.post("/api/v1/transactions/card", json=card_request(merchant_transaction_id), headers=HEADERS).status_code == 200
+
+    ids = ["bulk-3", "bulk-missing", "bulk-1", "bulk-3", "bulk-2"]
+    response = client.post(STATUS_URL, json={"merchant_transaction_ids": ids}, headers=HEADERS)
+
+    assert response.status_code == 200
+    items = response.json()
+    assert [item["merchant_transaction_id"] for item in items] == ids
+    assert [item["status"] for item in items] == ["created", None, "created", "created", "created"]
+
+
+def test_unknown_ids_carry_every_schema_field(client):
+    response = client.post(STATUS_URL, json={"merchant_transaction_ids": ["bulk-unknown"]}, headers=HEADERS)
+
+    # Формат ответа совпадает с объявленной схемой TransactionStatusItem
+    assert response.json() == [{
+        "merchant_transaction_id": "bulk-unknown",
+        "id": None,
+        "status": None,
+        "paid_amount": None,
+        "updated_at": None
+    }]
+    assert set(response.json()[0]) == set(TransactionStatusItem.model_fields)
+
+
+def test_empty_and_oversized_requests_rejected(client):
+    assert client.post(STATUS_URL, json={"merchant_transaction_ids": []}, headers=HEADERS).status_code == 422
+    too_many = [f"bulk-{i}" for i in range(5001)]
+    assert client.post(STATUS_URL, json={"merchant_transaction_ids": too_many}, headers=HEADERS).status_code == 422
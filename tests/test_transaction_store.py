@@ -0,0 +1,103 @@
+# ТЕСТЫ ЛОКАЛЬНОГО ХРАНИЛИЩА ТРАНЗАКЦИЙ
+import asyncio
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.api.services.transaction_store import TransactionStore
+from tests.conftest import HEADERS
+
+
+def _created(provider_id: int, merchant_transaction_id: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=provider_id,
+        merchant_transaction_id=merchant_transaction_id,
+        amount="1000",
+        currency="RUB",
+        currency_rate="90",
+        amount_in_usd="11.11",
+        rate="90",
+        commission="0.01",
+        card_number="4111111111111111",
+        owner_name="Ivan",
+        bank_name="Сбер",
+        expires_at=datetime.now()
+    )
+
+
+def _run(scenario):
+    async def with_store():
+        store = TransactionStore()
+        await store.start()
+        try:
+            return await scenario(store)
+        finally:
+            await store.stop()
+
+    return asyncio.run(with_store())
+
+
+def test_created_and_updated_rows_read_back():
+    async def scenario(store):
+        for index in range(100):
+            store.record_created("shop", "garex", "in", "card", _created(index + 1, f"store-{index}"))
+        store.record_status("garex", 7, "paid", "1000")
+
+        row = await store.get("shop", "store-6")
+        assert (row["status"], row["paid_amount"], row["paid_at"] is not None) == ("paid", "1000", True)
+        assert await store.get("other", "store-6") is None
+        assert await store.merchant_of("garex", 7) == "shop"
+
+        # Записи фиксируются пачками, а не по одной
+        assert store.stats()["written"] == 101
+        assert store.stats()["commits"] < 101
+
+    _run(scenario)
+
+
+def test_reads_run_outside_event_loop_thread():
+    async def scenario(store):
+        store.record_created("shop", "garex", "in", "card", _created(1, "store-thread"))
+        threads = []
+        original = store._get
+
+        def recording_get(*args):
+            threads.append(threading.current_thread())
+            return original(*args)
+
+        store._get = recording_get
+        await store.get("shop", "store-thread")
+        return threads
+
+    threads = _run(scenario)
+    assert threads and threads[0] is not threading.main_thread()
+    assert threads[0].name.startswith("transaction-read")
+
+
+def test_merchant_lookup_does_not_force_commit(monkeypatch):
+    monkeypatch.setattr(settings, "transaction_commit_interval", 30.0)
+
+    async def scenario(store):
+        store.record_created("shop", "garex", "in", "card", _created(11, "store-lookup"))
+        await asyncio.sleep(0)
+
+        # Незафиксированная транзакция находится в памяти, пачка не фиксируется досрочно
+        assert await store.merchant_of("garex", 11) == "shop"
+        assert store.stats() == {"pending": 1, "commits": 0, "written": 0}
+
+        await store.flush()
+        assert store._unflushed_merchants == {}
+        assert await store.merchant_of("garex", 11) == "shop"
+        assert await store.merchant_of("garex", 12) is None
+        assert store.stats()["commits"] == 1
+
+    _run(scenario)
+
+
+def test_deep_page_number_requires_cursor(client):
+    deep_page = settings.transaction_list_max_offset // 10 + 2
+    response = client.get(f"/api/v1/transactions?page_size=10&page_number={deep_page}", headers=HEADERS)
+
+    assert response.status_code == 400
+    assert "next_cursor" in response.json()["message"]
@@ -0,0 +1,64 @@
+# ТЕСТЫ ДЕДУПЛИКАЦИИ ВЕБХУКОВ GAREX
+import time
+
+from app.core.config import settings
+from app.api.services.provider_services.garex_service.webhook_router import webhook_ingestor
+from tests.conftest import garex_webhook
+
+
+WEBHOOK_URL = "/api/v1/webhooks/garex"
+
+
+def _wait(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert predicate()
+
+
+def test_repeated_webhook_acknowledged_without_processing(client, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_fast_ack", False)
+
+    first = client.post(WEBHOOK_URL, json=garex_webhook(1301, "dedup-1", "pending"))
+    repeat = client.post(WEBHOOK_URL, json=garex_webhook(1301, "dedup-1", "pending"))
+    # Тот же статус с другим телом - не повтор
+    corrected = client.post(WEBHOOK_URL, json=garex_webhook(1301, "dedup-1", "pending", amount=1500))
+
+    assert first.json()["message"] == "Webhook processed successfully"
+    assert repeat.json()["message"] == "Webhook already processed"
+    assert corrected.json()["message"] == "Webhook processed successfully"
+
+
+def test_failed_enqueue_does_not_mark_webhook_seen(client, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_fast_ack", True)
+    original_enqueue = webhook_ingestor.enqueue
+
+    async def broken_enqueue(order_id: str, body: bytes):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(webhook_ingestor, "enqueue", broken_enqueue)
+    failed = client.post(WEBHOOK_URL, json=garex_webhook(1302, "dedup-2", "paid"))
+    assert failed.status_code == 500
+
+    # Повтор провайдера после ошибки принимается, а не отбрасывается как дубль
+    monkeypatch.setattr(webhook_ingestor, "enqueue", original_enqueue)
+    retried = client.post(WEBHOOK_URL, json=garex_webhook(1302, "dedup-2", "paid"))
+    assert retried.status_code == 200
+    assert retried.json()["message"] == "Webhook accepted"
+
+
+def test_webhook_dropped_by_ingestor_can_be_redelivered(client, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_fast_ack", True)
+    monkeypatch.setattr(settings, "webhook_max_attempts", 1)
+    failed_before = webhook_ingestor.failed
+
+    async def broken_handler(body: bytes):
+        raise RuntimeError("handler failed")
+
+    monkeypatch.setattr(webhook_ingestor, "handler", broken_handler)
+    accepted = client.post(WEBHOOK_URL, json=garex_webhook(1303, "dedup-3", "paid"))
+    assert accepted.json()["message"] == "Webhook accepted"
+    _wait(lambda: webhook_ingestor.failed == failed_before + 1)
+
+    redelivered = client.post(WEBHOOK_URL, json=garex_webhook(1303, "dedup-3", "paid"))
+    assert redelivered.json()["message"] == "Webhook accepted"
@@ -0,0 +1,116 @@
+# ТЕСТЫ БЫСТРОГО ПОДТВЕРЖДЕНИЯ ВЕБХУКОВ GAREX
+import asyncio
+import time
+
+from app.core.config import settings
+from app.utils.durable_queue import DurableQueue
+from app.api.services.provider_services.garex_service.order_states import order_states
+from app.api.services.provider_services.garex_service.webhook_ingest import WebhookIngestor
+from tests.conftest import garex_webhook
+
+
+WEBHOOK_URL = "/api/v1/webhooks/garex"
+
+
+def _wait(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert predicate()
+
+
+def test_webhook_acknowledged_then_processed(client, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_fast_ack", True)
+
+    response = client.post(WEBHOOK_URL, json=garex_webhook(1401, "ingest-1", "pending"))
+
+    assert response.status_code == 200
+    assert response.json()["message"] == "Webhook accepted"
+    _wait(lambda: order_states.state("ingest-1") == "pending")
+
+
+def test_invalid_body_rejected_before_enqueue(client, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_fast_ack", True)
+
+    response = client.post(WEBHOOK_URL, content=b'{"id": "not a number"}')
+    assert response.status_code == 400
+
+
+def test_failed_webhook_retried_from_journal(monkeypatch):
+    monkeypatch.setattr(settings, "webhook_sweep_interval", 0.01)
+    monkeypatch.setattr(settings, "webhook_workers", 1)
+    handled = []
+
+    async def flaky(body: bytes):
+        handled.append(body)
+        if len(handled) == 1:
+            raise RuntimeError("temporary failure")
+
+    async def scenario():
+        ingestor = WebhookIngestor(flaky)
+        await ingestor.start()
+        await ingestor.enqueue("order-1", b"body")
+
+        for _ in range(500):
+            if ingestor.processed:
+                break
+            await asyncio.sleep(0.01)
+
+        stats = await ingestor.stats()
+        await ingestor.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert handled == [b"body", b"body"]
+    assert (stats["processed"], stats["failed"], stats["journal_pending"]) == (1, 0, 0)
+
+
+def test_journal_replayed_after_restart(monkeypatch):
+    monkeypatch.setattr(settings, "webhook_sweep_interval", 0.01)
+    handled = []
+
+    async def handler(body: bytes):
+        handled.append(body)
+
+    async def scenario():
+        # Вебхук принят предыдущим процессом, но не обработан до его остановки
+        journal = DurableQueue(settings.webhook_journal_path, "webhooks")
+        await journal.add("order-2", b"unprocessed", time.time())
+        await journal.close()
+
+        ingestor = WebhookIngestor(handler)
+        await ingestor.start()
+        for _ in range(500):
+            if handled:
+                break
+            await asyncio.sleep(0.01)
+        await ingestor.stop()
+
+    asyncio.run(scenario())
+    assert handled == [b"unprocessed"]
+
+
+def test_dropped_webhook_reported(monkeypatch):
+    monkeypatch.setattr(settings, "webhook_sweep_interval", 0.01)
+    monkeypatch.setattr(settings, "webhook_max_attempts", 2)
+    dropped = []
+
+    async def broken(body: bytes):
+        raise RuntimeError("permanent failure")
+
+    async def scenario():
+        ingestor = WebhookIngestor(broken, dropped.append)
+        await ingestor.start()
+        await ingestor.enqueue("order-3", b"poison")
+        for _ in range(500):
+            if ingestor.failed:
+                break
+            await asyncio.sleep(0.01)
+
+        stats = await ingestor.stats()
+        await ingestor.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert dropped == [b"poison"]
+    assert (stats["failed"], stats["journal_pending"]) == (1, 0)